@@ -0,0 +1,203 @@
+"""
+Materialized effective access.
+
+``AssistantAccess`` holds one row per (user, assistant) the user can reach,
+with the strongest permission they get from owning the assistant, a user
+share or a share with their department.  With the default
+``ASSISTANT_ACCESS_STRATEGY = "materialized"``, ``Assistant.objects.for_user``,
+``with_permission`` and ``Assistant.permission_for`` read it with one indexed
+lookup instead of OR-ing three joins and de-duplicating them.
+
+The rows are recomputed for just the affected slice whenever one of the
+sources changes:
+
+* a user or department share is saved or deleted (the share API, the admin,
+  or the cascade when a department or user is deleted);
+* an assistant is created or changes owner;
+* a user is created in, or moves to, another department.
+
+Changes that bypass model signals (``QuerySet.update``, ``bulk_create``,
+raw SQL) must call ``refresh`` themselves.  ``manage.py
+rebuild_assistant_access`` recomputes the whole table.
+
+Request-time checks go through ``cached_permission``, which keeps each
+``(user, assistant)`` answer in the ``permissions`` cache, shared by every
+worker process (a SQLite file on the host, assistants/cache.py, or Redis
+when configured).  Entries are
+keyed by a version token per assistant that ``refresh`` replaces for every
+assistant whose rows it touches, once straight away and once more after the
+transaction commits, so an entry cached from the old rows in between is
+never read again.
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+from itertools import chain
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import QuerySet
+from .models import (
+    Assistant,
+    AssistantAccess,
+    AssistantDepartmentAccess,
+    AssistantPermission,
+    AssistantUserAccess,
+)
+
+
+def _scoped(qs, assistant_field, user_field, assistant_ids, user_ids):
+    if assistant_ids is not None:
+        qs = qs.filter(**{f"{assistant_field}__in": assistant_ids})
+    if user_ids is not None:
+        qs = qs.filter(**{f"{user_field}__in": user_ids})
+    return qs
+
+
+def effective_grants(assistant_ids=None, user_ids=None):
+    """``{(user_id, assistant_id): permission}`` from the source tables,
+    limited to the given assistants and/or users (None: all of them)."""
+    scope = (assistant_ids, user_ids)
+    owners = _scoped(Assistant.objects.all(), "pk", "owner", *scope).values_list("owner_id", "pk")
+    shares = _scoped(AssistantUserAccess.objects.all(), "assistant", "user", *scope).values_list(
+        "user_id", "assistant_id", "permission"
+    )
+    # one join to the members (a separate filter on them would add a second)
+    departments = _scoped(
+        AssistantDepartmentAccess.objects.all(), "assistant", "department__users", *scope,
+    ).values_list("department__users", "assistant_id", "permission")
+
+    grants = {}
+    for user_id, assistant_id, permission in chain(
+        ((user_id, pk, AssistantPermission.EDIT) for user_id, pk in owners), shares, departments
+    ):
+        if user_id is None:
+            continue  # a department without members
+        key = (user_id, assistant_id)
+        if grants.get(key) != AssistantPermission.EDIT:
+            grants[key] = permission
+    return grants
+
+
+def refresh(assistant_ids=None, user_ids=None):
+    """Recompute the rows of the given assistants and/or users; returns the
+    number of rows written.  ``refresh()`` rebuilds the whole table."""
+    with transaction.atomic():
+        grants = effective_grants(assistant_ids, user_ids)
+        stale = _scoped(AssistantAccess.objects.all(), "assistant", "user", assistant_ids, user_ids)
+        if assistant_ids is not None:
+            touched = list(assistant_ids)
+        elif user_ids is not None:
+            touched = {a for _, a in grants} | set(stale.values_list("assistant_id", flat=True))
+        else:
+            touched = None  # everything
+        invalidate(touched)
+        transaction.on_commit(lambda: invalidate(touched))
+        stale.delete()
+        AssistantAccess.objects.bulk_create(
+            [
+                AssistantAccess(user_id=user_id, assistant_id=assistant_id, permission=permission)
+                for (user_id, assistant_id), permission in grants.items()
+            ],
+            batch_size=1000,
+        )
+    return len(grants)
+
+
+def _cache():
+    return caches[settings.PERMISSION_CACHE]
+
+
+def _version(assistant_id):
+    key = f"assistant-version:{assistant_id}"
+    version = _cache().get(key)
+    if version is None:
+        # never fall back to a fixed default: an evicted token must not bring
+        # back entries cached under an earlier one
+        _cache().add(key, uuid.uuid4().hex, None)
+        version = _cache().get(key)
+    return version
+
+
+def invalidate(assistant_ids=None):
+    """Give the assistants new version tokens (None: drop the whole cache)."""
+    if assistant_ids is None:
+        _cache().clear()
+        return
+    _cache().set_many(
+        {f"assistant-version:{pk}": uuid.uuid4().hex for pk in assistant_ids}, None
+    )
+
+
+def cached_permission(assistant, user):
+    """``assistant.permission_for(user)``, from the cache when possible."""
+    if user.pk is not None and user.pk == assistant.owner_id:
+        return AssistantPermission.EDIT
+    key = f"permission:{assistant.pk}:{_version(assistant.pk)}:{user.pk}"
+    permission = _cache().get(key)
+    if permission is None:
+        permission = assistant.permission_for(user) or ""
+        _cache().set(key, permission, settings.PERMISSION_CACHE_TIMEOUT)
+    return permission or None
+
+
+# ── signal receivers (connected in AssistantsConfig.ready) ───────────────────
+_paused = threading.local()
+
+
+@contextmanager
+def share_signals_paused():
+    """Skip the per-row refresh of share saves and deletes in this thread;
+    for bulk changes that call ``refresh`` once afterwards."""
+    _paused.active = True
+    try:
+        yield
+    finally:
+        _paused.active = False
+
+
+def share_changed(sender, instance, origin=None, **kwargs):
+    """A user or department share was saved or deleted."""
+    if getattr(_paused, "active", False):
+        return
+    if origin is not None:
+        model = origin.model if isinstance(origin, QuerySet) else type(origin)
+        if model in (Assistant, get_user_model()):
+            return  # cascaded: the access rows go with the assistant or user
+    if sender is AssistantUserAccess:
+        users = [instance.user_id]
+    else:
+        users = get_user_model().objects.filter(department_id=instance.department_id).values("pk")
+    refresh([instance.assistant_id], users)
+
+
+def _remember(sender, instance, update_fields, field):
+    """Stash ``field``'s stored value before a save that may change it."""
+    if instance._state.adding or (update_fields is not None and field not in update_fields):
+        return
+    instance._access_previous = sender.objects.filter(pk=instance.pk).values_list(
+        f"{field}_id", flat=True
+    ).first()
+
+
+def remember_owner(sender, instance, update_fields=None, **kwargs):
+    _remember(sender, instance, update_fields, "owner")
+
+
+def assistant_saved(sender, instance, created, **kwargs):
+    previous = vars(instance).pop("_access_previous", instance.owner_id)
+    if created:
+        refresh([instance.pk], [instance.owner_id])
+    elif previous != instance.owner_id:
+        refresh([instance.pk], [previous, instance.owner_id])
+
+
+def remember_department(sender, instance, update_fields=None, **kwargs):
+    _remember(sender, instance, update_fields, "department")
+
+
+def user_saved(sender, instance, created, **kwargs):
+    previous = vars(instance).pop("_access_previous", instance.department_id)
+    if (instance.department_id if created else previous != instance.department_id):
+        refresh(user_ids=[instance.pk])
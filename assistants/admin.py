@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import (
     Assistant,
     Message,
+    ChatJob,
     AssistantUserAccess,
     AssistantDepartmentAccess,
 )
@@ -19,20 +20,32 @@ class AssistantDepartmentAccessInline(admin.TabularInline):
 class AssistantAdmin(admin.ModelAdmin):
     inlines = [AssistantUserAccessInline, AssistantDepartmentAccessInline]
     list_display = ("id", "name", "owner")
-    readonly_fields = ("openai_id", "thread_id", "created_at")
+    readonly_fields = ("openai_id", "created_at")
     fields = (
         "name",
         "owner",
         "description",
         "instructions",
         "tools",
+        "context_strategy",
+        "context_last_messages",
+        "max_prompt_tokens",
         "openai_id",
-        "thread_id",
         "created_at",
     )
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ("assistant", "role", "created_at")
-    readonly_fields = ("created_at",)
+    list_display = ("assistant", "role", "total_tokens", "created_at")
+    readonly_fields = (
+        "created_at", "model", "prompt_tokens", "completion_tokens",
+        "total_tokens", "run_duration_ms", "polls",
+    )
+
+
+@admin.register(ChatJob)
+class ChatJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "assistant", "user", "status", "attempts", "created_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "updated_at", "lease_owner", "lease_expires_at")
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class AssistantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assistants'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+        from . import access, search
+        from .models import Assistant, AssistantDepartmentAccess, AssistantUserAccess, Message
+        from .storage import log_saved_message
+
+        post_save.connect(log_saved_message, sender=Message, dispatch_uid="conversation-log")
+        # a migration that rebuilt the message table may have dropped them
+        post_migrate.connect(search.restore_search_triggers, sender=self, dispatch_uid="search-triggers")
+
+        # materialized effective access, see assistants/access.py
+        for share in (AssistantUserAccess, AssistantDepartmentAccess):
+            post_save.connect(access.share_changed, sender=share, dispatch_uid=f"access-{share.__name__}-save")
+            post_delete.connect(access.share_changed, sender=share, dispatch_uid=f"access-{share.__name__}-delete")
+        pre_save.connect(access.remember_owner, sender=Assistant, dispatch_uid="access-owner")
+        post_save.connect(access.assistant_saved, sender=Assistant, dispatch_uid="access-assistant")
+        User = get_user_model()
+        pre_save.connect(access.remember_department, sender=User, dispatch_uid="access-department")
+        post_save.connect(access.user_saved, sender=User, dispatch_uid="access-user")
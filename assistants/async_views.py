@@ -0,0 +1,242 @@
+"""
+Async chat endpoint for ASGI deployments
+----------------------------------------
+
+/api/assistants/<id>/chat/async/   POST {"content": "..."}  (?stream=1 for SSE)
+
+Same contract as ``ChatView`` but implemented as a native coroutine: upstream
+calls go through the shared ``openai.AsyncOpenAI`` client and the run is
+awaited, so a single worker can keep many conversations open at once instead
+of pinning a thread per request.
+"""
+import asyncio
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from chat.models import Thread
+from .models import Assistant, ContextStrategy
+from .access import cached_permission
+from . import timing
+from .conversation import (
+    AsyncReleasingStream,
+    StreamedReply,
+    acancel_run,
+    aensure_thread,
+    afetch_reply,
+    apost_user_message,
+    astart_run,
+    compact_thread,
+    run_usage,
+    store_message,
+)
+from .openai_client import get_async_client, get_client
+from .resilience import UpstreamUnavailable, as_upstream_error
+from .governor import Overloaded, run_governor
+from .run_coordinator import ThreadBusy, run_coordinator
+from .run_poller import run_poller
+from .throttling import check_chat_rate
+from .timing import ServerTimingMixin
+
+
+def _error(detail, status_code):
+    return JsonResponse({"detail": detail}, status=status_code)
+
+
+def _retry_later(exc):
+    """503 + Retry-After for ``Overloaded`` / ``UpstreamUnavailable``."""
+    response = _error(str(exc.detail), exc.status_code)
+    response["Retry-After"] = "%d" % exc.wait
+    return response
+
+
+class AsyncChatView(ServerTimingMixin, View):
+    """
+    POST /api/assistants/<uuid>/chat/async/
+    Body: {"content": "..."}
+    """
+
+    http_method_names = ["post"]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # authentication is token based, exactly like the DRF views
+        view.csrf_exempt = True
+        return view
+
+    @staticmethod
+    def _authenticate(request):
+        for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            result = auth_class().authenticate(request)
+            if result is not None:
+                return result[0]
+        return None
+
+    async def post(self, request, pk):
+        try:
+            user = await sync_to_async(self._authenticate)(request)
+        except exceptions.AuthenticationFailed as exc:
+            return _error(str(exc.detail), status.HTTP_401_UNAUTHORIZED)
+        if user is None:
+            return _error(
+                "Authentication credentials were not provided.",
+                status.HTTP_401_UNAUTHORIZED,
+            )
+
+        try:
+            assistant = await Assistant.objects.select_related("owner").aget(pk=pk)
+        except Assistant.DoesNotExist:
+            return _error("Not found.", status.HTTP_404_NOT_FOUND)
+        perm = await sync_to_async(cached_permission)(assistant, user)
+        if perm not in ("use", "edit"):
+            return _error(
+                "You do not have permission to perform this action.",
+                status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            payload = request.POST
+        user_msg = (payload.get("content") or "").strip()
+        if not user_msg:
+            return _error("`content` field is required", status.HTTP_400_BAD_REQUEST)
+
+        wait = await sync_to_async(check_chat_rate)(user, user_msg)
+        if wait:
+            throttled = exceptions.Throttled(wait)
+            response = _error(str(throttled.detail), status.HTTP_429_TOO_MANY_REQUESTS)
+            response["Retry-After"] = "%d" % throttled.wait
+            return response
+
+        # 🔹 1.  OpenAI client
+        client = get_async_client()
+
+        # 🔹 2.  Wait for any earlier turn on the caller's thread to finish
+        #        and for one of the global run slots
+        thread, _ = await Thread.objects.aget_or_create(assistant=assistant, user=user)
+        try:
+            lease = await run_coordinator.aacquire(thread)
+        except ThreadBusy:
+            return _error(
+                "An earlier message in this conversation is still being answered",
+                status.HTTP_409_CONFLICT,
+            )
+        try:
+            slot = await run_governor.aacquire(user)
+        except Overloaded as exc:
+            await sync_to_async(lease.release)()
+            return _retry_later(exc)
+
+        try:
+            if request.GET.get("stream") in ("1", "true"):
+                # released by the stream once it has been sent
+                return await self._stream_reply(client, assistant, thread, user_msg, lease, slot)
+            try:
+                return await self._reply(client, assistant, thread, user_msg)
+            finally:
+                await sync_to_async(slot.release)()
+                await sync_to_async(lease.release)()
+        except UpstreamUnavailable as exc:
+            return _retry_later(exc)
+        except Exception as exc:
+            # errors OpenAI answered with: JSON 502, like ``ChatView``
+            error = as_upstream_error(exc)
+            if error is None:
+                raise
+            return _error(str(error.detail), error.status_code)
+
+    async def _prepare(self, client, assistant, thread, user_msg):
+        """Create the upstream thread if needed and post the user message."""
+        if assistant.context_strategy == ContextStrategy.SUMMARY:
+            # only every few turns, so the sync client in a worker thread is fine
+            await sync_to_async(compact_thread)(get_client(), assistant, thread)
+        thread_id = await aensure_thread(client, thread)
+
+        # 🔹 3.  Store the user message locally *and* remotely
+        await sync_to_async(store_message)(thread, "user", user_msg)
+        await apost_user_message(client, thread_id, user_msg)
+        return thread_id
+
+    async def _reply(self, client, assistant, thread, user_msg):
+        thread_id = await self._prepare(client, assistant, thread, user_msg)
+
+        # 🔹 4.  Kick off a run and await the shared poller without blocking
+        #        the loop
+        started = time.monotonic()
+        run = await astart_run(client, assistant, thread_id)
+        future = run_poller.track(thread_id, run, model=assistant.model)
+        try:
+            with timing.phase("run_wait"):
+                run = await asyncio.wait_for(
+                    asyncio.wrap_future(future), settings.RUN_POLL_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            run_poller.untrack(run.id)
+            # or it would still hold the thread when the next turn comes
+            await acancel_run(client, thread_id, run.id)
+            return _error("Run did not finish in time", status.HTTP_504_GATEWAY_TIMEOUT)
+        finally:
+            timing.describe("run_wait", f"{future.polls} polls")
+        if run.status != "completed":
+            return _error(
+                f"Run ended with status '{run.status}'",
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        # 🔹 5.  Get and persist the assistant’s reply
+        assistant_msg = await afetch_reply(client, thread_id)
+        await sync_to_async(store_message)(
+            thread, "assistant", assistant_msg,
+            **run_usage(run, assistant.model, started, future.polls),
+        )
+
+        return JsonResponse({"content": assistant_msg})
+
+    async def _stream_reply(self, client, assistant, thread, user_msg, lease, slot):
+        """Async counterpart of ``ChatView._stream_reply``.
+
+        The thread's run lease and the run slot are released once the stream
+        has finished, or when the response is closed without being read.
+        """
+        try:
+            thread_id = await self._prepare(client, assistant, thread, user_msg)
+            started = time.monotonic()
+            events = await astart_run(client, assistant, thread_id, stream=True)
+        except BaseException:
+            await sync_to_async(slot.release)()
+            await sync_to_async(lease.release)()
+            raise
+
+        async def event_stream():
+            reply = StreamedReply()
+            try:
+                async for event in events:
+                    for frame in reply.feed(event):
+                        yield frame
+
+                if reply.failed_status:
+                    yield reply.error()
+                    return
+
+                await sync_to_async(store_message)(
+                    thread, "assistant", reply.text,
+                    **reply.usage(assistant.model, started),
+                )
+                yield reply.done()
+            finally:
+                await sync_to_async(slot.release)()
+                await sync_to_async(lease.release)()
+
+        response = StreamingHttpResponse(
+            AsyncReleasingStream(event_stream(), slot.release, lease.release),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
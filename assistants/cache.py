@@ -0,0 +1,98 @@
+"""
+Django cache backend on a ``LocalDB`` SQLite file (assistants/localdb.py).
+
+Every worker process on the host reads and writes the same file, so an entry
+cached by one process is a hit in all the others, which a ``LocMemCache``
+can't offer and a ``FileBasedCache`` only does at the cost of listing its
+whole directory on every write.  Used for the ``permissions`` cache when no
+Redis is configured:
+
+    CACHES = {"permissions": {
+        "BACKEND": "assistants.cache.LocalDBCache",
+        "LOCATION": "var/permissions.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }}
+
+Values are pickled.  Expired entries are only skipped when read; every
+``CULL_EVERY`` writes they are deleted, and if more than ``MAX_ENTRIES``
+remain the ``1 / CULL_FREQUENCY`` closest to expiry go as well.
+"""
+import pickle
+import time
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from .localdb import LocalDB
+
+SCHEMA = [
+    "CREATE TABLE entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)",
+    "CREATE INDEX entry_expires ON entry (expires)",
+]
+SCHEMA_VERSION = 1
+
+CULL_EVERY = 100
+
+
+class LocalDBCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._db = LocalDB(location, SCHEMA, SCHEMA_VERSION, timeout=options.get("LOCK_TIMEOUT", 2.0))
+        self._writes = 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db.connection().execute(
+            "SELECT value FROM entry WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            [key, time.time()],
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write("REPLACE", key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write("IGNORE", key, value, timeout, version)
+
+    def _write(self, conflict, key, value, timeout, version):
+        key = self.make_and_validate_key(key, version=version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._db.transaction() as conn:
+            # an expired entry doesn't count as present for add()
+            conn.execute("DELETE FROM entry WHERE key = ? AND expires <= ?", [key, time.time()])
+            written = conn.execute(
+                f"INSERT OR {conflict} INTO entry (key, value, expires) VALUES (?, ?, ?)",
+                [key, value, self.get_backend_timeout(timeout)],
+            ).rowcount
+            self._writes += 1
+            if self._writes % CULL_EVERY == 0:
+                self._cull(conn)
+        return bool(written)
+
+    def _cull(self, conn):
+        conn.execute("DELETE FROM entry WHERE expires <= ?", [time.time()])
+        count = conn.execute("SELECT count(*) FROM entry").fetchone()[0]
+        if count > self._max_entries:
+            conn.execute(
+                "DELETE FROM entry WHERE key IN ("
+                "SELECT key FROM entry ORDER BY expires IS NULL, expires LIMIT ?)",
+                [max(1, count // self._cull_frequency)],
+            )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._db.transaction() as conn:
+            return bool(conn.execute(
+                "UPDATE entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                [self.get_backend_timeout(timeout), key, time.time()],
+            ).rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._db.transaction() as conn:
+            return bool(conn.execute("DELETE FROM entry WHERE key = ?", [key]).rowcount)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM entry")
@@ -0,0 +1,364 @@
+"""
+Chat flow shared by ``ChatView``, ``AsyncChatView`` and the background chat
+worker.
+
+Each helper is one step of a conversation turn: find the caller's thread
+and make sure it exists upstream, store the user's message locally and
+remotely, start a run, and once it has completed fetch and store the
+assistant's reply.  The upstream steps have ``a``-prefixed coroutine twins
+for the async client; ``StreamedReply`` turns a streamed run into the
+Server-Sent Events both chat views send.
+
+Every user talks to an assistant in their own ``chat.Thread``, so users of a
+shared assistant never queue behind each other's runs.  Turns on the same
+thread are serialized by ``run_coordinator`` and must hold its lease while
+calling these helpers.
+
+How much history a run sees is the assistant's context policy
+(``Assistant.context_strategy``): the whole thread, only the last
+``context_last_messages`` messages (OpenAI's run truncation), or a rolling
+summary — once enough turns have piled up, ``compact_thread`` folds the older
+ones into a summary and moves the conversation to a fresh upstream thread
+seeded with that summary and the recent messages.  ``max_prompt_tokens``
+caps the prompt in every mode.
+"""
+import json
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from chat.models import Thread
+from . import timing
+from .models import ContextStrategy, Message
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for the assistant that will continue it. "
+    "Keep facts, decisions, open questions and the user's preferences; drop "
+    "small talk. Answer with the summary only."
+)
+
+# threads.create accepts at most this many initial messages
+MAX_SEED_MESSAGES = 32
+
+
+def get_thread(assistant, user):
+    """Return ``user``'s conversation thread with ``assistant``."""
+    thread, _ = Thread.objects.get_or_create(assistant=assistant, user=user)
+    return thread
+
+
+def ensure_thread(client, thread):
+    """Return the upstream id of ``thread``, creating it remotely if needed.
+
+    The new id is only stored if the row still has none (compare-and-set);
+    if another request got there first we use its thread and delete ours.
+    """
+    if thread.openai_id:
+        return thread.openai_id
+    with timing.phase("thread"):
+        remote = client.beta.threads.create()
+    if not claim_thread(thread, remote.id):
+        try:
+            client.beta.threads.delete(remote.id)
+        except Exception:
+            pass
+    return thread.openai_id
+
+
+async def aensure_thread(client, thread):
+    """``ensure_thread`` for the async client."""
+    if thread.openai_id:
+        return thread.openai_id
+    with timing.phase("thread"):
+        remote = await client.beta.threads.create()
+    if not await sync_to_async(claim_thread)(thread, remote.id):
+        try:
+            await client.beta.threads.delete(remote.id)
+        except Exception:
+            pass
+    return thread.openai_id
+
+
+def claim_thread(thread, remote_id):
+    """Store ``remote_id`` as the upstream id of ``thread`` unless it already
+    has one; False (and ``thread`` refreshed) if another request won."""
+    won = Thread.objects.filter(pk=thread.pk, openai_id__isnull=True).update(
+        openai_id=remote_id, updated_at=timezone.now()
+    )
+    if won:
+        thread.openai_id = remote_id
+    else:
+        thread.refresh_from_db(fields=["openai_id"])
+    return bool(won)
+
+
+def store_message(thread, role, content, **usage):
+    """Store a message of ``thread``; ``usage`` is ``run_usage()`` for replies."""
+    return Message.objects.create(
+        assistant_id=thread.assistant_id, thread=thread, role=role,
+        content=content, created_at=timezone.now(), **usage
+    )
+
+
+def run_usage(run, model="", started=None, polls=None):
+    """Message fields recording what the run behind a reply cost.
+
+    ``started`` is the ``time.monotonic()`` reading taken before the run was
+    created; without it the duration comes from the run's own timestamps.
+    Whatever the run doesn't report (streamed runs without a completed event,
+    older API versions) is left empty.
+    """
+    usage = getattr(run, "usage", None)
+    if started is not None:
+        duration = time.monotonic() - started
+    else:
+        created = _count(getattr(run, "created_at", None))
+        completed = _count(getattr(run, "completed_at", None))
+        duration = completed - created if created and completed else None
+    run_model = getattr(run, "model", None)
+    return {
+        "model": (run_model if isinstance(run_model, str) and run_model else model or "")[:40],
+        "prompt_tokens": _count(getattr(usage, "prompt_tokens", None)),
+        "completion_tokens": _count(getattr(usage, "completion_tokens", None)),
+        "total_tokens": _count(getattr(usage, "total_tokens", None)),
+        "run_duration_ms": round(duration * 1000) if duration is not None else None,
+        "polls": polls,
+    }
+
+
+def _count(value):
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
+
+
+def post_user_message(client, thread_id, content):
+    """Post the user's message upstream and return the created message."""
+    with timing.phase("msg_create"):
+        return client.beta.threads.messages.create(thread_id=thread_id, role="user", content=content)
+
+
+async def apost_user_message(client, thread_id, content):
+    with timing.phase("msg_create"):
+        return await client.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=content
+        )
+
+
+def run_options(assistant):
+    """Extra ``runs.create`` arguments implementing the context policy."""
+    options = {}
+    if assistant.context_strategy != ContextStrategy.FULL:
+        options["truncation_strategy"] = {
+            "type": "last_messages",
+            "last_messages": assistant.context_last_messages,
+        }
+    if assistant.max_prompt_tokens:
+        options["max_prompt_tokens"] = assistant.max_prompt_tokens
+    return options
+
+
+def start_run(client, assistant, thread_id, stream=False):
+    with timing.phase("run_create"):
+        return client.beta.threads.runs.create(**_run_arguments(assistant, thread_id, stream))
+
+
+async def astart_run(client, assistant, thread_id, stream=False):
+    with timing.phase("run_create"):
+        return await client.beta.threads.runs.create(**_run_arguments(assistant, thread_id, stream))
+
+
+def cancel_run(client, thread_id, run_id):
+    """Best-effort cancel of a run we stopped waiting for.
+
+    Upstream refuses new messages on a thread while one of its runs is
+    active, so a run left going would fail the caller's next turn.
+    """
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except Exception:
+        logger.warning("Could not cancel run %s", run_id, exc_info=True)
+
+
+async def acancel_run(client, thread_id, run_id):
+    try:
+        await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except Exception:
+        logger.warning("Could not cancel run %s", run_id, exc_info=True)
+
+
+def _run_arguments(assistant, thread_id, stream):
+    return {
+        "thread_id": thread_id,
+        "assistant_id": assistant.openai_id,
+        "stream": stream,
+        **run_options(assistant),
+    }
+
+
+def compact_thread(client, assistant, thread):
+    """Fold old turns into ``thread.summary`` when the policy asks for it.
+
+    Runs at the start of a turn.  Compaction happens once more than twice
+    ``context_last_messages`` messages have accumulated since the last one,
+    so its cost is paid every N messages rather than on every turn.  Returns
+    True if the thread was compacted.
+    """
+    if assistant.context_strategy != ContextStrategy.SUMMARY:
+        return False
+    keep = assistant.context_last_messages
+    pending = thread.messages.order_by("created_at", "id")
+    if thread.summarized_until:
+        pending = pending.filter(created_at__gt=thread.summarized_until)
+    if pending.count() <= 2 * keep:
+        return False
+
+    with timing.phase("compact"):
+        return _compact(client, thread, list(pending), keep)
+
+
+def _compact(client, thread, pending, keep):
+    old, recent = pending[:-keep], pending[-keep:]
+    try:
+        summary = _summarize(client, thread.summary, old)
+    except Exception:
+        # keep going on the uncompacted thread; truncation still applies
+        logger.exception("Could not summarize thread %s", thread.pk)
+        return False
+
+    seed = [{"role": "assistant", "content": f"Summary of the conversation so far:\n{summary}"}]
+    seed += [{"role": m.role, "content": m.content} for m in recent]
+    remote = client.beta.threads.create(messages=seed[:MAX_SEED_MESSAGES])
+    for message in seed[MAX_SEED_MESSAGES:]:
+        client.beta.threads.messages.create(thread_id=remote.id, **message)
+
+    old_id = thread.openai_id
+    thread.openai_id = remote.id
+    thread.summary = summary
+    thread.summarized_until = old[-1].created_at
+    thread.save(update_fields=["openai_id", "summary", "summarized_until", "updated_at"])
+    if old_id:
+        try:
+            client.beta.threads.delete(old_id)
+        except Exception:
+            logger.warning("Could not delete compacted thread %s", old_id)
+    return True
+
+
+def _summarize(client, previous, messages):
+    transcript = "\n\n".join(f"{m.role}: {m.content}" for m in messages)
+    if previous:
+        transcript = f"Earlier summary:\n{previous}\n\n{transcript}"
+    completion = client.chat.completions.create(
+        model=settings.CONTEXT_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ],
+    )
+    return completion.choices[0].message.content.strip()
+
+
+def fetch_reply(client, thread_id):
+    """Return the text of the most recent message in the thread."""
+    with timing.phase("msg_list"):
+        msgs = client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+    return msgs.data[0].content[0].text.value
+
+
+async def afetch_reply(client, thread_id):
+    with timing.phase("msg_list"):
+        msgs = await client.beta.threads.messages.list(thread_id=thread_id, limit=1)
+    return msgs.data[0].content[0].text.value
+
+
+def sse(event, data):
+    """Encode a single Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamedReply:
+    """Follows the events of a streamed run and turns them into the frames
+    sent to the caller: a ``delta`` per text fragment, then ``done`` with
+    the whole reply or ``error`` if the run did not complete.
+    """
+
+    FAILED = ("thread.run.failed", "thread.run.cancelled", "thread.run.expired")
+
+    def __init__(self):
+        self.parts = []
+        self.run = None
+        self.failed_status = None
+
+    def feed(self, event):
+        """The frames to forward for one upstream event."""
+        frames = []
+        if event.event == "thread.message.delta":
+            for block in event.data.delta.content or []:
+                text = getattr(block, "text", None)
+                if text is not None and text.value:
+                    self.parts.append(text.value)
+                    frames.append(sse("delta", {"content": text.value}))
+        elif event.event == "thread.run.completed":
+            self.run = event.data
+        elif event.event in self.FAILED:
+            self.failed_status = event.data.status
+        elif event.event == "error":
+            self.failed_status = "error"
+        return frames
+
+    @property
+    def text(self):
+        # the whole reply is only known once the stream is exhausted
+        return "".join(self.parts)
+
+    def usage(self, model, started):
+        """``store_message`` fields of the reply (``run_usage``)."""
+        return run_usage(self.run, model, started, polls=0)
+
+    def error(self):
+        return sse("error", {"detail": f"Run ended with status '{self.failed_status}'"})
+
+    def done(self):
+        return sse("done", {"content": self.text})
+
+
+class ReleasingStream:
+    """The body of a streamed reply: iterates ``events`` and, on ``close()``,
+    calls every ``release``.
+
+    ``StreamingHttpResponse`` closes its iterable when the response is
+    closed, whether or not it was ever iterated, so the turn's run lease and
+    slot are given back even if the client disconnects before the first
+    chunk.  The releases must be idempotent: the generator's own ``finally``
+    usually gets there first.
+    """
+
+    def __init__(self, events, *releases):
+        self._events = events
+        self._releases = releases
+
+    def __iter__(self):
+        return iter(self._events)
+
+    def close(self):
+        try:
+            self._events.close()
+        finally:
+            for release in self._releases:
+                release()
+
+
+class AsyncReleasingStream(ReleasingStream):
+    """``ReleasingStream`` for an async generator (the ASGI handler calls
+    ``close()`` from a worker thread, so the releases stay synchronous)."""
+
+    def __aiter__(self):
+        return aiter(self._events)
+
+    def close(self):
+        for release in self._releases:
+            release()
@@ -0,0 +1,380 @@
+"""
+Local stand-in for the parts of the OpenAI API this project uses.
+
+Used for load tests (``manage.py fake_openai`` + ``manage.py chat_benchmark``):
+point ``OPENAI_BASE_URL`` at it and chat requests go through the real client,
+connection pool, poller and views, without the cost or variance of the real
+service.  Implements assistants, threads, messages, runs (polled and
+streamed), files, vector stores and chat completions, keeping everything in
+memory.
+
+Runs "take" ``run_latency`` seconds (± ``jitter``): a retrieve before then
+reports ``in_progress``, afterwards the run is ``completed`` (or ``failed``
+with probability ``failure_rate``) and the reply has been added to the
+thread.  As upstream, a thread refuses new messages and runs (400) while
+one of its runs is in progress, until it finishes or is cancelled.  Streamed runs send the reply in ``stream_chunks`` deltas spread over
+the same latency.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class FakeOpenAIState:
+    def __init__(self, run_latency=1.0, jitter=0.0, failure_rate=0.0,
+                 stream_chunks=10, reply="This is a reply from the fake OpenAI server."):
+        self.run_latency = run_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stream_chunks = stream_chunks
+        self.reply = reply
+        self.lock = threading.Lock()
+        self.threads = {}      # thread id → list of messages, newest last
+        self.runs = {}         # run id → run dict (+ private "_due", "_fails")
+        self.vector_stores = {}
+        self.files = {}
+
+    # ── helpers ───────────────────────────────────────────────────────────
+    def latency(self):
+        return max(0.0, self.run_latency + random.uniform(-self.jitter, self.jitter))
+
+    def message(self, thread_id, role, text, run_id=None):
+        return {
+            "id": _id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "run_id": run_id,
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "attachments": [],
+            "metadata": {},
+        }
+
+    def settle(self, run):
+        """Move ``run`` to its final state once its latency has passed."""
+        if run["status"] != "in_progress" or time.monotonic() < run["_due"]:
+            return
+        if run["_fails"]:
+            run["status"] = "failed"
+            run["last_error"] = {"code": "server_error", "message": "Simulated failure"}
+        else:
+            run["status"] = "completed"
+            run["completed_at"] = int(time.time())
+            self.threads.setdefault(run["thread_id"], []).append(
+                self.message(run["thread_id"], "assistant", self.reply, run["id"])
+            )
+
+    def active_run(self, thread_id):
+        for run in self.runs.values():
+            if run["thread_id"] == thread_id:
+                self.settle(run)
+                if run["status"] == "in_progress":
+                    return run
+        return None
+
+    @staticmethod
+    def public(obj):
+        return {k: v for k, v in obj.items() if not k.startswith("_")}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # set by ``make_server``
+
+    routes = [
+        ("POST", r"/assistants", "create_assistant"),
+        ("POST", r"/assistants/(?P<id>[^/]+)", "update_assistant"),
+        ("DELETE", r"/assistants/(?P<id>[^/]+)", "delete_object"),
+        ("POST", r"/threads", "create_thread"),
+        ("DELETE", r"/threads/(?P<id>[^/]+)", "delete_thread"),
+        ("POST", r"/threads/(?P<thread>[^/]+)/messages", "create_message"),
+        ("GET", r"/threads/(?P<thread>[^/]+)/messages", "list_messages"),
+        ("POST", r"/threads/(?P<thread>[^/]+)/runs", "create_run"),
+        ("GET", r"/threads/(?P<thread>[^/]+)/runs/(?P<run>[^/]+)", "retrieve_run"),
+        ("POST", r"/threads/(?P<thread>[^/]+)/runs/(?P<run>[^/]+)/cancel", "cancel_run"),
+        ("POST", r"/files", "create_file"),
+        ("GET", r"/files/(?P<id>[^/]+)", "retrieve_file"),
+        ("POST", r"/vector_stores", "create_vector_store"),
+        ("POST", r"/vector_stores/(?P<vs>[^/]+)/files", "add_vector_store_file"),
+        ("GET", r"/vector_stores/(?P<vs>[^/]+)/files", "list_vector_store_files"),
+        ("DELETE", r"/vector_stores/(?P<vs>[^/]+)/files/(?P<id>[^/]+)", "delete_vector_store_file"),
+        ("POST", r"/chat/completions", "chat_completion"),
+    ]
+
+    def log_message(self, format, *args):
+        pass  # one line per request would swamp a load test
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ── plumbing ──────────────────────────────────────────────────────────
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        path = url.path[3:] if url.path.startswith("/v1") else url.path
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("application/json") and raw:
+            self.body = json.loads(raw)
+        else:
+            self.body = {}
+        for verb, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if verb == method and match:
+                return getattr(self, handler)(**match.groupdict())
+        self._json({"error": {"message": f"Unknown route {method} {path}"}}, 404)
+
+    def _json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self, what):
+        self._json({"error": {"message": f"No such {what}"}}, 404)
+
+    def _busy(self, thread, run):
+        self._json({"error": {
+            "message": f"Thread {thread} already has an active run {run['id']}.",
+            "type": "invalid_request_error",
+        }}, 400)
+
+    def _sse(self, event, data):
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+        self.wfile.flush()
+
+    # ── assistants ────────────────────────────────────────────────────────
+    def create_assistant(self):
+        self._json({"id": _id("asst"), "object": "assistant", "created_at": int(time.time()), **self.body})
+
+    def update_assistant(self, id):
+        self._json({"id": id, "object": "assistant", "created_at": int(time.time()), **self.body})
+
+    def delete_object(self, id):
+        self._json({"id": id, "object": "assistant.deleted", "deleted": True})
+
+    # ── threads & messages ────────────────────────────────────────────────
+    def create_thread(self):
+        state = self.state
+        thread_id = _id("thread")
+        with state.lock:
+            state.threads[thread_id] = [
+                state.message(thread_id, m.get("role", "user"), m.get("content", ""))
+                for m in self.body.get("messages", [])
+            ]
+        self._json({"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+
+    def delete_thread(self, id):
+        with self.state.lock:
+            existed = self.state.threads.pop(id, None) is not None
+        if not existed:
+            return self._not_found("thread")
+        self._json({"id": id, "object": "thread.deleted", "deleted": True})
+
+    def create_message(self, thread):
+        state = self.state
+        with state.lock:
+            if thread not in state.threads:
+                return self._not_found("thread")
+            active = state.active_run(thread)
+            if active is not None:
+                return self._busy(thread, active)
+            msg = state.message(thread, self.body.get("role", "user"), self.body.get("content", ""))
+            state.threads[thread].append(msg)
+        self._json(msg)
+
+    def list_messages(self, thread):
+        state = self.state
+        with state.lock:
+            if thread not in state.threads:
+                return self._not_found("thread")
+            msgs = list(state.threads[thread])
+        if self.query.get("order", "desc") == "desc":
+            msgs.reverse()
+        msgs = msgs[: int(self.query.get("limit", 20))]
+        self._json({
+            "object": "list",
+            "data": msgs,
+            "first_id": msgs[0]["id"] if msgs else None,
+            "last_id": msgs[-1]["id"] if msgs else None,
+            "has_more": False,
+        })
+
+    # ── runs ──────────────────────────────────────────────────────────────
+    def create_run(self, thread):
+        state = self.state
+        with state.lock:
+            if thread not in state.threads:
+                return self._not_found("thread")
+            active = state.active_run(thread)
+            if active is not None:
+                return self._busy(thread, active)
+            latency = state.latency()
+            run = {
+                "id": _id("run"),
+                "object": "thread.run",
+                "created_at": int(time.time()),
+                "thread_id": thread,
+                "assistant_id": self.body.get("assistant_id"),
+                "status": "in_progress",
+                "truncation_strategy": self.body.get("truncation_strategy"),
+                "max_prompt_tokens": self.body.get("max_prompt_tokens"),
+                "_due": time.monotonic() + latency,
+                "_fails": random.random() < state.failure_rate,
+            }
+            state.runs[run["id"]] = run
+        if self.body.get("stream"):
+            return self._stream_run(run, latency)
+        self._json(state.public(run))
+
+    def _stream_run(self, run, latency):
+        state = self.state
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._sse("thread.run.created", state.public(run))
+
+        chunks = max(1, state.stream_chunks)
+        words = state.reply.split(" ")
+        step = max(1, -(-len(words) // chunks))
+        msg_id = _id("msg")
+        if not run["_fails"]:
+            for i in range(0, len(words), step):
+                time.sleep(latency / chunks)
+                text = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                self._sse("thread.message.delta", {
+                    "id": msg_id,
+                    "object": "thread.message.delta",
+                    "delta": {"content": [{"index": 0, "type": "text", "text": {"value": text}}]},
+                })
+        else:
+            time.sleep(latency)
+        with state.lock:
+            run["_due"] = 0
+            state.settle(run)
+        self._sse(f"thread.run.{run['status']}", state.public(run))
+        done = b"event: done\ndata: [DONE]\n\n"
+        self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(done), done))
+        self.wfile.flush()
+
+    def retrieve_run(self, thread, run):
+        state = self.state
+        with state.lock:
+            found = state.runs.get(run)
+            if found is None or found["thread_id"] != thread:
+                return self._not_found("run")
+            state.settle(found)
+            payload = state.public(found)
+        self._json(payload)
+
+    def cancel_run(self, thread, run):
+        state = self.state
+        with state.lock:
+            found = state.runs.get(run)
+            if found is None or found["thread_id"] != thread:
+                return self._not_found("run")
+            state.settle(found)
+            if found["status"] != "in_progress":
+                return self._json({"error": {
+                    "message": f"Cannot cancel run with status '{found['status']}'.",
+                    "type": "invalid_request_error",
+                }}, 400)
+            found["status"] = "cancelled"
+            found["cancelled_at"] = int(time.time())
+            payload = state.public(found)
+        self._json(payload)
+
+    # ── files & vector stores ─────────────────────────────────────────────
+    def create_file(self):
+        file_id = _id("file")
+        info = {
+            "id": file_id,
+            "object": "file",
+            "bytes": int(self.headers.get("Content-Length") or 0),
+            "created_at": int(time.time()),
+            "filename": "upload",
+            "purpose": "assistants",
+        }
+        with self.state.lock:
+            self.state.files[file_id] = info
+        self._json(info)
+
+    def retrieve_file(self, id):
+        with self.state.lock:
+            info = self.state.files.get(id)
+        if info is None:
+            return self._not_found("file")
+        self._json(info)
+
+    def create_vector_store(self):
+        vs_id = _id("vs")
+        with self.state.lock:
+            self.state.vector_stores[vs_id] = list(self.body.get("file_ids", []))
+        self._json({"id": vs_id, "object": "vector_store", "created_at": int(time.time()), "status": "completed"})
+
+    def add_vector_store_file(self, vs):
+        with self.state.lock:
+            if vs not in self.state.vector_stores:
+                return self._not_found("vector store")
+            self.state.vector_stores[vs].append(self.body.get("file_id"))
+        self._json({"id": self.body.get("file_id"), "object": "vector_store.file",
+                    "vector_store_id": vs, "status": "completed"})
+
+    def list_vector_store_files(self, vs):
+        with self.state.lock:
+            if vs not in self.state.vector_stores:
+                return self._not_found("vector store")
+            ids = list(self.state.vector_stores[vs])
+        data = [{"id": f, "object": "vector_store.file", "vector_store_id": vs, "status": "completed"} for f in ids]
+        self._json({"object": "list", "data": data, "has_more": False,
+                    "first_id": ids[0] if ids else None, "last_id": ids[-1] if ids else None})
+
+    def delete_vector_store_file(self, vs, id):
+        with self.state.lock:
+            files = self.state.vector_stores.get(vs, [])
+            if id in files:
+                files.remove(id)
+        self._json({"id": id, "object": "vector_store.file.deleted", "deleted": True})
+
+    # ── chat completions (rolling summaries) ──────────────────────────────
+    def chat_completion(self):
+        self._json({
+            "id": _id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.body.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "Summary of the fake conversation."},
+            }],
+        })
+
+
+def make_server(host="127.0.0.1", port=0, **options):
+    """Return a ready-to-serve ``ThreadingHTTPServer`` (``port=0`` picks one)."""
+    handler = type("Handler", (FakeOpenAIHandler,), {"state": FakeOpenAIState(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
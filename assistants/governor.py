@@ -0,0 +1,323 @@
+"""
+Global cap on upstream runs in flight.
+
+Every chat turn takes a run slot before it starts an OpenAI run and gives it
+back once the reply is in.  At most ``CHAT_MAX_RUNS_IN_FLIGHT`` slots exist
+across all worker processes of the host; further turns wait in a queue of
+at most ``CHAT_RUN_QUEUE_SIZE`` entries for up to ``CHAT_RUN_QUEUE_WAIT``
+seconds.  A turn that finds the queue full, or waits too long, is shed with
+``503 Service Unavailable`` and ``Retry-After`` (``Overloaded``) instead of
+piling more load onto an upstream that is already rate limiting us.
+
+Slots and the queue live in a SQLite file (``CHAT_GOVERNOR_DB``, default
+``var/governor.sqlite3``, see assistants/localdb.py).  Both expire unless
+renewed: held slots are renewed by a background thread of the holding
+process and queued turns refresh their entry whenever they poll, so a
+crashed worker's entries disappear on their own.  If the file can't be
+reached in time, turns run ungoverned rather than failing.
+
+The queue is not first come, first served:
+
+* interactive turns (chat requests) always go before batch turns
+  (background jobs), and a queue full of batch turns doesn't shed
+  interactive ones;
+* within a class, departments share the slots in proportion to
+  ``org.Department.weight`` (start-time fair queuing).  Each queued turn gets
+  a virtual start tag: the later of the class's virtual clock and the
+  department's previous finish tag, whose finish tag is its start plus
+  ``1 / weight``.  Turns are admitted in tag order and the clock advances
+  to the tag of each admitted turn, so a department with a backlog can't
+  push other departments' turns back, and one with weight 2 gets twice the
+  turns of one with weight 1 while both are waiting.  Users without a
+  department form one more flow of weight 1.  A turn that gives up waiting
+  hands its share back: the department's later turns and finish tag move
+  back by its ``1 / weight``.
+"""
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from org.models import Department
+from customgpt_backend.metrics import CHAT_RUN_QUEUE_DEPTH, CHAT_RUN_SLOTS_IN_USE, CHAT_RUNS_SHED
+from . import timing
+from .localdb import LocalDB
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE TABLE slot (token TEXT PRIMARY KEY, expires REAL NOT NULL)",
+    """
+    CREATE TABLE waiter (
+        token    TEXT PRIMARY KEY,
+        priority INTEGER NOT NULL,
+        tag      REAL NOT NULL,
+        enqueued REAL NOT NULL,
+        expires  REAL NOT NULL,
+        flow     TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX waiter_order ON waiter (priority, tag, enqueued, token)",
+    # last finish tag of every (class, department) flow
+    "CREATE TABLE flow (key TEXT PRIMARY KEY, finish REAL NOT NULL)",
+    # virtual clock of every class
+    "CREATE TABLE vclock (priority INTEGER PRIMARY KEY, vtime REAL NOT NULL)",
+]
+SCHEMA_VERSION = 3
+
+INTERACTIVE, BATCH = 0, 1
+
+# a queued turn refreshes its entry every poll; this is how long it survives
+# without one
+WAITER_TTL = 5.0
+
+
+class Overloaded(APIException):
+    """No run slot is available; DRF answers 503 with ``Retry-After``."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many conversations in progress, please retry shortly."
+    default_code = "overloaded"
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = math.ceil(wait)
+
+
+class RunSlot:
+    """A held run slot; ``release()`` may be called repeatedly."""
+
+    def __init__(self, governor, token):
+        self._governor = governor
+        self.token = token
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._governor._release(self.token)
+
+
+class _NoSlot:
+    """Stand-in slot when the governor is switched off or unavailable."""
+
+    def release(self):
+        pass
+
+
+class RunGovernor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._db = None
+        self._held = {}  # token -> monotonic time after which we stop renewing
+        self._renewer = None
+
+    @property
+    def db(self):
+        path = settings.CHAT_GOVERNOR_DB
+        if self._db is None or str(self._db.path) != str(path):
+            self._db = LocalDB(path, SCHEMA, SCHEMA_VERSION, timeout=settings.CHAT_GOVERNOR_DB_TIMEOUT)
+        return self._db
+
+    def acquire(self, user=None, batch=False, timeout=None):
+        """Wait for a run slot for a turn of ``user`` and return it.
+
+        ``batch`` turns (background jobs) only get slots no interactive turn
+        is waiting for.  Raises ``Overloaded`` straight away if the queue is
+        full, or after ``timeout`` seconds (default
+        ``settings.CHAT_RUN_QUEUE_WAIT``).
+        """
+        if not settings.CHAT_MAX_RUNS_IN_FLIGHT:
+            return _NoSlot()
+        flow = self._flow(user, batch)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (settings.CHAT_RUN_QUEUE_WAIT if timeout is None else timeout)
+        with timing.phase("queue"):
+            while True:
+                try:
+                    if self._try(token, deadline, *flow):
+                        return self._hold(token)
+                except sqlite3.Error:
+                    logger.warning("run governor unavailable, not limiting this run", exc_info=True)
+                    return _NoSlot()
+                time.sleep(settings.CHAT_GOVERNOR_POLL_INTERVAL)
+
+    async def aacquire(self, user=None, batch=False, timeout=None):
+        """Async variant of ``acquire``; waits without blocking the loop."""
+        if not settings.CHAT_MAX_RUNS_IN_FLIGHT:
+            return _NoSlot()
+        flow = await sync_to_async(self._flow)(user, batch)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (settings.CHAT_RUN_QUEUE_WAIT if timeout is None else timeout)
+        with timing.phase("queue"):
+            while True:
+                try:
+                    if await sync_to_async(self._try)(token, deadline, *flow):
+                        return self._hold(token)
+                except sqlite3.Error:
+                    logger.warning("run governor unavailable, not limiting this run", exc_info=True)
+                    return _NoSlot()
+                await asyncio.sleep(settings.CHAT_GOVERNOR_POLL_INTERVAL)
+
+    @staticmethod
+    def _flow(user, batch):
+        """``(flow key, weight, priority)`` of a turn of ``user``."""
+        department_id = getattr(user, "department_id", None)
+        weight = 1
+        if department_id is not None:
+            weight = Department.objects.filter(pk=department_id).values_list(
+                "weight", flat=True
+            ).first() or 1
+        priority = BATCH if batch else INTERACTIVE
+        return f"{priority}:{department_id or ''}", weight, priority
+
+    def _try(self, token, deadline, flow, weight, priority):
+        """One admission attempt: True once ``token`` holds a slot.
+
+        The first attempt joins the queue (or is shed if it is full); it is
+        admitted once fewer than the free slots are taken by turns queued
+        ahead of it.
+        """
+        limit = settings.CHAT_MAX_RUNS_IN_FLIGHT
+        now = time.time()
+        shed = None
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM slot WHERE expires < ?", [now])
+            conn.execute("DELETE FROM waiter WHERE expires < ?", [now])
+            in_use = conn.execute("SELECT count(*) FROM slot").fetchone()[0]
+            # missing on the first attempt, or if dropped as expired
+            mine = conn.execute(
+                "SELECT tag, enqueued FROM waiter WHERE token = ?", [token]
+            ).fetchone()
+            if mine is None:
+                competing = conn.execute(
+                    "SELECT count(*) FROM waiter WHERE priority <= ?", [priority]
+                ).fetchone()[0]
+                if competing >= settings.CHAT_RUN_QUEUE_SIZE:
+                    shed = "queue_full"
+                else:
+                    mine = (self._start_tag(conn, flow, weight, priority), now)
+                    conn.execute(
+                        "INSERT INTO waiter (token, priority, tag, enqueued, expires, flow) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [token, priority, *mine, now + WAITER_TTL, flow],
+                    )
+            granted = False
+            if not shed:
+                tag, enqueued = mine
+                ahead = conn.execute(
+                    "SELECT count(*) FROM waiter "
+                    "WHERE (priority, tag, enqueued, token) < (?, ?, ?, ?)",
+                    [priority, tag, enqueued, token],
+                ).fetchone()[0]
+                granted = in_use + ahead < limit
+                if granted:
+                    conn.execute("DELETE FROM waiter WHERE token = ?", [token])
+                    conn.execute(
+                        "INSERT INTO slot (token, expires) VALUES (?, ?)",
+                        [token, now + settings.CHAT_RUN_SLOT_TTL],
+                    )
+                    conn.execute(
+                        "INSERT INTO vclock (priority, vtime) VALUES (?, ?) "
+                        "ON CONFLICT(priority) DO UPDATE SET vtime = max(vtime, excluded.vtime)",
+                        [priority, tag],
+                    )
+                    in_use += 1
+                elif time.monotonic() >= deadline:
+                    self._withdraw(conn, token, flow, tag, 1 / weight)
+                    shed = "timeout"
+                else:
+                    conn.execute(
+                        "UPDATE waiter SET expires = ? WHERE token = ?", [now + WAITER_TTL, token]
+                    )
+            depth = self._depth(conn)
+        CHAT_RUN_QUEUE_DEPTH.set(depth)
+        CHAT_RUN_SLOTS_IN_USE.set(in_use)
+        if shed:
+            CHAT_RUNS_SHED.labels(shed).inc()
+            raise Overloaded(settings.CHAT_RUN_RETRY_AFTER)
+        return granted
+
+    @staticmethod
+    def _start_tag(conn, flow, weight, priority):
+        """Start tag of a new turn of ``flow``; moves the flow's finish tag on."""
+        vtime = conn.execute(
+            "SELECT vtime FROM vclock WHERE priority = ?", [priority]
+        ).fetchone()
+        last = conn.execute("SELECT finish FROM flow WHERE key = ?", [flow]).fetchone()
+        start = max(vtime[0] if vtime else 0.0, last[0] if last else 0.0)
+        conn.execute(
+            "INSERT INTO flow (key, finish) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET finish = excluded.finish",
+            [flow, start + 1 / weight],
+        )
+        return start
+
+    @staticmethod
+    def _withdraw(conn, token, flow, tag, step):
+        """Take ``token`` out of the queue without charging its flow.
+
+        Its start tag moved the flow's finish tag on by ``step``; the flow's
+        turns queued behind it and the finish tag move back by as much.
+        """
+        conn.execute("DELETE FROM waiter WHERE token = ?", [token])
+        conn.execute(
+            "UPDATE waiter SET tag = tag - ? WHERE flow = ? AND tag > ?", [step, flow, tag]
+        )
+        conn.execute("UPDATE flow SET finish = finish - ? WHERE key = ?", [step, flow])
+
+    @staticmethod
+    def _depth(conn):
+        return conn.execute("SELECT count(*) FROM waiter").fetchone()[0]
+
+    def _hold(self, token):
+        with self._lock:
+            self._held[token] = time.monotonic() + settings.THREAD_LOCK_MAX_HOLD
+            if self._renewer is None or not self._renewer.is_alive():
+                self._renewer = threading.Thread(target=self._renew_loop, daemon=True)
+                self._renewer.start()
+        return RunSlot(self, token)
+
+    def _release(self, token):
+        with self._lock:
+            self._held.pop(token, None)
+        try:
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM slot WHERE token = ?", [token])
+                in_use = conn.execute("SELECT count(*) FROM slot").fetchone()[0]
+            CHAT_RUN_SLOTS_IN_USE.set(in_use)
+        except Exception:
+            # the slot expires after CHAT_RUN_SLOT_TTL anyway
+            logger.exception("Could not release run slot %s", token)
+
+    def _renew_loop(self):
+        """Renew this process's slots until it holds none (own thread).
+
+        A slot held for longer than ``THREAD_LOCK_MAX_HOLD`` is no longer
+        renewed, so one whose holder never releases it still expires.
+        """
+        while True:
+            time.sleep(settings.CHAT_RUN_SLOT_TTL / 3)
+            with self._lock:
+                now = time.monotonic()
+                tokens = [t for t, give_up in self._held.items() if give_up > now]
+                if not self._held:
+                    self._renewer = None
+                    return
+            try:
+                with self.db.transaction() as conn:
+                    conn.executemany(
+                        "UPDATE slot SET expires = ? WHERE token = ?",
+                        [(time.time() + settings.CHAT_RUN_SLOT_TTL, t) for t in tokens],
+                    )
+            except Exception:
+                logger.exception("Could not renew run slots")
+
+
+run_governor = RunGovernor()
@@ -0,0 +1,148 @@
+"""
+Background execution of queued chat turns (``ChatJob``).
+
+``ChatView`` with ``?background=1`` stores the user's message, queues a
+``ChatJob`` and answers 202.  ``manage.py chat_worker`` processes (any number
+of them, on any number of hosts) lease jobs from the table, run them upstream
+and store the reply.  A worker keeps renewing its lease while the run is in
+progress; if it dies the lease lapses and another worker picks the job up
+again, resuming the already started run when there is one.  A run that
+ends failed, cancelled or expired is retried with a new run on the same
+upstream message.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent import futures
+from django.conf import settings
+from django.utils import timezone
+from .conversation import (
+    compact_thread,
+    ensure_thread,
+    fetch_reply,
+    get_thread,
+    post_user_message,
+    run_usage,
+    start_run,
+    store_message,
+)
+from .governor import Overloaded, run_governor
+from .models import ChatJob
+from .openai_client import get_client
+from .run_coordinator import ThreadBusy, run_coordinator
+from .run_poller import run_poller
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """Another worker took over the job while we were running it."""
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def execute_job(job, worker_id):
+    """Run ``job`` to completion; the caller must hold its lease."""
+    lease = settings.CHAT_JOB_LEASE_SECONDS
+    try:
+        reply = _run(job, worker_id, lease)
+    except LeaseLost:
+        logger.warning("Lost lease on chat job %s", job.pk)
+        return
+    except Exception as exc:
+        logger.exception("Chat job %s failed", job.pk)
+        if job.attempts >= settings.CHAT_JOB_MAX_ATTEMPTS:
+            _release(job, worker_id, status=ChatJob.Status.FAILED, error=str(exc))
+        else:
+            # back on the queue for the next worker to try again
+            _release(job, worker_id, status=ChatJob.Status.QUEUED)
+        return
+
+    _release(job, worker_id, status=ChatJob.Status.SUCCEEDED, reply=reply)
+
+
+def _run(job, worker_id, lease):
+    client = get_client()
+    assistant = job.assistant
+    thread = get_thread(assistant, job.user)
+
+    # queue behind any other turn on the same thread, keeping our job lease
+    while True:
+        try:
+            thread_lease = run_coordinator.acquire(thread, timeout=lease / 3)
+            break
+        except ThreadBusy:
+            if not ChatJob.objects.renew_lease(job, worker_id, lease):
+                raise LeaseLost()
+    try:
+        # then for a global run slot, as batch work behind interactive chat;
+        # a full queue just means trying again
+        while True:
+            try:
+                slot = run_governor.acquire(job.user, batch=True, timeout=lease / 3)
+                break
+            except Overloaded as exc:
+                if not ChatJob.objects.renew_lease(job, worker_id, lease):
+                    raise LeaseLost()
+                time.sleep(min(exc.wait, lease / 3))
+        try:
+            return _run_turn(client, job, worker_id, lease, assistant, thread)
+        finally:
+            slot.release()
+    finally:
+        thread_lease.release()
+
+
+def _run_turn(client, job, worker_id, lease, assistant, thread):
+    # a resumed run is timed from its own timestamps instead
+    started = None
+    if job.run_id:
+        run = client.beta.threads.runs.retrieve(
+            thread_id=job.thread_id, run_id=job.run_id
+        )
+    else:
+        if not job.message_id:
+            compact_thread(client, assistant, thread)
+            job.thread_id = ensure_thread(client, thread)
+            job.message_id = post_user_message(client, job.thread_id, job.content).id
+            job.save(update_fields=["thread_id", "message_id", "updated_at"])
+        # else an earlier attempt posted the message but its run failed
+        started = time.monotonic()
+        run = start_run(client, assistant, job.thread_id)
+        job.run_id = run.id
+        job.save(update_fields=["run_id", "updated_at"])
+
+    future = run_poller.track(job.thread_id, run, model=assistant.model)
+    while True:
+        try:
+            run = future.result(timeout=lease / 3)
+            break
+        except futures.TimeoutError:
+            if not ChatJob.objects.renew_lease(job, worker_id, lease):
+                run_poller.untrack(run.id)
+                raise LeaseLost()
+
+    if run.status != "completed":
+        # the next attempt starts a new run instead of resuming this one
+        job.run_id = ""
+        job.save(update_fields=["run_id", "updated_at"])
+        raise RuntimeError(f"Run ended with status '{run.status}'")
+    return store_message(
+        thread, "assistant", fetch_reply(client, job.thread_id),
+        **run_usage(run, assistant.model, started, future.polls),
+    )
+
+
+def _release(job, worker_id, status, reply=None, error=""):
+    ChatJob.objects.filter(pk=job.pk, lease_owner=worker_id).update(
+        status=status,
+        reply=reply,
+        error=error,
+        lease_owner="",
+        lease_expires_at=None,
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,65 @@
+"""
+Small SQLite files under ``var/`` that every worker process on the host
+shares: the chat rate-limit buckets and the run governor's slots and queue.
+
+The data is short-lived coordination state, so it is kept out of the main
+database.  Each thread of each process gets its own connection (WAL,
+``synchronous=NORMAL``), and ``transaction()`` starts with ``BEGIN
+IMMEDIATE`` so read-modify-write sequences are serialized across processes.
+When ``version`` changes the tables are simply dropped and recreated.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class LocalDB:
+    def __init__(self, path, schema, version=1, timeout=2.0):
+        self.path = Path(path)
+        self.schema = schema
+        self.version = version
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        # connections must not cross a fork
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate(conn)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _migrate(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.version:
+                tables = conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                ).fetchall()
+                for (name,) in tables:
+                    conn.execute(f'DROP TABLE "{name}"')
+                for statement in self.schema:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(self.version)}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """``BEGIN IMMEDIATE`` … ``COMMIT``, rolled back on any exception."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
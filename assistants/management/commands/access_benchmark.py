@@ -0,0 +1,141 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from org.models import Department
+from assistants.access import refresh
+from assistants.managers import ACCESS_STRATEGIES
+from assistants.models import (
+    Assistant,
+    AssistantDepartmentAccess,
+    AssistantUserAccess,
+    AssistantPermission,
+)
+from .chat_benchmark import percentile
+
+PERMISSIONS = [AssistantPermission.USE, AssistantPermission.USE, AssistantPermission.EDIT]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed assistants and share rows at scale and time Assistant.objects.for_user "
+        "with every access strategy. Everything runs in one transaction that is "
+        "rolled back, so the database is left as it was."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assistants", type=int, default=100_000)
+        parser.add_argument(
+            "--user-shares", type=int, default=900_000,
+            help="AssistantUserAccess rows, spread evenly over the assistants.",
+        )
+        parser.add_argument(
+            "--department-shares", type=int, default=100_000,
+            help="AssistantDepartmentAccess rows, spread evenly over the assistants.",
+        )
+        parser.add_argument("--users", type=int, default=20_000)
+        parser.add_argument("--departments", type=int, default=2_000)
+        parser.add_argument("--samples", type=int, default=200, help="Users looked up per strategy.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--strategy", action="append", choices=ACCESS_STRATEGIES,
+            help="Strategy to time (repeatable; default: all).",
+        )
+
+    def handle(self, *args, **options):
+        if options["user_shares"] > options["assistants"] * options["users"]:
+            raise CommandError("more user shares than (assistant, user) pairs")
+        if options["department_shares"] > options["assistants"] * options["departments"]:
+            raise CommandError("more department shares than (assistant, department) pairs")
+        strategies = options["strategy"] or ACCESS_STRATEGIES
+        # refresh() below clears the permission cache; keep it off the real one
+        local_cache = override_settings(
+            CACHES={**settings.CACHES, "access-benchmark": {
+                "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+            }},
+            PERMISSION_CACHE="access-benchmark",
+        )
+        try:
+            with local_cache, transaction.atomic():
+                users = self._seed(random.Random(options["seed"]), options)
+                self._measure(users, strategies, options["samples"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    # ── setup ─────────────────────────────────────────────────────────────
+    def _seed(self, rng, options):
+        started = time.perf_counter()
+        User = get_user_model()
+        departments = Department.objects.bulk_create(
+            [Department(name=f"bench-dept-{i}") for i in range(options["departments"])],
+            batch_size=5000,
+        )
+        users = User.objects.bulk_create(
+            [
+                User(username=f"bench-access-{i}", password="!", department=rng.choice(departments))
+                for i in range(options["users"])
+            ],
+            batch_size=5000,
+        )
+        assistants = Assistant.objects.bulk_create(
+            [Assistant(name=f"bench-{i}", owner=rng.choice(users)) for i in range(options["assistants"])],
+            batch_size=5000,
+        )
+        self._bulk(
+            AssistantUserAccess, assistants, users, "user", options["user_shares"], rng
+        )
+        self._bulk(
+            AssistantDepartmentAccess, assistants, departments, "department",
+            options["department_shares"], rng,
+        )
+        rows = refresh()  # the shares were bulk inserted, without signals
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"seeded {len(assistants)} assistants, {options['user_shares']} user shares, "
+            f"{options['department_shares']} department shares ({rows} effective access rows) "
+            f"for {len(users)} users in {time.perf_counter() - started:.1f}s"
+        )
+        return users
+
+    def _bulk(self, model, assistants, grantees, field, total, rng):
+        """``total`` share rows, the same number per assistant (±1), each
+        to distinct grantees."""
+        batch = []
+        per_assistant, extra = divmod(total, len(assistants))
+        for i, assistant in enumerate(assistants):
+            for grantee in rng.sample(grantees, per_assistant + (i < extra)):
+                batch.append(model(assistant=assistant, permission=rng.choice(PERMISSIONS), **{field: grantee}))
+            if len(batch) >= 50_000:
+                model.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        model.objects.bulk_create(batch, batch_size=5000)
+
+    # ── measurement ───────────────────────────────────────────────────────
+    def _measure(self, users, strategies, samples):
+        samples = random.Random(1).sample(users, min(len(users), samples))
+        expected = {}
+        self.stdout.write(f"\n{'strategy':<14} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'rows/user':>10}")
+        for strategy in strategies:
+            timings, rows = [], 0
+            for user in samples:
+                started = time.perf_counter()
+                ids = set(Assistant.objects.for_user(user, strategy).values_list("pk", flat=True))
+                timings.append((time.perf_counter() - started) * 1000)
+                rows += len(ids)
+                if expected.setdefault(user.pk, ids) != ids:
+                    raise CommandError(f"{strategy} disagrees for user {user.pk}")
+            timings.sort()
+            self.stdout.write(
+                f"{strategy:<14} {percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f} "
+                f"{timings[-1]:>8.2f} {rows / len(samples):>10.1f}"
+            )
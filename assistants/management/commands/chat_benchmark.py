@@ -0,0 +1,203 @@
+import json
+import secrets
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from assistants.models import Assistant, AssistantPermission, AssistantUserAccess
+
+MODES = {
+    "sync": "chat/",
+    "async": "chat/async/",
+    "stream": "chat/?stream=1",
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (which must be sorted)."""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+def last_event(body):
+    """Name of the last Server-Sent Event in ``body``, or None."""
+    events = [line[len("event:"):].strip() for line in body.splitlines() if line.startswith("event:")]
+    return events[-1] if events else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive /api/assistants/<id>/chat/ on a running server with N concurrent "
+        "users and report latency percentiles and throughput. Pair it with "
+        "'manage.py fake_openai' to take OpenAI out of the measurement. The "
+        "users it creates (and their threads, messages and the 'Benchmark' "
+        "assistant) are deleted again when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server under test.")
+        parser.add_argument("--users", type=int, default=10, help="Concurrent users.")
+        parser.add_argument("--requests", type=int, default=10, help="Messages per user.")
+        parser.add_argument("--mode", choices=sorted(MODES), default="sync")
+        parser.add_argument(
+            "--assistant",
+            help="Assistant id to chat with; by default a 'Benchmark' assistant is created.",
+        )
+        parser.add_argument(
+            "--password", help="Password of the benchmark users (default: a random one).",
+        )
+        parser.add_argument("--timeout", type=float, default=300)
+        parser.add_argument(
+            "--keep", action="store_true", help="Don't delete the benchmark users afterwards.",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Run even though DEBUG is off.",
+        )
+
+    def handle(self, *args, url, users, requests, mode, assistant, password, timeout,
+               keep, force, **options):
+        if not settings.DEBUG and not force:
+            raise CommandError(
+                "chat_benchmark creates (and afterwards deletes) users and an assistant "
+                "in this database; refusing to run with DEBUG off (pass --force to run anyway)"
+            )
+        if users < 1:
+            raise CommandError("--users must be at least 1")
+        password = password or secrets.token_urlsafe(16)
+        accounts = self._users(users, password)
+        try:
+            self._run(accounts, url, requests, mode, assistant, password, timeout)
+        finally:
+            if keep:
+                self.stdout.write(f"kept users {accounts[0].username}…{accounts[-1].username}")
+            else:
+                # cascades to their threads, messages, shares and owned assistants
+                get_user_model().objects.filter(pk__in=[u.pk for u in accounts]).delete()
+
+    def _run(self, accounts, url, requests, mode, assistant, password, timeout):
+        users = len(accounts)
+        asst = self._assistant(assistant, accounts)
+        base = url.rstrip("/")
+        tokens = [self._token(base, user.username, password) for user in accounts]
+        endpoint = f"{base}/api/assistants/{asst.id}/{MODES[mode]}"
+
+        self.stdout.write(
+            f"{users} users × {requests} messages → {endpoint}"
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            results = [
+                r
+                for batch in pool.map(
+                    lambda token: self._converse(endpoint, token, requests, timeout), tokens
+                )
+                for r in batch
+            ]
+        elapsed = time.perf_counter() - started
+        self._report(results, elapsed, streamed=(mode == "stream"))
+
+    # ── setup ─────────────────────────────────────────────────────────────
+    def _users(self, count, password):
+        """``count`` new users, tagged with a per-run prefix so that existing
+        accounts are never touched and the run's rows can be told apart."""
+        User = get_user_model()
+        tag = secrets.token_hex(4)
+        accounts = []
+        for i in range(count):
+            user = User(username=f"bench-{tag}-{i}")
+            user.set_password(password)
+            user.save()
+            accounts.append(user)
+        return accounts
+
+    def _assistant(self, assistant_id, accounts):
+        if assistant_id:
+            try:
+                asst = Assistant.objects.get(pk=assistant_id)
+            except (Assistant.DoesNotExist, ValueError):
+                raise CommandError(f"Assistant {assistant_id} not found")
+        else:
+            asst = Assistant.objects.create(
+                name="Benchmark", owner=accounts[0], openai_id="asst_benchmark",
+            )
+        # every user talks in their own thread, so they don't queue behind each other
+        for user in accounts:
+            if user.pk != asst.owner_id:
+                AssistantUserAccess.objects.get_or_create(
+                    assistant=asst, user=user,
+                    defaults={"permission": AssistantPermission.USE},
+                )
+        return asst
+
+    def _token(self, base, username, password):
+        resp = self._post(f"{base}/api/token/", {"username": username, "password": password})
+        return json.loads(resp.read())["access"]
+
+    # ── load ──────────────────────────────────────────────────────────────
+    def _post(self, url, payload, token=None, timeout=30):
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def _converse(self, endpoint, token, count, timeout):
+        results = []
+        for i in range(count):
+            start = time.perf_counter()
+            first_byte = None
+            try:
+                with self._post(endpoint, {"content": f"benchmark message {i}"}, token, timeout) as resp:
+                    first = resp.read(1)
+                    first_byte = time.perf_counter() - start if first else None
+                    body = first + resp.read()
+                    status = resp.status
+                # a stream that fails upstream still answers 200, ending in an error event
+                streamed = resp.headers.get_content_type() == "text/event-stream"
+                if streamed and last_event(body.decode(errors="replace")) != "done":
+                    status = "stream error"
+            except urllib.error.HTTPError as exc:
+                status = exc.code
+            except OSError:
+                status = None
+            results.append((status, time.perf_counter() - start, first_byte))
+        return results
+
+    # ── report ────────────────────────────────────────────────────────────
+    def _report(self, results, elapsed, streamed):
+        ok = sorted(latency for status, latency, _ in results if status == 200)
+        failed = len(results) - len(ok)
+        self.stdout.write(f"requests:   {len(results)} ({failed} failed)")
+        self.stdout.write(f"wall time:  {elapsed:.2f}s")
+        self.stdout.write(f"throughput: {len(ok) / elapsed:.2f} req/s")
+        self._percentiles("latency", ok)
+        if streamed:
+            ttfb = sorted(fb for status, _, fb in results if status == 200 and fb is not None)
+            self._percentiles("first byte", ttfb)
+        if failed:
+            by_status = {}
+            for status, _, _ in results:
+                if status != 200:
+                    by_status[status] = by_status.get(status, 0) + 1
+            self.stdout.write(
+                "failures:   " + ", ".join(f"{s or 'no response'}×{n}" for s, n in sorted(
+                    by_status.items(), key=lambda item: str(item[0])
+                ))
+            )
+
+    def _percentiles(self, label, values):
+        self.stdout.write(
+            f"{label + ':':<11} "
+            + "  ".join(
+                f"p{p}={percentile(values, p) * 1000:.0f}ms" for p in (50, 95, 99)
+            )
+        )
@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from assistants.jobs import execute_job, make_worker_id
+from assistants.models import ChatJob
+
+
+class Command(BaseCommand):
+    help = "Process queued chat jobs (POST /chat/?background=1)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.CHAT_WORKER_CONCURRENCY,
+            help="Number of jobs to run at the same time.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Drain the queue once and exit instead of waiting for new jobs.",
+        )
+
+    def handle(self, *args, concurrency, once, **options):
+        worker_id = make_worker_id()
+        self.stdout.write(f"chat worker {worker_id} started ({concurrency} slots)")
+        running = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                running = {f for f in running if not f.done()}
+                job = None
+                if len(running) < concurrency:
+                    job = ChatJob.objects.claim_next(
+                        worker_id, settings.CHAT_JOB_LEASE_SECONDS
+                    )
+                if job is not None:
+                    running.add(pool.submit(self._execute, job, worker_id))
+                    continue
+                if once and not running:
+                    return
+                time.sleep(settings.CHAT_WORKER_IDLE_SLEEP)
+
+    @staticmethod
+    def _execute(job, worker_id):
+        try:
+            execute_job(job, worker_id)
+        finally:
+            close_old_connections()
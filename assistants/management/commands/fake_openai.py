@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from assistants.fake_openai import make_server
+
+
+class Command(BaseCommand):
+    help = "Serve a local fake OpenAI API for load tests (see chat_benchmark)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--run-latency", type=float, default=1.0,
+            help="Seconds a run takes to complete.",
+        )
+        parser.add_argument(
+            "--jitter", type=float, default=0.0,
+            help="Random ± seconds added to every run's latency.",
+        )
+        parser.add_argument(
+            "--failure-rate", type=float, default=0.0,
+            help="Fraction of runs (0–1) that end as 'failed'.",
+        )
+        parser.add_argument(
+            "--stream-chunks", type=int, default=10,
+            help="Number of deltas a streamed reply is split into.",
+        )
+
+    def handle(self, *args, host, port, run_latency, jitter, failure_rate,
+               stream_chunks, **options):
+        server = make_server(
+            host, port,
+            run_latency=run_latency,
+            jitter=jitter,
+            failure_rate=failure_rate,
+            stream_chunks=stream_chunks,
+        )
+        host, port = server.server_address[:2]
+        self.stdout.write(f"fake OpenAI API listening on http://{host}:{port}/v1")
+        self.stdout.write(f"  export OPENAI_BASE_URL=http://{host}:{port}/v1 OPENAI_API_KEY=fake")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from assistants.storage import close_all, log_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the old one-file-per-message JSON files "
+        "(CONVERSATION_LOG_DIR/<assistant>/<message>.json) into the segment log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep", action="store_true",
+            help="Leave the JSON files in place after importing them.",
+        )
+
+    def handle(self, *args, keep, **options):
+        root = Path(settings.CONVERSATION_LOG_DIR)
+        root.mkdir(parents=True, exist_ok=True)
+        total = 0
+        for assistant_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+            files = list(assistant_dir.glob("*.json"))
+            if not files:
+                continue
+            records = sorted(
+                (json.loads(f.read_text()) for f in files),
+                key=lambda r: (r["created_at"], r["id"]),
+            )
+            log = log_for(assistant_dir.name)
+            for record in records:
+                log.append(record["id"], record)
+            log.sync()
+            if not keep:
+                for f in files:
+                    f.unlink()
+            total += len(records)
+            self.stdout.write(f"{assistant_dir.name}: {len(records)} messages")
+        close_all()
+        self.stdout.write(f"imported {total} messages")
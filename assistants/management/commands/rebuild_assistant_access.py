@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from assistants.access import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the effective-access table from assistant owners and shares "
+        "(after bulk changes that bypassed model signals)."
+    )
+
+    def handle(self, *args, **options):
+        rows = refresh()
+        self.stdout.write(self.style.SUCCESS(f"assistant access rebuilt ({rows} rows)"))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from assistants.search import FTS_TABLE, create_triggers, missing_triggers
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text index of messages (run once after migrating, "
+        "and after a VACUUM, which may renumber message rowids)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Messages indexed per transaction.",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Full-text search is only available on SQLite.")
+        # in one write transaction, so that messages saved from now on are
+        # exactly the ones past `last`, which the triggers index
+        with transaction.atomic(), connection.cursor() as cursor:
+            missing = missing_triggers(connection)
+            if missing:
+                # dropped when SQLite rebuilt the message table
+                self.stderr.write(f"re-creating missing triggers: {', '.join(sorted(missing))}")
+                create_triggers(cursor)
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute("SELECT coalesce(max(rowid), 0) FROM assistants_message")
+            last = cursor.fetchone()[0]
+        done = 0
+        # rowid ranges keep every batch an index range scan; none goes past
+        # `last`, or it would index the triggers' rows a second time
+        for start in range(0, last, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {FTS_TABLE} (rowid, content, thread, message_id)
+                    SELECT rowid, content, 't' || coalesce(thread_id, ''), id
+                    FROM assistants_message
+                    WHERE rowid > %s AND rowid <= %s
+                    """,
+                    [start, min(start + batch_size, last)],
+                )
+                done += cursor.rowcount
+            self.stdout.write(f"indexed {done} messages")
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS(f"search index rebuilt ({done} messages)"))
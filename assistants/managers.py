@@ -1,11 +1,135 @@
+import operator
+from datetime import timedelta
+from functools import reduce
+from django.conf import settings
 from django.db import models
-from django.db.models import Q
+from django.db.models import Case, CharField, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+
+# ways of finding a user's assistants, compared by manage.py access_benchmark
+ACCESS_STRATEGIES = ("materialized", "exists", "union", "join")
 
 
 class AssistantQuerySet(models.QuerySet):
-    def for_user(self, user):
+    def for_user(self, user, strategy=None):
+        """Assistants ``user`` owns or has a share on.
+
+        ``strategy`` (default ``settings.ASSISTANT_ACCESS_STRATEGY``) picks the
+        query; all of them return the same rows:
+
+        * ``materialized``: one indexed lookup in ``AssistantAccess``
+          (assistants/access.py);
+        * ``exists``: owner OR an EXISTS subquery per share table;
+        * ``union``: ``pk IN`` the UNION of the three id sets;
+        * ``join``: the share tables LEFT JOINed, then DISTINCT.
+        """
+        return getattr(self, f"_for_user_{_strategy(strategy)}")(user)
+
+    def _for_user_materialized(self, user):
+        return self.filter(effective_access__user_id=user.pk)
+
+    def _shares(self, user):
+        """The user-share and, if ``user`` has a department, department-share
+        rows that give ``user`` access."""
+        meta = self.model._meta
+        shares = [meta.get_field("user_access").related_model.objects.filter(user_id=user.pk)]
+        if getattr(user, "department_id", None):
+            shares.append(
+                meta.get_field("dept_access").related_model.objects.filter(
+                    department_id=user.department_id
+                )
+            )
+        return shares
+
+    def _for_user_exists(self, user):
+        q = Q(owner_id=user.pk)
+        for shares in self._shares(user):
+            q |= Exists(shares.filter(assistant=OuterRef("pk")))
+        return self.filter(q)
+
+    def _for_user_union(self, user):
+        owned = self.model.objects.filter(owner_id=user.pk).values("pk")
+        ids = owned.union(*(shares.values("assistant_id") for shares in self._shares(user)))
+        return self.filter(pk__in=ids)
+
+    def _for_user_join(self, user):
         q = Q(owner=user) | Q(user_access__user=user)
         if getattr(user, "department_id", None):
             q |= Q(dept_access__department_id=user.department_id)
         return self.filter(q).distinct()
 
+    def with_permission(self, user, strategy=None):
+        """Annotate ``effective_permission``: ``user``'s permission on each
+        assistant (``"edit"``, ``"use"`` or None), as ``permission_for``
+        resolves it, computed in the same SQL statement as the rows.
+
+        ``materialized`` reads it from ``AssistantAccess``; every other
+        strategy works it out from the owner and the share tables.
+        """
+        if _strategy(strategy) == "materialized":
+            access = self.model._meta.get_field("effective_access").related_model
+            permission = Subquery(
+                access.objects.filter(assistant=OuterRef("pk"), user_id=user.pk).values("permission")[:1]
+            )
+        else:
+            permission = self._permission_from_shares(user)
+        return self.annotate(effective_permission=permission)
+
+    def _permission_from_shares(self, user):
+        from .models import AssistantPermission
+
+        shares = [s.filter(assistant=OuterRef("pk")) for s in self._shares(user)]
+        edit = [Exists(s.filter(permission=AssistantPermission.EDIT)) for s in shares]
+        return Case(
+            When(owner_id=user.pk, then=Value(AssistantPermission.EDIT)),
+            When(reduce(operator.or_, edit), then=Value(AssistantPermission.EDIT)),
+            When(reduce(operator.or_, map(Exists, shares)), then=Value(AssistantPermission.USE)),
+            default=None,
+            output_field=CharField(),
+        )
+
+
+def _strategy(strategy):
+    strategy = strategy or settings.ASSISTANT_ACCESS_STRATEGY
+    if strategy not in ACCESS_STRATEGIES:
+        raise ValueError(f"unknown access strategy {strategy!r}")
+    return strategy
+
+
+class ChatJobQuerySet(models.QuerySet):
+    def claimable(self, now=None):
+        """Queued jobs, plus running jobs whose worker let the lease lapse."""
+        now = now or timezone.now()
+        return self.filter(
+            Q(status="queued") | Q(status="running", lease_expires_at__lt=now)
+        )
+
+    def claim_next(self, worker_id, lease_seconds):
+        """Atomically lease the oldest claimable job to ``worker_id``.
+
+        The UPDATE re-checks the claimable condition, so when several workers
+        race for the same row only one of them gets ``updated == 1``.
+        """
+        now = timezone.now()
+        for pk in self.claimable(now).order_by("created_at").values_list("pk", flat=True)[:10]:
+            updated = self.claimable(now).filter(pk=pk).update(
+                status="running",
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+            if updated:
+                return self.get(pk=pk)
+        return None
+
+    def renew_lease(self, job, worker_id, lease_seconds):
+        """Extend ``job``'s lease; False means another worker has taken it."""
+        now = timezone.now()
+        return bool(
+            self.filter(pk=job.pk, lease_owner=worker_id, status="running").update(
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                updated_at=now,
+            )
+        )
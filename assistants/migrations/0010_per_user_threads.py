@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_threads_to_owner(apps, schema_editor):
+    """The shared ``Assistant.thread_id`` becomes the owner's ``chat.Thread``,
+    and the existing history is attached to it."""
+    Assistant = apps.get_model('assistants', 'Assistant')
+    Message = apps.get_model('assistants', 'Message')
+    Thread = apps.get_model('chat', 'Thread')
+    for assistant in Assistant.objects.all().iterator():
+        has_messages = Message.objects.filter(assistant=assistant, thread__isnull=True).exists()
+        if not assistant.thread_id and not has_messages:
+            continue
+        thread, _ = Thread.objects.get_or_create(assistant=assistant, user_id=assistant.owner_id)
+        if assistant.thread_id and not thread.openai_id:
+            thread.openai_id = assistant.thread_id
+            thread.save(update_fields=['openai_id'])
+        Message.objects.filter(assistant=assistant, thread__isnull=True).update(thread=thread)
+
+
+def move_threads_back(apps, schema_editor):
+    Assistant = apps.get_model('assistants', 'Assistant')
+    Thread = apps.get_model('chat', 'Thread')
+    for thread in Thread.objects.filter(openai_id__isnull=False).select_related('assistant'):
+        if thread.user_id == thread.assistant.owner_id:
+            Assistant.objects.filter(pk=thread.assistant_id).update(thread_id=thread.openai_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0009_chatjob'),
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.thread'),
+        ),
+        migrations.RunPython(move_threads_to_owner, move_threads_back),
+        migrations.RemoveField(
+            model_name='assistant',
+            name='thread_id',
+        ),
+    ]
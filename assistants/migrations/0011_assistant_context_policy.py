@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0010_per_user_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assistant',
+            name='context_strategy',
+            field=models.CharField(choices=[('full', 'Full thread'), ('last_messages', 'Last N messages'), ('summary', 'Rolling summary + last N messages')], default='full', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='assistant',
+            name='context_last_messages',
+            field=models.PositiveIntegerField(default=20),
+        ),
+        migrations.AddField(
+            model_name='assistant',
+            name='max_prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Full-text index of Message.content (see assistants/search.py).  A regular
+# FTS5 table whose rowid mirrors the message's rowid, kept in sync by
+# triggers.  ``thread`` holds the message's thread as a single token so a
+# search can be restricted to the caller's threads inside the index.
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE assistants_message_fts USING fts5(
+        content,
+        thread,
+        message_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER assistants_message_fts_ai AFTER INSERT ON assistants_message BEGIN
+        INSERT INTO assistants_message_fts (rowid, content, thread, message_id)
+        VALUES (new.rowid, new.content, 't' || coalesce(new.thread_id, ''), new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER assistants_message_fts_ad AFTER DELETE ON assistants_message BEGIN
+        DELETE FROM assistants_message_fts WHERE rowid = old.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER assistants_message_fts_au AFTER UPDATE OF content, thread_id ON assistants_message BEGIN
+        UPDATE assistants_message_fts
+        SET content = new.content, thread = 't' || coalesce(new.thread_id, '')
+        WHERE rowid = old.rowid;
+    END
+    """,
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS assistants_message_fts_au",
+    "DROP TRIGGER IF EXISTS assistants_message_fts_ad",
+    "DROP TRIGGER IF EXISTS assistants_message_fts_ai",
+    "DROP TABLE IF EXISTS assistants_message_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return  # search falls back to LIKE on other databases
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0012_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD), _run(BACKWARD)),
+    ]
@@ -0,0 +1,67 @@
+from importlib import import_module
+from django.db import migrations, models
+
+search = import_module('assistants.migrations.0013_message_search')
+
+
+def restore_search_index(apps, schema_editor):
+    """Re-create the full-text triggers and rows after SQLite rebuilt the table.
+
+    Adding these columns makes SQLite copy ``assistants_message`` into a new
+    table, which drops its triggers and may renumber the rowids the index is
+    keyed on.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in search.BACKWARD[:3] + search.FORWARD[1:]:
+        schema_editor.execute(sql)
+    schema_editor.execute("DELETE FROM assistants_message_fts")
+    schema_editor.execute(
+        """
+        INSERT INTO assistants_message_fts (rowid, content, thread, message_id)
+        SELECT rowid, content, 't' || coalesce(thread_id, ''), id FROM assistants_message
+        """
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0013_message_search'),
+    ]
+
+    operations = [
+        # runs last when migrating backwards, after the columns are dropped
+        migrations.RunPython(migrations.RunPython.noop, restore_search_index),
+        migrations.AddField(
+            model_name='message',
+            name='model',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='total_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='run_duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='polls',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(restore_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Same as ``manage.py rebuild_assistant_access``, on the historical models."""
+    Assistant = apps.get_model('assistants', 'Assistant')
+    AssistantUserAccess = apps.get_model('assistants', 'AssistantUserAccess')
+    AssistantDepartmentAccess = apps.get_model('assistants', 'AssistantDepartmentAccess')
+    AssistantAccess = apps.get_model('assistants', 'AssistantAccess')
+
+    grants = {}
+    rows = list(AssistantUserAccess.objects.values_list('user_id', 'assistant_id', 'permission'))
+    rows += AssistantDepartmentAccess.objects.filter(department__users__isnull=False).values_list(
+        'department__users', 'assistant_id', 'permission'
+    )
+    rows += [(owner, pk, 'edit') for owner, pk in Assistant.objects.values_list('owner_id', 'pk')]
+    for user_id, assistant_id, permission in rows:
+        if grants.get((user_id, assistant_id)) != 'edit':
+            grants[user_id, assistant_id] = permission
+    AssistantAccess.objects.bulk_create(
+        [
+            AssistantAccess(user_id=user_id, assistant_id=assistant_id, permission=permission)
+            for (user_id, assistant_id), permission in grants.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0014_message_usage'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssistantAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permission', models.CharField(choices=[('use', 'Use'), ('edit', 'Edit')], max_length=4)),
+                ('assistant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_access', to='assistants.assistant')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'assistant'), name='assistant_access_user_assistant')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistants', '0015_assistant_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatjob',
+            name='message_id',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
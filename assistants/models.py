@@ -4,7 +4,7 @@ SQLite-backed models for assistants and their messages.
 import uuid
 from django.db import models
 from django.conf import settings
-from .managers import AssistantQuerySet
+from .managers import AssistantQuerySet, ChatJobQuerySet
 
 # ─────────────────────────────────────────────────────────────────────────────
 #  Allowed assistant models
@@ -19,6 +19,13 @@ REASONING_EFFORT_CHOICES = [
 ]
 
 
+class ContextStrategy(models.TextChoices):
+    """How much of a conversation a run gets to see."""
+    FULL = "full", "Full thread"
+    LAST_MESSAGES = "last_messages", "Last N messages"
+    SUMMARY = "summary", "Rolling summary + last N messages"
+
+
 class AssistantPermission(models.TextChoices):
     USE = "use", "Use"
     EDIT = "edit", "Edit"
@@ -44,30 +51,33 @@ class Assistant(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     openai_id  = models.CharField(max_length=40, blank=True, null=True)  # asst_...
-    thread_id  = models.CharField(max_length=40, blank=True, null=True)  # thr_...
     vector_store_id = models.CharField(max_length=40, blank=True, null=True)
+    # context policy, see assistants/conversation.py
+    context_strategy = models.CharField(
+        max_length=16,
+        choices=ContextStrategy.choices,
+        default=ContextStrategy.FULL,
+    )
+    context_last_messages = models.PositiveIntegerField(default=20)
+    max_prompt_tokens = models.PositiveIntegerField(blank=True, null=True)
 
     objects = AssistantQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.name
 
-    def permission_for(self, user):
-        if user == self.owner:
+    def permission_for(self, user, strategy=None):
+        """``user``'s permission (``"edit"``, ``"use"`` or None), looked up the
+        way ``strategy`` (default ``settings.ASSISTANT_ACCESS_STRATEGY``) says."""
+        if user.pk is not None and user.pk == self.owner_id:
             return AssistantPermission.EDIT
-        perms = []
-        ua = self.user_access.filter(user=user).first()
-        if ua:
-            perms.append(ua.permission)
-        if getattr(user, "department_id", None):
-            da = self.dept_access.filter(department_id=user.department_id).first()
-            if da:
-                perms.append(da.permission)
-        if AssistantPermission.EDIT in perms:
-            return AssistantPermission.EDIT
-        if AssistantPermission.USE in perms:
-            return AssistantPermission.USE
-        return None
+        if (strategy or settings.ASSISTANT_ACCESS_STRATEGY) == "materialized":
+            return AssistantAccess.objects.filter(assistant=self, user_id=user.pk).values_list(
+                "permission", flat=True
+            ).first()
+        return type(self).objects.filter(pk=self.pk).with_permission(user, strategy).values_list(
+            "effective_permission", flat=True
+        ).first()
 
 
 class AssistantUserAccess(models.Model):
@@ -88,14 +98,77 @@ class AssistantDepartmentAccess(models.Model):
         unique_together = ("assistant", "department")
 
 
+class AssistantAccess(models.Model):
+    """Effective permission of a user on an assistant (owner, user and
+    department shares combined); maintained by assistants/access.py."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+    assistant = models.ForeignKey(Assistant, related_name="effective_access", on_delete=models.CASCADE)
+    permission = models.CharField(max_length=4, choices=AssistantPermission.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "assistant"], name="assistant_access_user_assistant"),
+        ]
+
+
 class Message(models.Model):
     ROLE_CHOICES = [('system', 'system'), ('user', 'user'), ('assistant', 'assistant')]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     assistant = models.ForeignKey(Assistant, on_delete=models.CASCADE, related_name='messages')
+    thread = models.ForeignKey('chat.Thread', null=True, blank=True, on_delete=models.CASCADE, related_name='messages')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # the run that produced an assistant reply (rolled up by the usage app)
+    model = models.CharField(max_length=40, blank=True)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    total_tokens = models.PositiveIntegerField(null=True, blank=True)
+    run_duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    polls = models.PositiveSmallIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # keyset pagination of a conversation (assistants/pagination.py)
+            models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_keyset_idx'),
+        ]
+
+
+class ChatJob(models.Model):
+    """A chat turn queued for the background worker (``manage.py chat_worker``)."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assistant = models.ForeignKey(Assistant, on_delete=models.CASCADE, related_name="chat_jobs")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="chat_jobs")
+    content = models.TextField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    reply = models.ForeignKey(Message, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # upstream ids, so a job picked up again after a crash resumes its run
+    # (run_id) or at least doesn't post the user's message twice (message_id)
+    thread_id = models.CharField(max_length=40, blank=True)
+    message_id = models.CharField(max_length=40, blank=True)
+    run_id = models.CharField(max_length=40, blank=True)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChatJobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
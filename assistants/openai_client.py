@@ -0,0 +1,140 @@
+"""
+Process-wide OpenAI clients.
+
+Building ``openai.OpenAI(...)`` per request means a fresh HTTP connection
+pool (and TLS handshake) every time.  ``get_client`` creates one client per
+process on first use and returns the same instance afterwards, so keep-alive
+connections are reused across requests.  ``get_async_client`` does the same
+for ``openai.AsyncOpenAI``; async clients are bound to the event loop that
+opened their connections, so one is kept per running loop.
+
+Every client handed out is wrapped in ``InstrumentedClient``, which records
+the latency and failures of each call (``threads.runs.create``, ...) in the
+Prometheus metrics and retries transient failures (assistants/resilience.py;
+the SDK's own retries are switched off so the two don't multiply).
+
+Tests swap in fakes with ``override_client``::
+
+    with override_client(DummyClient()):
+        self.client.post(...)
+"""
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from django.conf import settings
+from . import resilience
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+_override = None
+_async_override = None
+
+
+def _client_options(http_client_class):
+    import httpx
+
+    return dict(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=settings.OPENAI_BASE_URL or None,
+        # retried by assistants.resilience instead
+        max_retries=0,
+        timeout=httpx.Timeout(
+            settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT
+        ),
+        http_client=http_client_class(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+        ),
+    )
+
+
+class InstrumentedClient:
+    """Transparent proxy that times every API call made through it and
+    applies the retry / timeout / circuit-breaker policy of
+    ``assistants.resilience``.
+
+    Attribute access is forwarded (and wrapped) all the way down to the
+    resource methods; the method name used as the metric label (and to look
+    up endpoint timeouts) is the attribute path without ``beta``, e.g.
+    ``threads.messages.list``.
+    """
+
+    __slots__ = ("_target", "_path")
+
+    def __init__(self, target, path=""):
+        self._target = target
+        self._path = path
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name.startswith("_") or isinstance(value, (str, bytes, int, float, bool)) or value is None:
+            return value
+        if name == "beta":
+            path = self._path
+        else:
+            path = f"{self._path}.{name}" if self._path else name
+        return InstrumentedClient(value, path)
+
+    def __call__(self, *args, **kwargs):
+        return resilience.call(self._path, self._target, args, kwargs)
+
+    def __repr__(self):
+        return f"InstrumentedClient({self._target!r})"
+
+
+def get_client():
+    """Return the shared ``openai.OpenAI`` client for this process."""
+    global _client
+    if _override is not None:
+        return InstrumentedClient(_override)
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import openai
+
+                _client = InstrumentedClient(
+                    openai.OpenAI(**_client_options(openai.DefaultHttpxClient))
+                )
+    return _client
+
+
+def get_async_client():
+    """Return the shared ``openai.AsyncOpenAI`` client for the running loop."""
+    if _async_override is not None:
+        return InstrumentedClient(_async_override)
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import openai
+
+        client = InstrumentedClient(
+            openai.AsyncOpenAI(**_client_options(openai.DefaultAsyncHttpxClient))
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def reset_clients():
+    """Drop the cached clients, e.g. after the API key has been rotated."""
+    global _client
+    with _lock:
+        _client = None
+        _async_clients.clear()
+
+
+@contextmanager
+def override_client(client=None, async_client=None):
+    """Make ``get_client``/``get_async_client`` return the given fakes."""
+    global _override, _async_override
+    previous = _override, _async_override
+    _override, _async_override = client, async_client
+    try:
+        yield
+    finally:
+        _override, _async_override = previous
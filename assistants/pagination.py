@@ -0,0 +1,91 @@
+"""
+Keyset pagination for conversation history.
+
+``/api/messages/`` returns the newest ``limit`` messages, oldest first.
+Older pages are fetched with ``?before=<message id>`` and newer ones with
+``?after=<message id>``; the response body stays a plain list and the
+neighbouring pages are advertised in a ``Link`` header::
+
+    Link: <…/api/messages/?assistant=…&before=…>; rel="prev",
+          <…/api/messages/?assistant=…&after=…>; rel="next"
+
+Pages are found by seeking on ``(created_at, id)`` from the cursor message,
+which the ``(thread, created_at, id)`` index answers directly, so a page
+costs the same whether the thread holds a hundred messages or millions.
+"""
+import uuid
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MessageKeysetPagination(BasePagination):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self._limit(request)
+        before = self._cursor(queryset, request, "before")
+        after = self._cursor(queryset, request, "after")
+        if before and after:
+            raise ValidationError("Pass either `before` or `after`, not both.")
+
+        if after:
+            page = list(
+                queryset.filter(
+                    Q(created_at__gt=after.created_at)
+                    | Q(created_at=after.created_at, id__gt=after.id)
+                ).order_by("created_at", "id")[: limit + 1]
+            )
+            self.has_newer, self.has_older = len(page) > limit, True
+            page = page[:limit]
+        else:
+            older = queryset
+            if before:
+                older = older.filter(
+                    Q(created_at__lt=before.created_at)
+                    | Q(created_at=before.created_at, id__lt=before.id)
+                )
+            page = list(older.order_by("-created_at", "-id")[: limit + 1])
+            self.has_older, self.has_newer = len(page) > limit, before is not None
+            page = page[:limit][::-1]
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        links = []
+        if self.page and self.has_older:
+            links.append(f'<{self._link("before", self.page[0].id)}>; rel="prev"')
+        if self.page and self.has_newer:
+            links.append(f'<{self._link("after", self.page[-1].id)}>; rel="next"')
+        headers = {"Link": ", ".join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def _link(self, param, message_id):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "after" if param == "before" else "before")
+        return replace_query_param(url, param, str(message_id))
+
+    @staticmethod
+    def _limit(request):
+        try:
+            limit = int(request.query_params.get("limit", settings.MESSAGE_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        return max(1, min(limit, settings.MESSAGE_MAX_PAGE_SIZE))
+
+    @staticmethod
+    def _cursor(queryset, request, param):
+        value = request.query_params.get(param)
+        if not value:
+            return None
+        try:
+            pk = uuid.UUID(value)
+        except ValueError:
+            raise ValidationError({param: "Not a valid message id."})
+        # looked up within the caller's queryset, so foreign ids are rejected
+        cursor = queryset.filter(pk=pk).only("id", "created_at").first()
+        if cursor is None:
+            raise ValidationError({param: "Unknown message id."})
+        return cursor
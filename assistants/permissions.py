@@ -1,13 +1,17 @@
 from rest_framework.permissions import BasePermission
+from .access import cached_permission
 
 
 class AssistantPermission(BasePermission):
     """Object-level permission checks for assistants."""
 
     def has_object_permission(self, request, view, obj):
-        perm = obj.permission_for(request.user)
+        if hasattr(obj, "effective_permission"):  # AssistantQuerySet.with_permission
+            perm = obj.effective_permission
+        else:
+            perm = cached_permission(obj, request.user)
         if view.action in ("retrieve", "execute"):
-            return perm in ("use", "edit") or obj.owner == request.user
+            return perm in ("use", "edit") or obj.owner_id == request.user.pk
         if view.action in ("update", "partial_update", "destroy"):
-            return perm == "edit" or obj.owner == request.user
+            return perm == "edit" or obj.owner_id == request.user.pk
         return False
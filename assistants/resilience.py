@@ -0,0 +1,290 @@
+"""
+Call policy for every OpenAI request.
+
+``InstrumentedClient`` (assistants/openai_client.py) sends each upstream call
+through ``call``, which adds:
+
+* per-endpoint timeouts: ``OPENAI_ENDPOINT_TIMEOUTS`` maps a method such as
+  ``threads.runs.retrieve`` to seconds, passed to the SDK as ``timeout``;
+  other methods keep the client's ``OPENAI_TIMEOUT``.
+* classified retries: transient failures are retried up to
+  ``OPENAI_MAX_RETRIES`` times, after the ``Retry-After`` the server asked
+  for or else an exponential backoff with full jitter
+  (``OPENAI_RETRY_BASE_DELAY`` doubling up to ``OPENAI_RETRY_MAX_DELAY``).
+  Reads and deletes are retried after connection errors, timeouts, 408, 429
+  and 5xx.  Calls that create or change something are only retried when
+  the request can't have been acted on (connection errors, 429, 502, 503),
+  so a run or message is never created twice.  A call never sleeps past
+  ``OPENAI_RETRY_BUDGET`` seconds from its start.
+* a circuit breaker: after ``OPENAI_BREAKER_THRESHOLD`` transient failures
+  in a row the process stops calling upstream for
+  ``OPENAI_BREAKER_COOLDOWN`` seconds, then lets one trial call through and
+  closes again if it gets an answer.
+
+A transient failure that outlasts its retries, and any call refused by the
+open breaker, raises ``UpstreamUnavailable`` (``CircuitOpen``), which DRF
+turns into ``503`` with ``Retry-After``.  Other errors (bad requests, 404,
+auth) are raised unchanged and straight away; the chat views answer them
+with ``UpstreamError`` (502) rather than a bare server error.
+"""
+import asyncio
+import functools
+import inspect
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from customgpt_backend.metrics import OPENAI_CIRCUIT_OPEN, OPENAI_RETRIES, observe_openai
+
+# methods that can safely run twice
+IDEMPOTENT = {"retrieve", "list", "delete", "content"}
+
+TIMEOUT_ERRORS = {"APITimeoutError", "TimeoutException"}
+CONNECTION_ERRORS = {"APIConnectionError", "TransportError"}
+
+
+class UpstreamUnavailable(APIException):
+    """OpenAI is failing or rate limiting us; DRF answers 503 + Retry-After."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The AI service is temporarily unavailable, please retry shortly."
+    default_code = "upstream_unavailable"
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = max(1, int(wait + 0.999))
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Refused without calling upstream because the breaker is open."""
+
+
+class UpstreamError(APIException):
+    """OpenAI rejected a call for a reason retrying won't fix."""
+
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = "The AI service could not handle the request."
+    default_code = "upstream_error"
+
+
+def as_upstream_error(exc):
+    """``UpstreamError`` for an SDK error (``openai.APIError``), else None."""
+    if isinstance(exc, APIException):
+        return None
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if "APIError" not in names and status_of(exc) is None:
+        return None
+    return UpstreamError(getattr(exc, "message", None) or str(exc) or None)
+
+
+def status_of(exc):
+    """HTTP status of an SDK error, or None."""
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _failure(exc):
+    """``"timeout"``, ``"connection"``, an HTTP status or None."""
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & TIMEOUT_ERRORS or isinstance(exc, TimeoutError):
+        return "timeout"
+    if names & CONNECTION_ERRORS or isinstance(exc, ConnectionError):
+        return "connection"
+    return status_of(exc)
+
+
+def is_transient(exc):
+    """Whether ``exc`` says upstream is struggling rather than we erred."""
+    failure = _failure(exc)
+    return failure in ("timeout", "connection", 408) or (
+        isinstance(failure, int) and failure >= 500
+    )
+
+
+def retryable(exc, idempotent):
+    failure = _failure(exc)
+    if failure == 429:
+        # an exhausted quota won't come back by waiting a few seconds
+        return getattr(exc, "code", None) != "insufficient_quota"
+    if failure in ("connection", 502, 503):
+        return True
+    return idempotent and is_transient(exc)
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait (``Retry-After``), or None."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            when = parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff before retry number ``attempt`` (0-based)."""
+    cap = min(settings.OPENAI_RETRY_MAX_DELAY, settings.OPENAI_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = None
+        self._trial = None  # when the half-open trial call started
+
+    def before_call(self):
+        """Raise ``CircuitOpen`` unless a call may go upstream now.
+
+        Returns a trial token when this call is the half-open trial (else
+        None); pass it to ``abandon`` if the call ends without an answer.
+        """
+        with self._lock:
+            if self._open_until is None:
+                return None
+            now = time.monotonic()
+            if now < self._open_until:
+                raise CircuitOpen(self._open_until - now)
+            # half open: only one trial call at a time, unless the last one
+            # went unanswered for a whole cooldown (e.g. never awaited)
+            if self._trial is not None and now < self._trial + settings.OPENAI_BREAKER_COOLDOWN:
+                raise CircuitOpen(1)
+            self._trial = now
+            return now
+
+    def abandon(self, trial):
+        """The trial call ended without an outcome (cancelled, interrupted):
+        let the next call be the trial."""
+        with self._lock:
+            if trial is not None and self._trial == trial:
+                self._trial = None
+
+    def record(self, transient):
+        with self._lock:
+            if not transient:
+                if self._open_until is not None:
+                    OPENAI_CIRCUIT_OPEN.set(0)
+                self._failures, self._open_until, self._trial = 0, None, None
+                return
+            self._failures += 1
+            if self._trial is not None or self._failures >= settings.OPENAI_BREAKER_THRESHOLD:
+                self._open_until = time.monotonic() + settings.OPENAI_BREAKER_COOLDOWN
+                self._trial = None
+                OPENAI_CIRCUIT_OPEN.set(1)
+
+    def reset(self):
+        self.record(False)
+
+
+breaker = CircuitBreaker()
+
+
+@functools.lru_cache(maxsize=512)
+def _accepts_timeout(func):
+    try:
+        return "timeout" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _with_timeout(path, func, kwargs):
+    seconds = settings.OPENAI_ENDPOINT_TIMEOUTS.get(path)
+    if seconds and "timeout" not in kwargs and _accepts_timeout(getattr(func, "__func__", func)):
+        kwargs = {**kwargs, "timeout": seconds}
+    return kwargs
+
+
+def _next_delay(path, exc, attempt, idempotent, deadline):
+    """Seconds to wait before retrying ``exc``, or None to give up."""
+    if attempt >= settings.OPENAI_MAX_RETRIES or not retryable(exc, idempotent):
+        return None
+    delay = retry_after(exc)
+    if delay is None:
+        delay = backoff(attempt)
+    if time.monotonic() + delay > deadline:
+        return None
+    OPENAI_RETRIES.labels(path, str(_failure(exc))).inc()
+    return delay
+
+
+def _give_up(exc):
+    if is_transient(exc) or _failure(exc) == 429:
+        wait = retry_after(exc) or settings.OPENAI_RETRY_MAX_DELAY
+        raise UpstreamUnavailable(wait) from exc
+    raise exc
+
+
+def call(path, func, args, kwargs):
+    """Call ``func`` (the SDK method at ``path``) under the policy.
+
+    Coroutine functions get their retries in ``_acall`` once awaited.
+    """
+    idempotent = path.rsplit(".", 1)[-1] in IDEMPOTENT
+    kwargs = _with_timeout(path, func, kwargs)
+    deadline = time.monotonic() + settings.OPENAI_RETRY_BUDGET
+    attempt = 0
+    while True:
+        trial = breaker.before_call()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            observe_openai(path, time.perf_counter() - start, exc)
+            breaker.record(is_transient(exc))
+            delay = _next_delay(path, exc, attempt, idempotent, deadline)
+            if delay is None:
+                _give_up(exc)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            breaker.abandon(trial)
+            raise
+        if inspect.isawaitable(result):
+            return _acall(path, func, args, kwargs, result, start, idempotent, deadline, trial)
+        observe_openai(path, time.perf_counter() - start)
+        breaker.record(False)
+        return result
+
+
+async def _acall(path, func, args, kwargs, pending, start, idempotent, deadline, trial):
+    attempt = 0
+    while True:
+        try:
+            result = await pending
+        except Exception as exc:
+            observe_openai(path, time.perf_counter() - start, exc)
+            breaker.record(is_transient(exc))
+            delay = _next_delay(path, exc, attempt, idempotent, deadline)
+            if delay is None:
+                _give_up(exc)
+            await asyncio.sleep(delay)
+            attempt += 1
+            trial = breaker.before_call()
+            start = time.perf_counter()
+            pending = func(*args, **kwargs)
+            continue
+        except BaseException:
+            # cancelled (e.g. the client went away): no verdict on upstream
+            breaker.abandon(trial)
+            raise
+        observe_openai(path, time.perf_counter() - start)
+        breaker.record(False)
+        return result
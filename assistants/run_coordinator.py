@@ -0,0 +1,146 @@
+"""
+One conversation turn at a time per ``chat.Thread``.
+
+OpenAI refuses a new run (or message) on a thread while another run on it is
+still active, so two turns on the same thread must not overlap.  Before a
+turn touches the upstream thread it takes the thread's run lease; a request
+that arrives while another turn is in progress waits for the lease instead
+of failing.
+
+The lease lives on the ``Thread`` row (``run_lock_owner`` /
+``run_lock_expires_at``) and is taken with a compare-and-set UPDATE, so it
+works across worker processes.  While held it is renewed in the background;
+if the holder dies it simply expires after ``THREAD_LOCK_TTL`` seconds.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from chat.models import Thread
+from customgpt_backend.metrics import CHAT_RUNS_IN_FLIGHT
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadBusy(Exception):
+    """The thread stayed busy for longer than the caller was willing to wait."""
+
+
+def _free(now):
+    return Q(run_lock_expires_at__isnull=True) | Q(run_lock_expires_at__lt=now)
+
+
+class ThreadLease:
+    """A held run lease on a thread; ``release()`` may be called repeatedly."""
+
+    def __init__(self, coordinator, thread_pk, token):
+        self._coordinator = coordinator
+        self.thread_pk = thread_pk
+        self.token = token
+        self._released = threading.Event()
+        # release() can race: a stream's close() against its generator's finally
+        self._release_lock = threading.Lock()
+
+    def renew(self):
+        now = timezone.now()
+        return bool(
+            Thread.objects.filter(pk=self.thread_pk, run_lock_owner=self.token).update(
+                run_lock_expires_at=now + timedelta(seconds=settings.THREAD_LOCK_TTL)
+            )
+        )
+
+    def release(self):
+        with self._release_lock:
+            if self._released.is_set():
+                return
+            self._released.set()
+        CHAT_RUNS_IN_FLIGHT.dec()
+        Thread.objects.filter(pk=self.thread_pk, run_lock_owner=self.token).update(
+            run_lock_owner="", run_lock_expires_at=None
+        )
+        self._coordinator._notify()
+
+    def keep_alive(self):
+        """Renew the lease until it is released (runs on its own thread).
+
+        Gives up after ``THREAD_LOCK_MAX_HOLD`` seconds so that a lease whose
+        holder never releases it (e.g. an abandoned stream) still expires.
+        """
+        give_up = time.monotonic() + settings.THREAD_LOCK_MAX_HOLD
+        try:
+            while not self._released.wait(settings.THREAD_LOCK_TTL / 3):
+                if time.monotonic() > give_up or not self.renew():
+                    return
+        except Exception:
+            logger.exception("Could not renew run lease on thread %s", self.thread_pk)
+        finally:
+            connection.close()
+
+
+class RunCoordinator:
+    def __init__(self):
+        # wakes waiters in this process as soon as a local holder releases
+        self._cond = threading.Condition()
+
+    def try_acquire(self, thread, token):
+        now = timezone.now()
+        return bool(
+            Thread.objects.filter(_free(now), pk=thread.pk).update(
+                run_lock_owner=token,
+                run_lock_expires_at=now + timedelta(seconds=settings.THREAD_LOCK_TTL),
+            )
+        )
+
+    def acquire(self, thread, timeout=None):
+        """Wait for ``thread``'s run lease and return a ``ThreadLease``.
+
+        Raises ``ThreadBusy`` after ``timeout`` seconds (default
+        ``settings.THREAD_LOCK_WAIT``).
+        """
+        if timeout is None:
+            timeout = settings.THREAD_LOCK_WAIT
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        with timing.phase("lock"):
+            while not self.try_acquire(thread, token):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ThreadBusy(f"thread {thread.pk} is busy")
+                with self._cond:
+                    self._cond.wait(min(remaining, settings.THREAD_LOCK_POLL_INTERVAL))
+        return self._hold(thread, token)
+
+    async def aacquire(self, thread, timeout=None):
+        """Async variant of ``acquire``; waits without blocking the loop."""
+        if timeout is None:
+            timeout = settings.THREAD_LOCK_WAIT
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        with timing.phase("lock"):
+            while not await sync_to_async(self.try_acquire)(thread, token):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ThreadBusy(f"thread {thread.pk} is busy")
+                await asyncio.sleep(min(remaining, settings.THREAD_LOCK_POLL_INTERVAL))
+        return self._hold(thread, token)
+
+    def _hold(self, thread, token):
+        lease = ThreadLease(self, thread.pk, token)
+        CHAT_RUNS_IN_FLIGHT.inc()
+        threading.Thread(target=lease.keep_alive, daemon=True).start()
+        return lease
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+run_coordinator = RunCoordinator()
@@ -0,0 +1,195 @@
+"""
+Shared poller for in-flight OpenAI runs.
+
+Instead of every chat request sleeping in its own ``runs.retrieve`` loop, a
+request hands its run to ``run_poller`` and blocks on the returned future.  A
+single background thread per process keeps a schedule of all tracked runs and
+polls each one when it is due, with a per-run backoff: runs are checked
+quickly at first and less and less often the longer they take (reasoning
+``o*`` models are allowed a longer maximum interval).  When a run reaches a
+terminal status its future is resolved, which wakes the waiting request.
+
+Async callers can await the same future via ``asyncio.wrap_future``.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from django.conf import settings
+from . import timing
+from .openai_client import get_client
+from .resilience import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+# statuses after which a run will not progress without our intervention
+TERMINAL_STATUSES = (
+    "completed",
+    "failed",
+    "cancelled",
+    "expired",
+    "incomplete",
+    "requires_action",
+)
+
+# give up on a run after this many consecutive ``runs.retrieve`` errors
+MAX_POLL_ERRORS = 3
+
+
+class RunFuture(Future):
+    """Future resolved with the finished run; ``polls`` counts retrieves."""
+
+    def __init__(self):
+        super().__init__()
+        self.polls = 0
+
+
+class _TrackedRun:
+    def __init__(self, thread_id, run_id, model):
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.future = RunFuture()
+        self.interval = settings.RUN_POLL_INITIAL_INTERVAL
+        if model.startswith("o"):
+            self.max_interval = settings.RUN_POLL_MAX_INTERVAL_REASONING
+        else:
+            self.max_interval = settings.RUN_POLL_MAX_INTERVAL
+        self.next_poll = time.monotonic() + self.interval
+        self.errors = 0
+
+
+class RunPoller:
+    """Multiplexes the polling of every in-flight run in this process."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._runs = {}
+        self._pid = None
+        self._thread = None
+        self._executor = None
+
+    def track(self, thread_id, run, model=""):
+        """Start watching ``run`` and return a ``RunFuture`` for its outcome."""
+        if run.status in TERMINAL_STATUSES:
+            future = RunFuture()
+            future.set_result(run)
+            return future
+
+        tracked = _TrackedRun(thread_id, run.id, model or "")
+        with self._cond:
+            self._ensure_started()
+            self._runs[run.id] = tracked
+            self._cond.notify()
+        return tracked.future
+
+    def wait(self, thread_id, run, model="", timeout=None):
+        """Block until ``run`` finishes and return the final run object.
+
+        Raises ``TimeoutError`` if it is still going after ``timeout``
+        seconds (default ``settings.RUN_POLL_TIMEOUT``).
+        """
+        return self.result(self.track(thread_id, run, model), run.id, timeout)
+
+    def result(self, future, run_id, timeout=None):
+        """Like ``wait`` for a future from ``track`` (whose ``polls`` you need)."""
+        if timeout is None:
+            timeout = settings.RUN_POLL_TIMEOUT
+        try:
+            with timing.phase("run_wait"):
+                return future.result(timeout=timeout)
+        except futures.TimeoutError:
+            self.untrack(run_id)
+            raise TimeoutError(f"run {run_id} still running after {timeout}s") from None
+        finally:
+            timing.describe("run_wait", f"{future.polls} polls")
+
+    def untrack(self, run_id):
+        with self._cond:
+            self._runs.pop(run_id, None)
+
+    def in_flight(self):
+        with self._cond:
+            return len(self._runs)
+
+    # ── internals ────────────────────────────────────────────────────────
+    def _ensure_started(self):
+        # after a fork (e.g. gunicorn --preload) the parent's thread is gone
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RUN_POLLER_WORKERS,
+            thread_name_prefix="run-poller",
+        )
+        self._thread = threading.Thread(
+            target=self._loop, name="run-poller", daemon=True
+        )
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._runs:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = [r for r in self._runs.values() if r.next_poll <= now]
+                if not due:
+                    next_due = min(r.next_poll for r in self._runs.values())
+                    # everything in flight → sleep until a retrieve returns
+                    self._cond.wait(None if next_due == float("inf") else next_due - now)
+                    continue
+                for tracked in due:
+                    # not rescheduled until its retrieve has come back
+                    tracked.next_poll = float("inf")
+            for tracked in due:
+                self._executor.submit(self._poll, tracked)
+
+    def _poll(self, tracked):
+        try:
+            run = get_client().beta.threads.runs.retrieve(
+                thread_id=tracked.thread_id,
+                run_id=tracked.run_id,
+            )
+        except CircuitOpen as exc:
+            # upstream is known to be down; look again once calls go through
+            # instead of giving up on the run
+            self._reschedule(tracked, delay=exc.wait)
+            return
+        except Exception as exc:
+            tracked.errors += 1
+            if tracked.errors >= MAX_POLL_ERRORS:
+                self._finish(tracked, exc=exc)
+            else:
+                self._reschedule(tracked)
+            return
+
+        tracked.errors = 0
+        tracked.future.polls += 1
+        if run.status in TERMINAL_STATUSES:
+            self._finish(tracked, run=run)
+        else:
+            tracked.interval = min(
+                tracked.interval * settings.RUN_POLL_BACKOFF, tracked.max_interval
+            )
+            self._reschedule(tracked)
+
+    def _reschedule(self, tracked, delay=None):
+        with self._cond:
+            tracked.next_poll = time.monotonic() + (tracked.interval if delay is None else delay)
+            self._cond.notify()
+
+    def _finish(self, tracked, run=None, exc=None):
+        with self._cond:
+            if self._runs.pop(tracked.run_id, None) is None:
+                return  # the waiter gave up already
+        if exc is not None:
+            logger.warning("Giving up on run %s: %s", tracked.run_id, exc)
+            tracked.future.set_exception(exc)
+        else:
+            tracked.future.set_result(run)
+
+
+run_poller = RunPoller()
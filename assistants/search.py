@@ -0,0 +1,157 @@
+"""
+Full-text search over the caller's conversation history.
+
+On SQLite, messages are indexed in the ``assistants_message_fts`` FTS5 table
+(created with triggers in migration 0013, backfilled with
+``manage.py rebuild_message_search``).  Each row carries its thread as a
+token, so the caller's threads are matched inside the index together with
+the query and the cost of a search does not grow with other users' history.
+Results are ranked with bm25 and come with a highlighted snippet.
+
+Migrations that make SQLite rebuild the message table drop the triggers
+and may renumber rowids; they have to restore the index afterwards, as
+migration 0014 does.  One that forgets is caught after ``migrate``:
+``restore_search_triggers`` (a ``post_migrate`` handler) re-creates missing
+triggers and re-indexes every message.
+
+On other databases ``search_messages`` falls back to ``icontains``.
+"""
+import logging
+import re
+from importlib import import_module
+from django.db import connection, connections
+from chat.models import Thread
+from .models import Assistant, Message
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "assistants_message_fts"
+TRIGGERS = {f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"}
+
+SEARCH_SQL = f"""
+    SELECT {FTS_TABLE}.message_id,
+           snippet({FTS_TABLE}, 0, '[', ']', '…', 12),
+           bm25({FTS_TABLE}) AS rank
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY rank
+    LIMIT %s
+"""
+
+_TERM = re.compile(r'[^\s"]+\*?')
+
+
+def match_expression(query, thread_ids):
+    """FTS5 MATCH expression for ``query`` within ``thread_ids``.
+
+    Every word is quoted, so user input can't produce FTS syntax errors;
+    a trailing ``*`` keeps prefix matching.
+    """
+    terms = []
+    for term in _TERM.findall(query):
+        prefix = term.endswith("*") and len(term) > 1
+        word = term.rstrip("*")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    if not terms:
+        return None
+    threads = " OR ".join(f"t{tid.hex}" for tid in thread_ids)
+    return f"thread : ({threads}) AND content : ({' '.join(terms)})"
+
+
+def search_messages(user, query, assistant_id=None, limit=20):
+    """Ranked matches for ``query`` in ``user``'s accessible conversations."""
+    threads = Thread.objects.filter(
+        user=user, assistant_id__in=Assistant.objects.for_user(user).values("pk")
+    )
+    if assistant_id:
+        threads = threads.filter(assistant_id=assistant_id)
+    thread_ids = list(threads.values_list("id", flat=True))
+    if not thread_ids:
+        return []
+
+    if connection.vendor != "sqlite":
+        return _search_like(query, thread_ids, limit)
+
+    expression = match_expression(query, thread_ids)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [expression, limit])
+        hits = cursor.fetchall()
+    # rows of messages deleted behind the index's back simply drop out here
+    messages = Message.objects.in_bulk([Message._meta.pk.to_python(h[0]) for h in hits])
+    results = []
+    for message_id, snippet, rank in hits:
+        message = messages.get(Message._meta.pk.to_python(message_id))
+        if message is not None:
+            results.append(_result(message, snippet, rank))
+    return results
+
+
+def _search_like(query, thread_ids, limit):
+    words = query.split()
+    if not words:
+        return []
+    qs = Message.objects.filter(thread_id__in=thread_ids)
+    for word in words:
+        qs = qs.filter(content__icontains=word)
+    return [_result(m, m.content[:200], None) for m in qs.order_by("-created_at")[:limit]]
+
+
+def _result(message, snippet, rank):
+    return {
+        "id": message.id,
+        "assistant": message.assistant_id,
+        "thread": message.thread_id,
+        "role": message.role,
+        "created_at": message.created_at,
+        "snippet": snippet,
+        "rank": rank,
+    }
+
+
+def missing_triggers(connection):
+    """Index triggers absent from ``assistants_message`` (empty before the
+    index exists at all)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = %s OR tbl_name = 'assistants_message'",
+            [FTS_TABLE],
+        )
+        rows = cursor.fetchall()
+    if ("table", FTS_TABLE) not in rows:
+        return set()
+    return TRIGGERS - {name for kind, name in rows if kind == "trigger"}
+
+
+def restore_search_triggers(using="default", **kwargs):
+    """Re-create the index triggers if a table rebuild dropped them.
+
+    The rowids the index is keyed on may have changed with the rebuild, so
+    every message is indexed again.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    missing = missing_triggers(connection)
+    if not missing:
+        return
+    logger.warning("Full-text triggers %s were missing; rebuilding the message index",
+                   ", ".join(sorted(missing)))
+    with connection.cursor() as cursor:
+        create_triggers(cursor)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"""
+            INSERT INTO {FTS_TABLE} (rowid, content, thread, message_id)
+            SELECT rowid, content, 't' || coalesce(thread_id, ''), id FROM assistants_message
+            """
+        )
+
+
+def create_triggers(cursor):
+    """(Re-)create the index triggers, as migration 0013 defines them."""
+    migration = import_module("assistants.migrations.0013_message_search")
+    for sql in migration.BACKWARD[:3] + migration.FORWARD[1:]:
+        cursor.execute(sql)
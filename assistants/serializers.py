@@ -2,18 +2,30 @@ from rest_framework import serializers
 from .models import (
     Assistant,
     Message,
+    ChatJob,
     AssistantUserAccess,
     AssistantDepartmentAccess,
+    AssistantPermission,
     ALLOWED_MODELS,
     REASONING_EFFORT_CHOICES,
+    ContextStrategy,
 )
 
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = ['id', 'assistant', 'role', 'content', 'created_at']
-        read_only_fields = ['id', 'assistant', 'created_at']
+        fields = ['id', 'assistant', 'thread', 'role', 'content', 'created_at']
+        read_only_fields = ['id', 'assistant', 'thread', 'created_at']
+
+
+class ChatJobSerializer(serializers.ModelSerializer):
+    reply = serializers.CharField(source="reply.content", read_only=True, default=None)
+
+    class Meta:
+        model = ChatJob
+        fields = ['id', 'assistant', 'status', 'reply', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
 
 
 class AssistantSerializer(serializers.ModelSerializer):
@@ -28,14 +40,30 @@ class AssistantSerializer(serializers.ModelSerializer):
         default="medium",
         required=False,
     )
+    context_strategy = serializers.ChoiceField(
+        choices=ContextStrategy.choices,
+        default=ContextStrategy.FULL,
+        required=False,
+    )
+    context_last_messages = serializers.IntegerField(
+        min_value=1, max_value=100, default=20, required=False
+    )
+    # OpenAI rejects runs with a prompt budget below 256 tokens
+    max_prompt_tokens = serializers.IntegerField(
+        min_value=256, allow_null=True, default=None, required=False
+    )
 
     owner = serializers.SerializerMethodField()
     permission = serializers.SerializerMethodField()
-    messages = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
 
     class Meta:
         model = Assistant
-        fields = ['id', 'name', 'description', 'instructions', 'model', 'reasoning_effort', 'tools', 'created_at', 'owner', 'permission', 'messages']
+        fields = [
+            'id', 'name', 'description', 'instructions', 'model', 'reasoning_effort', 'tools',
+            'context_strategy', 'context_last_messages', 'max_prompt_tokens',
+            'created_at', 'owner', 'permission', 'messages',
+        ]
         read_only_fields = ['id', 'created_at']
 
     def validate_tools(self, value):
@@ -62,8 +90,21 @@ class AssistantSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if not request or not request.user:
             return None
+        if hasattr(obj, "effective_permission"):  # AssistantQuerySet.with_permission
+            return obj.effective_permission
         return obj.permission_for(request.user)
 
+    def get_messages(self, obj):
+        """Ids of the caller's own messages; other users' threads stay private."""
+        request = self.context.get("request")
+        if not request or not request.user:
+            return []
+        if hasattr(obj, "own_messages"):  # prefetched by AssistantViewSet
+            return [message.id for message in obj.own_messages]
+        return list(
+            obj.messages.filter(thread__user=request.user).values_list("id", flat=True)
+        )
+
 
 class AssistantShareUserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -75,3 +116,15 @@ class AssistantShareDeptSerializer(serializers.ModelSerializer):
     class Meta:
         model = AssistantDepartmentAccess
         fields = ("department", "permission")
+
+
+class ShareItemSerializer(serializers.Serializer):
+    """One item of a bulk share request (``grantee``: user or department id);
+    a revocation (``revoke=True``) has no ``permission``."""
+    grantee = serializers.IntegerField(min_value=1)
+    permission = serializers.ChoiceField(choices=AssistantPermission.choices)
+
+    def __init__(self, *args, revoke=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        if revoke:
+            del self.fields["permission"]
@@ -1,20 +1,326 @@
 """
-Write each message to   media/conversations/<assistant-id>/<message-id>.json
+Append-only conversation log, one per assistant, under
+``CONVERSATION_LOG_DIR/<assistant-id>/`` (default ``media/conversations``).
 Useful if you want a file-system backup or to feed Retrieval later.
+
+Messages are appended as JSON lines to numbered segment files::
+
+    00000001.jsonl[.gz|.zst]   closed segments (compressed if configured)
+    00000002.jsonl             the active segment
+    00000002.idx               offset index: (message uuid, offset, length)
+
+A segment is closed once it reaches ``CONVERSATION_LOG_SEGMENT_BYTES`` and,
+with ``CONVERSATION_LOG_COMPRESS = "gzip"`` or ``"zstd"`` (needs the
+``zstandard`` package), compressed.  Appends are flushed to the OS straight
+away but only fsync'ed every ``CONVERSATION_LOG_FSYNC_EVERY`` records or
+``CONVERSATION_LOG_FSYNC_INTERVAL`` seconds, so a burst of writes costs one
+disk sync.  Writers in different processes serialize on an ``flock`` of the
+assistant's directory lock file and, holding it, move on to the newest
+segment if another process has rotated since their last append.  Failing to
+log a message is logged and never fails saving it.
+
+``read_message`` finds a message through the index files (mmap'ed and
+searched in C) and slices it straight out of the mmap'ed segment;
+compressed segments are decompressed up to the record instead.
+``iter_messages`` reads a whole log sequentially.
 """
-from pathlib import Path
+import atexit
+import fcntl
+import gzip
 import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for CONVERSATION_LOG_COMPRESS="zstd"
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_RECORD = struct.Struct("<16sQI")  # message uuid, offset, length
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def _segment_name(seq):
+    return f"{seq:08d}.jsonl"
+
+
+class SegmentLog:
+    """The append-only log of one assistant's messages."""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync_every=100,
+                 fsync_interval=1.0, compress=""):
+        if compress and compress not in COMPRESSED_SUFFIXES:
+            raise ImproperlyConfigured(f"Unknown CONVERSATION_LOG_COMPRESS {compress!r}")
+        if compress == "zstd" and zstandard is None:
+            raise ImproperlyConfigured("CONVERSATION_LOG_COMPRESS='zstd' needs the zstandard package")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._seq = None
+        self._data_fd = self._index_fd = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # ── writing ───────────────────────────────────────────────────────────
+    def append(self, message_id, record):
+        """Append ``record`` (a JSON-serialisable dict) for ``message_id``."""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+        closed = None
+        with self._lock, self._exclusive():
+            self._open_active()
+            offset = os.fstat(self._data_fd).st_size
+            os.write(self._data_fd, line)
+            os.write(self._index_fd, INDEX_RECORD.pack(uuid.UUID(str(message_id)).bytes, offset, len(line)))
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            if offset + len(line) >= self.segment_bytes:
+                closed = self._rotate()
+        # outside the lock, so other writers don't wait for the compressor
+        if closed is not None and self.compress:
+            self._compress_segment(closed)
+
+    def sync(self):
+        with self._lock:
+            if self._data_fd is not None and self._unsynced:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._data_fd is not None:
+                if self._unsynced:
+                    self._sync()
+                os.close(self._data_fd)
+                os.close(self._index_fd)
+                self._data_fd = self._index_fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _exclusive(self):
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.directory / "LOCK", os.O_RDWR | os.O_CREAT, 0o644)
+        return _FileLock(self._lock_fd)
+
+    def _open_active(self):
+        # other processes may have rotated (any number of times) since we last
+        # wrote, and compressed and unlinked the segment we still hold open
+        latest = max(self._sequences(), default=1)
+        if self._seq != latest or not self._holds_active():
+            self._close_fds()
+            self._seq = latest
+        if self._data_fd is None:
+            self._open_fds()
+
+    def _holds_active(self):
+        if self._data_fd is None:
+            return True
+        try:
+            current = os.stat(self.directory / _segment_name(self._seq))
+        except FileNotFoundError:
+            return False
+        return os.path.samestat(os.fstat(self._data_fd), current)
+
+    def _open_fds(self):
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        self._data_fd = os.open(self.directory / _segment_name(self._seq), flags, 0o644)
+        self._index_fd = os.open(self.directory / f"{self._seq:08d}.idx", flags, 0o644)
+
+    def _close_fds(self):
+        if self._data_fd is not None:
+            if self._unsynced:
+                self._sync()
+            os.close(self._data_fd)
+            os.close(self._index_fd)
+            self._data_fd = self._index_fd = None
+
+    def _sync(self):
+        os.fsync(self._data_fd)
+        os.fsync(self._index_fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        closed = self._seq
+        self._close_fds()
+        self._seq += 1
+        # create the next segment first so other writers move on
+        self._open_fds()
+        return closed
 
-BASE = Path(__file__).resolve().parent.parent / 'media' / 'conversations'
-BASE.mkdir(parents=True, exist_ok=True)
+    def _compress_segment(self, seq):
+        source = self.directory / _segment_name(seq)
+        target = source.with_name(source.name + COMPRESSED_SUFFIXES[self.compress])
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            src = open(source, "rb")
+        except FileNotFoundError:
+            return  # another writer already compressed it
+        with src, open(tmp, "wb") as raw:
+            if self.compress == "gzip":
+                with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                    while chunk := src.read(1024 * 1024):
+                        out.write(chunk)
+            else:
+                zstandard.ZstdCompressor().copy_stream(src, raw)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, target)
+        source.unlink(missing_ok=True)
 
-def save_message_json(msg):
-    assistant_dir = BASE / str(msg.assistant_id)
-    assistant_dir.mkdir(exist_ok=True)
-    fp = assistant_dir / f"{msg.id}.json"
-    fp.write_text(json.dumps({
+    # ── reading ───────────────────────────────────────────────────────────
+    def _sequences(self):
+        return sorted({int(p.name[:8]) for p in self.directory.glob("*.idx")})
+
+    def _segment_path(self, seq):
+        plain = self.directory / _segment_name(seq)
+        for suffix in ("", ".gz", ".zst"):
+            path = plain.with_name(plain.name + suffix)
+            if path.exists():
+                return path
+        return None
+
+    def locate(self, message_id):
+        """Return ``(seq, offset, length)`` of a message, newest segment first."""
+        key = uuid.UUID(str(message_id)).bytes
+        for seq in reversed(self._sequences()):
+            index = self.directory / f"{seq:08d}.idx"
+            size = index.stat().st_size
+            size -= size % INDEX_RECORD.size  # ignore a torn last record
+            if not size:
+                continue
+            with open(index, "rb") as fh, mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                pos = mm.find(key)
+                while pos != -1 and pos % INDEX_RECORD.size:
+                    pos = mm.find(key, pos + 1)
+                if pos != -1:
+                    _, offset, length = INDEX_RECORD.unpack_from(mm, pos)
+                    return seq, offset, length
+        return None
+
+    def read(self, message_id):
+        """Return the stored record of ``message_id``, or None."""
+        found = self.locate(message_id)
+        if found is None:
+            return None
+        seq, offset, length = found
+        path = self._segment_path(seq)
+        if path is None:
+            return None
+        if path.suffix == ".jsonl":
+            with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return json.loads(mm[offset:offset + length])
+        with self._open_compressed(path) as fh:
+            fh.seek(offset)
+            return json.loads(fh.read(length))
+
+    def __iter__(self):
+        """Every record in the log, oldest first."""
+        for seq in self._sequences():
+            path = self._segment_path(seq)
+            if path is None:
+                continue
+            opener = open if path.suffix == ".jsonl" else self._open_compressed
+            with opener(path, "rb") as fh:
+                for line in fh:
+                    if line.endswith(b"\n"):
+                        yield json.loads(line)
+
+    @staticmethod
+    def _open_compressed(path, mode="rb"):
+        if path.suffix == ".gz":
+            return gzip.open(path, mode)
+        if zstandard is None:
+            raise ImproperlyConfigured(f"Reading {path.name} needs the zstandard package")
+        return zstandard.open(path, mode)
+
+
+class _FileLock:
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+# ── module API ───────────────────────────────────────────────────────────
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def log_for(assistant_id):
+    """The process-wide ``SegmentLog`` of an assistant."""
+    key = str(assistant_id)
+    log = _logs.get(key)
+    if log is None:
+        with _logs_lock:
+            log = _logs.get(key)
+            if log is None:
+                log = _logs[key] = SegmentLog(
+                    Path(settings.CONVERSATION_LOG_DIR) / key,
+                    segment_bytes=settings.CONVERSATION_LOG_SEGMENT_BYTES,
+                    fsync_every=settings.CONVERSATION_LOG_FSYNC_EVERY,
+                    fsync_interval=settings.CONVERSATION_LOG_FSYNC_INTERVAL,
+                    compress=settings.CONVERSATION_LOG_COMPRESS,
+                )
+    return log
+
+
+def append_message(msg):
+    """Append a ``Message`` to its assistant's log."""
+    log_for(msg.assistant_id).append(msg.id, {
         "id": str(msg.id),
+        "thread_id": str(msg.thread_id) if msg.thread_id else None,
         "role": msg.role,
         "content": msg.content,
-        "created_at": msg.created_at.isoformat()
-    }, indent=2))
+        "created_at": msg.created_at.isoformat(),
+    })
+
+
+def log_saved_message(sender, instance, created, raw=False, **kwargs):
+    """``post_save`` receiver: log new messages if ``CONVERSATION_LOG_ENABLED``.
+
+    The log is a backup, so failing to write it never fails the save.
+    """
+    if created and not raw and settings.CONVERSATION_LOG_ENABLED:
+        try:
+            append_message(instance)
+        except Exception:
+            logger.exception("Could not log message %s", instance.pk)
+
+
+def read_message(assistant_id, message_id):
+    return log_for(assistant_id).read(message_id)
+
+
+def iter_messages(assistant_id):
+    return iter(log_for(assistant_id))
+
+
+@atexit.register
+def close_all():
+    """Fsync and close every open log (also run at interpreter exit)."""
+    with _logs_lock:
+        logs = list(_logs.values())
+        _logs.clear()
+    for log in logs:
+        log.close()
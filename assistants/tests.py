@@ -3,9 +3,10 @@ from rest_framework.test import APIClient
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from .models import Assistant, Message
-from unittest.mock import MagicMock, patch
+from chat.models import Thread
+from .openai_client import override_client
+from unittest.mock import MagicMock
 import types
-import sys
 
 class DeleteAssistantTests(TestCase):
     def setUp(self):
@@ -22,9 +23,7 @@ class DeleteAssistantTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(delete=delete_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.delete(f'/api/assistants/{assistant.id}/')
 
         self.assertEqual(resp.status_code, 204)
@@ -45,9 +44,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=create_mock))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'Test',
                 'model': 'gpt-4',
@@ -65,9 +62,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=create_mock))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'FS',
                 'model': 'gpt-4o',
@@ -90,11 +85,9 @@ class CreateAssistantModelTests(TestCase):
                 )
                 self.files = types.SimpleNamespace(create=file_create_mock)
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
         file_obj = SimpleUploadedFile("foo.txt", b"data", content_type="text/plain")
 
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post(
                 '/api/assistants/',
                 {
@@ -115,9 +108,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=MagicMock()))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'Bad',
                 'model': 'gpt-4o',
@@ -134,9 +125,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=create_mock))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'O3',
                 'model': 'o:mini',
@@ -154,9 +143,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=create_mock))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'Low',
                 'model': 'o:mini',
@@ -173,9 +160,7 @@ class CreateAssistantModelTests(TestCase):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(create=MagicMock()))
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post('/api/assistants/', {
                 'name': 'TestBad',
                 'model': 'gpt-3.5-turbo',
@@ -201,9 +186,7 @@ class UpdateAssistantTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'New', 'description': 'new desc'},
@@ -239,9 +222,7 @@ class UpdateAssistantNoToolsTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'NewName'},
@@ -275,9 +256,7 @@ class UpdateMiniModelTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'Mini2'},
@@ -301,9 +280,7 @@ class UpdateMiniModelTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'Mini3', 'reasoning_effort': 'high'},
@@ -321,8 +298,10 @@ class ResetThreadTests(TestCase):
         self.owner = get_user_model().objects.create_user(username="own", password="pw")
 
     def test_reset_thread_deletes_remote_and_messages(self):
-        assistant = Assistant.objects.create(name='Test', thread_id='thr_123', owner=self.owner)
-        Message.objects.create(assistant=assistant, role='user', content='hi')
+        assistant = Assistant.objects.create(name='Test', owner=self.owner)
+        thread = Thread.objects.create(assistant=assistant, user=self.owner, openai_id='thr_123')
+        Message.objects.create(assistant=assistant, thread=thread, role='user', content='hi')
+        self.client.force_authenticate(self.owner)
 
         delete_mock = MagicMock()
 
@@ -330,14 +309,12 @@ class ResetThreadTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(threads=types.SimpleNamespace(delete=delete_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post(f'/api/assistants/{assistant.id}/reset/')
 
         self.assertEqual(resp.status_code, 204)
-        assistant.refresh_from_db()
-        self.assertIsNone(assistant.thread_id)
+        thread.refresh_from_db()
+        self.assertIsNone(thread.openai_id)
         self.assertFalse(Message.objects.filter(assistant=assistant).exists())
         delete_mock.assert_called_with('thr_123')
 
@@ -348,8 +325,11 @@ class MessageFilterTests(TestCase):
         self.owner = get_user_model().objects.create_user(username='own', password='pw')
         self.asst1 = Assistant.objects.create(name='A1', owner=self.owner)
         self.asst2 = Assistant.objects.create(name='A2', owner=self.owner)
-        Message.objects.create(assistant=self.asst1, role='user', content='hi1')
-        Message.objects.create(assistant=self.asst2, role='user', content='hi2')
+        thread1 = Thread.objects.create(assistant=self.asst1, user=self.owner)
+        thread2 = Thread.objects.create(assistant=self.asst2, user=self.owner)
+        Message.objects.create(assistant=self.asst1, thread=thread1, role='user', content='hi1')
+        Message.objects.create(assistant=self.asst2, thread=thread2, role='user', content='hi2')
+        self.client.force_authenticate(self.owner)
 
     def test_filter_by_assistant(self):
         resp = self.client.get('/api/messages/', {'assistant': self.asst1.id})
@@ -384,11 +364,9 @@ class UpdateVectorStoreTests(TestCase):
                 )
                 self.files = types.SimpleNamespace(create=file_upload_mock)
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
         file_obj = SimpleUploadedFile('foo.txt', b'data', content_type='text/plain')
 
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'VS', 'files': [file_obj]},
@@ -417,9 +395,7 @@ class UpdateVectorStoreTests(TestCase):
                 )
                 self.files = types.SimpleNamespace(create=MagicMock())
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'name': 'VS', 'remove_files': ['fileA']},
@@ -446,9 +422,7 @@ class ClearToolsTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'tools': ''},
@@ -479,9 +453,7 @@ class ClearToolsTests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'tools': '[]'},
@@ -523,9 +495,7 @@ class DisableFileSearchClearsVectorStoreFilesTests(TestCase):
                     files=types.SimpleNamespace(list=list_mock, delete=delete_mock)
                 )
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f'/api/assistants/{assistant.id}/',
                 {'tools': ''},
@@ -574,9 +544,7 @@ class VectorStoreFilesViewTests(TestCase):
                 )
                 self.files = types.SimpleNamespace(retrieve=retrieve_mock)
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.get(
                 f'/api/assistants/{assistant.id}/vector-store/files/'
             )
@@ -612,9 +580,7 @@ class VectorStoreFileViewTests(TestCase):
                     files=types.SimpleNamespace(delete=delete_mock)
                 )
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-
-        with patch.dict(sys.modules, {'openai': dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.delete(
                 f'/api/assistants/{assistant.id}/vector-store/files/fileA/'
             )
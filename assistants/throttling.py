@@ -0,0 +1,136 @@
+"""
+Token-bucket rate limits for chat.
+
+Each user, and each department, has two buckets: one counted in requests and
+one in estimated OpenAI tokens (``estimate_tokens``).  A bucket holds up to a
+minute's worth of its limit and refills continuously, so short bursts pass
+while the sustained rate is capped.  A chat request has to fit in every
+bucket that applies to it; otherwise it is refused with ``429 Too Many
+Requests`` and a ``Retry-After`` header before anything is sent upstream.
+The chat views check only once the request has passed the permission check
+and validation, so refused requests never use up the caller's budget.
+
+The buckets live in a small SQLite database (``CHAT_RATE_LIMIT_DB``, default
+``var/ratelimit.sqlite3``) so every worker process on the host shares them.
+A check is one ``BEGIN IMMEDIATE`` transaction (see assistants/localdb.py),
+which serializes writers across processes.  If the database can't be
+reached in time the request is let through rather than failing chat
+altogether.
+
+Limits are per minute and off (0) unless configured::
+
+    CHAT_USER_REQUESTS_PER_MINUTE        CHAT_USER_TOKENS_PER_MINUTE
+    CHAT_DEPARTMENT_REQUESTS_PER_MINUTE  CHAT_DEPARTMENT_TOKENS_PER_MINUTE
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from .localdb import LocalDB
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """
+    CREATE TABLE bucket (
+        key     TEXT PRIMARY KEY,
+        level   REAL NOT NULL,
+        updated REAL NOT NULL
+    )
+    """,
+]
+
+
+def estimate_tokens(content):
+    """Rough token cost of a chat turn: ~4 characters per token of the
+    message plus ``CHAT_TOKENS_PER_TURN`` for instructions, history and the
+    reply."""
+    return math.ceil(len(content) / 4) + settings.CHAT_TOKENS_PER_TURN
+
+
+class TokenBuckets:
+    """Token buckets in a SQLite file shared by every process of the host."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = LocalDB(path, SCHEMA, timeout=settings.CHAT_RATE_LIMIT_TIMEOUT)
+
+    def take(self, demands, now=None):
+        """Take ``amount`` from every bucket in ``demands``, or from none.
+
+        ``demands`` is a list of ``(key, per_minute, amount)``.  Returns 0 if
+        they were all taken, otherwise the seconds until they would fit.
+        """
+        now = time.time() if now is None else now
+        keys = [key for key, _, _ in demands]
+        with self.db.transaction() as conn:
+            stored = {
+                key: (level, updated) for key, level, updated in conn.execute(
+                    f"SELECT key, level, updated FROM bucket WHERE key IN ({','.join('?' * len(keys))})",
+                    keys,
+                )
+            }
+            wait, levels = 0.0, []
+            for key, per_minute, amount in demands:
+                rate = per_minute / 60
+                level, updated = stored.get(key, (per_minute, now))
+                level = min(per_minute, level + max(0.0, now - updated) * rate)
+                # a turn bigger than the whole bucket still runs once it is full
+                amount = min(amount, per_minute)
+                if level < amount:
+                    wait = max(wait, (amount - level) / rate)
+                levels.append((key, level - amount))
+            if not wait:
+                conn.executemany(
+                    "INSERT INTO bucket (key, level, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+                    [(key, level, now) for key, level in levels],
+                )
+        return wait
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None or str(_buckets.path) != str(settings.CHAT_RATE_LIMIT_DB):
+            _buckets = TokenBuckets(settings.CHAT_RATE_LIMIT_DB)
+        return _buckets
+
+
+def chat_demands(user, content):
+    """The buckets a chat turn of ``user`` draws from."""
+    tokens = estimate_tokens(content)
+    limits = [
+        (f"user:{user.pk}", settings.CHAT_USER_REQUESTS_PER_MINUTE,
+         settings.CHAT_USER_TOKENS_PER_MINUTE),
+    ]
+    if user.department_id is not None:
+        limits.append((f"department:{user.department_id}",
+                       settings.CHAT_DEPARTMENT_REQUESTS_PER_MINUTE,
+                       settings.CHAT_DEPARTMENT_TOKENS_PER_MINUTE))
+    demands = []
+    for key, requests, token_limit in limits:
+        if requests:
+            demands.append((f"{key}:requests", requests, 1))
+        if token_limit:
+            demands.append((f"{key}:tokens", token_limit, tokens))
+    return demands
+
+
+def check_chat_rate(user, content):
+    """Seconds ``user`` must wait before this chat turn, 0 if it may run now."""
+    demands = chat_demands(user, content)
+    if not demands:
+        return 0
+    try:
+        return get_buckets().take(demands)
+    except sqlite3.Error:
+        logger.warning("rate limit store unavailable, letting the request through", exc_info=True)
+        return 0
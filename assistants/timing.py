@@ -0,0 +1,143 @@
+"""
+Per-request phase timings for the OpenAI-bound views.
+
+A view wrapped by ``ServerTimingMixin`` collects how long each phase of the
+request took — waiting for the thread's run lease, creating the upstream
+thread, posting the message, creating the run, waiting for it (with the
+number of polls), listing the reply, and time spent in the database — and
+reports them in a ``Server-Timing`` response header::
+
+    Server-Timing: lock;dur=0.4, thread;dur=212.0, msg_create;dur=180.3,
+                   run_create;dur=301.7, run_wait;dur=2411.9;desc="9 polls",
+                   msg_list;dur=150.2, db;dur=6.1;desc="11 queries",
+                   total;dur=3270.8
+
+The same numbers are logged on the ``assistants.timing`` logger (one line
+per request, the raw values in ``extra["timings"]``).
+
+Code on the request path marks a phase with ``with timing.phase("name"):``;
+outside a timed request that is a no-op, so the helpers can be shared with
+the background worker.  Phases may overlap (``db`` is measured inside the
+others) and a phase entered twice is summed.  For streamed responses the
+header covers everything up to the first byte.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger("assistants.timing")
+
+_current = contextvars.ContextVar("assistants_timing", default=None)
+
+
+class Timings:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.descriptions = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def describe(self, name, text):
+        self.descriptions[name] = text
+
+    def header(self):
+        parts = []
+        for name, seconds in self.durations.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if name in self.descriptions:
+                part += f';desc="{self.descriptions[name]}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def finish(self, response):
+        self.add("total", time.perf_counter() - self.started)
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = self.header()
+        logger.info(
+            "%s %s %s",
+            self.name,
+            response.status_code,
+            " ".join(f"{n}={s * 1000:.1f}ms" for n, s in self.durations.items()),
+            extra={
+                "timings": {n: round(s * 1000, 1) for n, s in self.durations.items()},
+                "timing_notes": dict(self.descriptions),
+            },
+        )
+
+
+def current():
+    """The ``Timings`` of the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def describe(name, text):
+    timings = _current.get()
+    if timings is not None:
+        timings.describe(name, text)
+
+
+@contextmanager
+def collect(name):
+    """Time everything inside the block into a fresh ``Timings``."""
+    timings = Timings(name)
+    token = _current.set(timings)
+    queries = [0]
+
+    def count_db(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add("db", time.perf_counter() - start)
+            queries[0] += 1
+
+    try:
+        with connection.execute_wrapper(count_db):
+            yield timings
+    finally:
+        _current.reset(token)
+        if queries[0]:
+            timings.describe("db", f"{queries[0]} queries")
+
+
+class ServerTimingMixin:
+    """Adds a ``Server-Timing`` header (and a timing log line) to a view."""
+
+    def dispatch(self, request, *args, **kwargs):
+        name = f"{type(self).__name__}.{request.method}"
+        if getattr(self, "view_is_async", False):
+            return self._timed_async_dispatch(name, request, *args, **kwargs)
+        with collect(name) as timings:
+            response = super().dispatch(request, *args, **kwargs)
+        timings.finish(response)
+        return response
+
+    async def _timed_async_dispatch(self, name, request, *args, **kwargs):
+        # the ORM runs in worker threads here, so ``db`` is not measured
+        timings = Timings(name)
+        token = _current.set(timings)
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        finally:
+            _current.reset(token)
+        timings.finish(response)
+        return response
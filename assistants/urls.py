@@ -3,7 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AssistantViewSet,
     MessageViewSet,
+    MessageExportView,
     ChatView,
+    ChatJobView,
     ResetThreadView,
     VectorStoreIdView,
     VectorStoreFilesView,
@@ -11,6 +13,7 @@ from .views import (
     AssistantUserShareViewSet,
     AssistantDeptShareViewSet,
 )
+from .async_views import AsyncChatView
 
 router = DefaultRouter()
 router.register('assistants', AssistantViewSet, basename='assistant')
@@ -23,6 +26,9 @@ user_share_list = AssistantUserShareViewSet.as_view({
 user_share_detail = AssistantUserShareViewSet.as_view({
     'delete': 'destroy',
 })
+user_share_bulk = AssistantUserShareViewSet.as_view({
+    'post': 'bulk',
+})
 
 dept_share_list = AssistantDeptShareViewSet.as_view({
     'get': 'list',
@@ -31,15 +37,27 @@ dept_share_list = AssistantDeptShareViewSet.as_view({
 dept_share_detail = AssistantDeptShareViewSet.as_view({
     'delete': 'destroy',
 })
+dept_share_bulk = AssistantDeptShareViewSet.as_view({
+    'post': 'bulk',
+})
 
 urlpatterns = [
     path('', include(router.urls)),
     path('assistants/<uuid:assistant_pk>/shares/users/', user_share_list, name='assistant-user-share-list'),
     path('assistants/<uuid:assistant_pk>/shares/users/<int:pk>/', user_share_detail, name='assistant-user-share-detail'),
+    path('assistants/<uuid:assistant_pk>/shares/users/bulk/', user_share_bulk, name='assistant-user-share-bulk'),
     path('assistants/<uuid:assistant_pk>/shares/departments/', dept_share_list, name='assistant-dept-share-list'),
     path('assistants/<uuid:assistant_pk>/shares/departments/<int:pk>/', dept_share_detail, name='assistant-dept-share-detail'),
+    path('assistants/<uuid:assistant_pk>/shares/departments/bulk/', dept_share_bulk, name='assistant-dept-share-bulk'),
     path('assistants/<uuid:pk>/chat/', ChatView.as_view(), name='chat'),
+    path('assistants/<uuid:pk>/chat/async/', AsyncChatView.as_view(), name='chat-async'),
+    path('chat-jobs/<uuid:pk>/', ChatJobView.as_view(), name='chat-job'),
     path('assistants/<uuid:pk>/reset/', ResetThreadView.as_view(), name='reset'),
+    path(
+        'assistants/<uuid:pk>/messages/export/',
+        MessageExportView.as_view(),
+        name='message-export',
+    ),
     path(
         'assistants/<uuid:pk>/vector-store/',
         VectorStoreIdView.as_view(),
@@ -4,40 +4,79 @@ REST endpoints
 
 /api/assistants/            CRUD
 /api/messages/              read-only (handy for admin)
+/api/messages/search/?q=     full-text search with ranked snippets
 /api/assistants/<id>/chat/   POST {"content": "..."}  – send a message
+                             (?stream=1 → reply as Server-Sent Events,
+                              ?background=1 → 202 + chat job id)
+/api/chat-jobs/<id>/         GET  (?wait=<s>)         – long-poll a chat job
 /api/assistants/<id>/reset/  POST                     – clear conversation history
+/api/assistants/<id>/messages/export/  GET (?gzip=1)  – history as NDJSON
 """
-import os
-from django.http import JsonResponse
 import time
+import uuid
+import zlib
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.text import slugify
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, DestroyModelMixin
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from . import access
 from .permissions import AssistantPermission
+from .openai_client import get_client
+from .resilience import as_upstream_error, status_of
+from .run_poller import run_poller
+from .run_coordinator import ThreadBusy, run_coordinator
+from .governor import Overloaded, run_governor
+from .pagination import MessageKeysetPagination
+from .search import search_messages
+from .throttling import check_chat_rate
+from .timing import ServerTimingMixin
+from .conversation import (
+    ReleasingStream,
+    StreamedReply,
+    cancel_run,
+    compact_thread,
+    ensure_thread,
+    fetch_reply,
+    get_thread,
+    post_user_message,
+    run_usage,
+    start_run,
+    store_message,
+)
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.utils import timezone
+from django.urls import reverse
+from chat.models import Thread
 from .models import (
     Assistant,
     Message,
+    ChatJob,
     AssistantUserAccess,
     AssistantDepartmentAccess,
 )
 from .serializers import (
     AssistantSerializer,
     MessageSerializer,
+    ChatJobSerializer,
     AssistantShareUserSerializer,
     AssistantShareDeptSerializer,
+    ShareItemSerializer,
 )
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  Assistants CRUD
 # ──────────────────────────────────────────────────────────────────────────────
-class AssistantViewSet(viewsets.ModelViewSet):
+class AssistantViewSet(ServerTimingMixin, viewsets.ModelViewSet):
     """
     POST → also creates the remote assistant in OpenAI and stores its ID.
     """
@@ -46,13 +85,19 @@ class AssistantViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, AssistantPermission]
 
     def get_queryset(self):
-        return Assistant.objects.for_user(self.request.user)
+        user = self.request.user
+        # the caller's own message ids (AssistantSerializer.messages), one
+        # query for the whole list
+        own_messages = Prefetch(
+            "messages",
+            queryset=Message.objects.filter(thread__user=user).only("id", "assistant_id"),
+            to_attr="own_messages",
+        )
+        return Assistant.objects.for_user(user).with_permission(user).prefetch_related(own_messages)
 
     def perform_create(self, serializer):
-        import openai
-
         data   = self.request.data
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = get_client()
 
         # 1️⃣  upload any attached files
         uploaded_file_ids: list[str] = []
@@ -116,8 +161,6 @@ class AssistantViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         """Update both the local and remote assistant."""
-        import openai
-
         data = self.request.data
         if hasattr(data, "getlist"):
             raw = data.getlist("tools") if "tools" in data else None
@@ -140,7 +183,7 @@ class AssistantViewSet(viewsets.ModelViewSet):
             instance.save(update_fields=["reasoning_effort"])
 
         if instance.openai_id:
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            client = get_client()
             update_kwargs = {
                 "name": instance.name,
                 "description": instance.description or "",
@@ -231,14 +274,15 @@ class AssistantViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance):
         """Delete the assistant locally and remotely in OpenAI."""
-        import openai
-
         if instance.openai_id:
             try:
-                client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                client = get_client()
                 client.beta.assistants.delete(instance.openai_id)
-            except Exception:
-                pass
+            except Exception as exc:
+                # already gone upstream is fine; anything else (e.g. a 503
+                # once retries ran out) is reported and the assistant kept
+                if status_of(exc) != 404:
+                    raise
         instance.delete()
 
 
@@ -247,27 +291,132 @@ class AssistantViewSet(viewsets.ModelViewSet):
 # ──────────────────────────────────────────────────────────────────────────────
 class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MessageSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MessageKeysetPagination
 
     def get_queryset(self):
-        """Optionally filter messages by assistant via ?assistant=<uuid>."""
-        qs = Message.objects.all()
-        asst_id = self.request.query_params.get("assistant")
+        """The caller's conversation history with assistants they can still
+        access, optionally filtered by assistant via ?assistant=<uuid>."""
+        user = self.request.user
+        qs = Message.objects.filter(
+            thread__user=user,
+            assistant_id__in=Assistant.objects.for_user(user).values("pk"),
+        )
+        asst_id = self._assistant_param()
         if asst_id:
-            qs = qs.filter(assistant_id=asst_id)
+            # one thread per (assistant, user): seek on the thread's index
+            thread = Thread.objects.filter(assistant_id=asst_id, user=user).first()
+            if thread is None:
+                return Message.objects.none()
+            qs = qs.filter(thread=thread)
         return qs
 
+    @action(detail=False, url_path="search")
+    def search(self, request):
+        """GET /api/messages/search/?q=<words>[&assistant=<uuid>][&limit=]"""
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "This parameter is required."})
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        results = search_messages(
+            request.user,
+            query,
+            assistant_id=self._assistant_param(),
+            limit=max(1, min(limit, settings.MESSAGE_SEARCH_MAX_RESULTS)),
+        )
+        return Response(results)
+
+    def _assistant_param(self):
+        value = self.request.query_params.get("assistant")
+        if not value:
+            return None
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            raise ValidationError({"assistant": "Must be a valid UUID."})
+
+
+class MessageExportView(APIView):
+    """
+    GET /api/assistants/<uuid>/messages/export/?gzip=1
+
+    Streams the caller's whole conversation with an assistant as
+    newline-delimited JSON, oldest first.  Rows are read with
+    ``.iterator()`` and written out in batches, so memory use does not depend
+    on the length of the history and the first bytes go out straight away.
+    With ``?gzip=1`` the stream is gzip-compressed on the fly.
+    """
+    permission_classes = [IsAuthenticated, AssistantPermission]
+    fields = ("id", "thread_id", "role", "content", "created_at")
+
+    def get(self, request, pk):
+        assistant = get_object_or_404(Assistant, pk=pk)
+        self.action = "retrieve"
+        self.check_object_permissions(request, assistant)
+
+        rows = (
+            Message.objects.filter(assistant=assistant, thread__user=request.user)
+            .order_by("created_at", "id")
+            .values_list(*self.fields)
+            .iterator(chunk_size=settings.MESSAGE_EXPORT_CHUNK_SIZE)
+        )
+        filename = f"{slugify(assistant.name) or 'assistant'}-messages.ndjson"
+        if request.query_params.get("gzip") in ("1", "true"):
+            stream = self._gzip(self._lines(rows))
+            content_type = "application/gzip"
+            filename += ".gz"
+        else:
+            stream = self._lines(rows)
+            content_type = "application/x-ndjson"
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _lines(self, rows):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        batch, first = [], True
+        for row in rows:
+            batch.append(encoder.encode(dict(zip(self.fields, row))))
+            # the first row goes out on its own so the download starts at once
+            if first or len(batch) >= settings.MESSAGE_EXPORT_BATCH:
+                yield ("\n".join(batch) + "\n").encode()
+                batch, first = [], False
+        if batch:
+            yield ("\n".join(batch) + "\n").encode()
+
+    @staticmethod
+    def _gzip(chunks):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        for chunk in chunks:
+            # sync-flush so every batch reaches the client as it is produced
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 #  Chat endpoint
 # ──────────────────────────────────────────────────────────────────────────────
-class ChatView(APIView):
+class ChatView(ServerTimingMixin, APIView):
     """
     POST /api/assistants/<uuid>/chat/
     Body: {"content": "..."}
+
+    With ``?stream=1`` the reply is sent as ``text/event-stream``: one
+    ``delta`` event per text fragment, then a ``done`` event carrying the
+    full reply (or an ``error`` event if the run does not complete).
     """
 
     permission_classes = [IsAuthenticated, AssistantPermission]
 
+    def handle_exception(self, exc):
+        # errors OpenAI answered with become a JSON 502 instead of a bare 500
+        return super().handle_exception(as_upstream_error(exc) or exc)
+
     def post(self, request, pk):
         assistant = get_object_or_404(Assistant, pk=pk)
         self.action = "execute"
@@ -277,84 +426,199 @@ class ChatView(APIView):
             return Response({"detail": "`content` field is required"},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # 🔹 1.  OpenAI client
-        import openai
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        # 🔹 2.  Make sure the assistant has a thread
-        if not assistant.thread_id:
-            thread = client.beta.threads.create()
-            assistant.thread_id = thread.id
-            assistant.save(update_fields=["thread_id"])
-
-        # 🔹 3.  Store the user message locally *and* remotely
-        Message.objects.create(
-            assistant=assistant, role="user",
-            content=user_msg, created_at=timezone.now()
-        )
-        client.beta.threads.messages.create(
-            thread_id=assistant.thread_id,
-            role="user",
-            content=user_msg,
-        )
+        # rate limits, charged only for turns that will actually run (a DRF
+        # throttle would run before the checks above)
+        wait = check_chat_rate(request.user, user_msg)
+        if wait:
+            self.throttled(request, wait)
 
-        # 🔹 4.  Kick off a run (stream = False)
-        run = client.beta.threads.runs.create(
-            thread_id=assistant.thread_id,
-            assistant_id=assistant.openai_id,
-            stream=False,
-        )
+        thread = get_thread(assistant, request.user)
+        if request.query_params.get("background") in ("1", "true"):
+            return self._enqueue(request, assistant, thread, user_msg)
+
+        # 🔹 1.  OpenAI client
+        client = get_client()
 
-        # 🔹 5.  Poll until it finishes
-        while run.status not in ("completed", "failed", "cancelled"):
-            time.sleep(0.5)
-            run = client.beta.threads.runs.retrieve(
-                thread_id=assistant.thread_id,
-                run_id=run.id,
+        # 🔹 2.  Wait for any earlier turn on this thread to finish, then for
+        #        one of the global run slots (503 once the queue is full)
+        try:
+            lease = run_coordinator.acquire(thread)
+        except ThreadBusy:
+            return Response(
+                {"detail": "An earlier message in this conversation is still being answered"},
+                status=status.HTTP_409_CONFLICT,
             )
+        try:
+            slot = run_governor.acquire(request.user)
+        except Overloaded:
+            lease.release()
+            raise
+
+        if request.query_params.get("stream") in ("1", "true"):
+            # released by the stream once it has been sent
+            return self._stream_reply(client, assistant, thread, user_msg, lease, slot)
+        try:
+            return self._reply(client, assistant, thread, user_msg)
+        finally:
+            slot.release()
+            lease.release()
+
+    def _reply(self, client, assistant, thread, user_msg):
+        # 🔹 3.  Make sure the caller's thread exists upstream (compacted
+        #        first if the assistant keeps a rolling summary)
+        compact_thread(client, assistant, thread)
+        thread_id = ensure_thread(client, thread)
+
+        # 🔹 4.  Store the user message locally *and* remotely
+        store_message(thread, "user", user_msg)
+        post_user_message(client, thread_id, user_msg)
+
+        # 🔹 5.  Kick off a run (stream = False)
+        started = time.monotonic()
+        run = start_run(client, assistant, thread_id)
+
+        # 🔹 6.  Wait for the shared poller to see it finish
+        future = run_poller.track(thread_id, run, model=assistant.model)
+        try:
+            run = run_poller.result(future, run.id)
+        except TimeoutError:
+            # or it would still hold the thread when the next turn comes
+            cancel_run(client, thread_id, run.id)
+            return Response({"detail": "Run did not finish in time"},
+                            status=status.HTTP_504_GATEWAY_TIMEOUT)
         if run.status != "completed":
             return Response({"detail": f"Run ended with status '{run.status}'"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # 🔹 6.  Get the assistant’s reply (most recent msg in the thread)
-        msgs = client.beta.threads.messages.list(
-            thread_id=assistant.thread_id, limit=1
+        # 🔹 7.  Get the assistant’s reply (most recent msg in the thread)
+        assistant_msg = fetch_reply(client, thread_id)
+
+        # 🔹 8.  Persist it locally, with what the run cost
+        store_message(thread, "assistant", assistant_msg,
+                      **run_usage(run, assistant.model, started, future.polls))
+
+        # 🔹 9.  Return a normal JSON response
+        return JsonResponse({"content": assistant_msg})
+
+    def _enqueue(self, request, assistant, thread, user_msg):
+        """Hand the turn to the chat worker and answer 202 straight away."""
+        store_message(thread, "user", user_msg)
+        job = ChatJob.objects.create(
+            assistant=assistant, user=request.user, content=user_msg
+        )
+        return Response(
+            {
+                "job_id": str(job.id),
+                "status": job.status,
+                "url": reverse("chat-job", args=[job.id]),
+            },
+            status=status.HTTP_202_ACCEPTED,
         )
-        assistant_msg = msgs.data[0].content[0].text.value
 
-        # 🔹 7.  Persist it locally
-        Message.objects.create(
-            assistant=assistant, role="assistant",
-            content=assistant_msg, created_at=timezone.now()
+    def _stream_reply(self, client, assistant, thread, user_msg, lease, slot):
+        """Forward the run's text deltas to the caller as Server-Sent Events."""
+        try:
+            compact_thread(client, assistant, thread)
+            thread_id = ensure_thread(client, thread)
+            store_message(thread, "user", user_msg)
+            post_user_message(client, thread_id, user_msg)
+            started = time.monotonic()
+            events = start_run(client, assistant, thread_id, stream=True)
+        except Exception:
+            slot.release()
+            lease.release()
+            raise
+
+        def event_stream():
+            reply = StreamedReply()
+            try:
+                for event in events:
+                    yield from reply.feed(event)
+
+                if reply.failed_status:
+                    yield reply.error()
+                    return
+
+                store_message(thread, "assistant", reply.text,
+                              **reply.usage(assistant.model, started))
+                yield reply.done()
+            finally:
+                slot.release()
+                lease.release()
+
+        response = StreamingHttpResponse(
+            ReleasingStream(event_stream(), slot.release, lease.release),
+            content_type="text/event-stream",
         )
+        response["Cache-Control"] = "no-cache"
+        # stop reverse proxies (nginx) from buffering the event stream
+        response["X-Accel-Buffering"] = "no"
+        return response
 
-        print(assistant_msg)
 
-        # 🔹 8.  Return a normal JSON response
-        return JsonResponse({"content": assistant_msg})
+class ChatJobView(APIView):
+    """
+    GET /api/chat-jobs/<uuid>/?wait=<seconds>
 
+    Long-polls a background chat job: returns 200 with the reply as soon as
+    the job has finished, or 202 with the current status once ``wait``
+    seconds (at most ``CHAT_JOB_MAX_WAIT``) have passed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ChatJob, pk=pk, user=request.user)
+        try:
+            wait = float(request.query_params.get("wait", settings.CHAT_JOB_MAX_WAIT))
+        except ValueError:
+            raise ValidationError({"wait": "Must be a number of seconds."})
+        deadline = time.monotonic() + min(max(wait, 0), settings.CHAT_JOB_MAX_WAIT)
+
+        while not job.is_finished and time.monotonic() < deadline:
+            time.sleep(settings.CHAT_JOB_POLL_INTERVAL)
+            job.refresh_from_db()
 
-class ResetThreadView(APIView):
-    """Delete all messages and remote thread for an assistant."""
+        status_code = status.HTTP_200_OK if job.is_finished else status.HTTP_202_ACCEPTED
+        return Response(ChatJobSerializer(job).data, status=status_code)
+
+
+class ResetThreadView(ServerTimingMixin, APIView):
+    """Delete the caller's messages and remote thread for an assistant."""
     permission_classes = [IsAuthenticated, AssistantPermission]
 
     def post(self, request, pk):
         assistant = get_object_or_404(Assistant, pk=pk)
         self.action = "execute"
         self.check_object_permissions(request, assistant)
-        thread_id = assistant.thread_id
-
-        if thread_id:
-            import openai
-            try:
-                client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                client.beta.threads.delete(thread_id)
-            except Exception:
-                pass
-
-        assistant.messages.all().delete()
-        assistant.thread_id = None
-        assistant.save(update_fields=["thread_id"])
+        thread = Thread.objects.filter(assistant=assistant, user=request.user).first()
+        if thread is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # don't pull the thread away from under a run that is still going
+        try:
+            lease = run_coordinator.acquire(thread)
+        except ThreadBusy:
+            return Response(
+                {"detail": "A message in this conversation is still being answered"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            thread.refresh_from_db(fields=["openai_id"])
+            if thread.openai_id:
+                try:
+                    client = get_client()
+                    client.beta.threads.delete(thread.openai_id)
+                except Exception as exc:
+                    if status_of(exc) != 404:
+                        raise
+
+            thread.messages.all().delete()
+            thread.openai_id = None
+            thread.summary = ""
+            thread.summarized_until = None
+            thread.save(update_fields=["openai_id", "summary", "summarized_until", "updated_at"])
+        finally:
+            lease.release()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -375,7 +639,7 @@ class VectorStoreIdView(APIView):
         return Response({"vector_store_id": assistant.vector_store_id})
 
 
-class VectorStoreFilesView(APIView):
+class VectorStoreFilesView(ServerTimingMixin, APIView):
     """Return the files for an assistant's vector store."""
     permission_classes = [IsAuthenticated, AssistantPermission]
 
@@ -388,9 +652,7 @@ class VectorStoreFilesView(APIView):
                 {"detail": "No vector store for this assistant."},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        import openai
-
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = get_client()
         resp = client.vector_stores.files.list(
             vector_store_id=assistant.vector_store_id
         )
@@ -419,7 +681,7 @@ class VectorStoreFilesView(APIView):
         return Response(files)
 
 
-class VectorStoreFileView(APIView):
+class VectorStoreFileView(ServerTimingMixin, APIView):
     """Delete a single file from an assistant's vector store."""
     permission_classes = [IsAuthenticated, AssistantPermission]
 
@@ -433,9 +695,7 @@ class VectorStoreFileView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        import openai
-
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = get_client()
         client.vector_stores.files.delete(
             vector_store_id=assistant.vector_store_id,
             file_id=file_id,
@@ -449,19 +709,119 @@ class VectorStoreFileView(APIView):
 # ──────────────────────────────────────────────────────────────────────────────
 class AssistantShareMixin:
     permission_classes = [IsAuthenticated]
+    # set by the viewsets: the share model and the field naming the grantee
+    share_model = None
+    grantee_field = None
 
     def get_assistant(self):
         return get_object_or_404(Assistant, pk=self.kwargs["assistant_pk"])
 
     def _check_owner(self, request, assistant):
-        if assistant.owner != request.user and not request.user.is_staff:
+        if assistant.owner_id != request.user.pk and not request.user.is_staff:
             raise PermissionDenied("Only owner or admin may share")
 
+    def _validate_items(self, items, seen, revoke=False):
+        """Results for ``items`` and ``{grantee: result}`` of the valid ones;
+        grantees already in ``seen`` are rejected as duplicates."""
+        field = self.grantee_field
+        results, valid = [], {}
+        for item in items:
+            serializer = ShareItemSerializer(
+                data={"grantee": item.get(field), "permission": item.get("permission")},
+                revoke=revoke,
+            )
+            if not serializer.is_valid():
+                errors = {field if k == "grantee" else k: v for k, v in serializer.errors.items()}
+                results.append({field: item.get(field), "status": "error", "detail": errors})
+                continue
+            data = dict(serializer.validated_data)
+            grantee = data.pop("grantee")
+            result = {field: grantee, **data}
+            results.append(result)
+            if grantee in seen:
+                result.update(status="error", detail="Listed more than once")
+            else:
+                seen.add(grantee)
+                valid[grantee] = result
+        return results, valid
+
+    def bulk(self, request, *args, **kwargs):
+        """
+        Grant and revoke many shares at once:
+        ``{"grant": [{"<grantee>": id, "permission": "use"}, ...], "revoke": [id, ...]}``.
+
+        Valid items are applied in one transaction; each item gets its own
+        result (``created``/``updated``/``unchanged``, ``deleted``/``not_found``
+        or ``error`` with a ``detail``).
+        """
+        assistant = self.get_assistant()
+        self._check_owner(request, assistant)
+        field = self.grantee_field
+        grants = request.data.get("grant", [])
+        revokes = request.data.get("revoke", [])
+        if not isinstance(grants, list) or not isinstance(revokes, list):
+            raise ValidationError("`grant` and `revoke` must be lists")
+        if len(grants) + len(revokes) > settings.SHARE_BULK_MAX_ITEMS:
+            raise ValidationError(f"At most {settings.SHARE_BULK_MAX_ITEMS} items per request")
+
+        # 1️⃣  validate every item on its own
+        seen = set()
+        grant_results, to_grant = self._validate_items(
+            [item if isinstance(item, dict) else {} for item in grants], seen
+        )
+        revoke_results, to_revoke = self._validate_items(
+            [{field: grantee} for grantee in revokes], seen, revoke=True
+        )
+        if field == "user":
+            for grantee, result in [*to_grant.items(), *to_revoke.items()]:
+                if grantee == assistant.owner_id:
+                    result.update(status="error", detail="Cannot modify owner permissions")
+                    to_grant.pop(grantee, None)
+                    to_revoke.pop(grantee, None)
+        grantee_model = self.share_model._meta.get_field(field).related_model
+        found = set(grantee_model.objects.filter(pk__in=to_grant).values_list("pk", flat=True))
+        for grantee in set(to_grant) - found:
+            to_grant.pop(grantee).update(status="error", detail=f"No such {field}")
+
+        # 2️⃣  apply them in one transaction, then refresh the effective access once
+        with transaction.atomic(), access.share_signals_paused():
+            current = dict(
+                self.share_model.objects.filter(
+                    assistant=assistant, **{f"{field}_id__in": [*to_grant, *to_revoke]}
+                ).values_list(f"{field}_id", "permission")
+            )
+            self.share_model.objects.bulk_create(
+                [
+                    self.share_model(assistant=assistant, permission=result["permission"], **{f"{field}_id": grantee})
+                    for grantee, result in to_grant.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["assistant", field],
+                update_fields=["permission"],
+                batch_size=500,
+            )
+            self.share_model.objects.filter(
+                assistant=assistant, **{f"{field}_id__in": [g for g in to_revoke if g in current]}
+            ).delete()
+            touched = [*to_grant, *to_revoke]
+            if touched:
+                access.refresh([assistant.pk], touched if field == "user" else None)
+        for grantee, result in to_grant.items():
+            if grantee not in current:
+                result["status"] = "created"
+            else:
+                result["status"] = "unchanged" if current[grantee] == result["permission"] else "updated"
+        for grantee, result in to_revoke.items():
+            result["status"] = "deleted" if grantee in current else "not_found"
+        return Response({"grant": grant_results, "revoke": revoke_results})
+
 
 class AssistantUserShareViewSet(
     AssistantShareMixin, GenericViewSet, CreateModelMixin, ListModelMixin, DestroyModelMixin
 ):
     serializer_class = AssistantShareUserSerializer
+    share_model = AssistantUserAccess
+    grantee_field = "user"
 
     def get_queryset(self):
         return AssistantUserAccess.objects.filter(assistant=self.get_assistant())
@@ -507,6 +867,8 @@ class AssistantDeptShareViewSet(
     AssistantShareMixin, GenericViewSet, CreateModelMixin, ListModelMixin, DestroyModelMixin
 ):
     serializer_class = AssistantShareDeptSerializer
+    share_model = AssistantDepartmentAccess
+    grantee_field = "department"
 
     def get_queryset(self):
         return AssistantDepartmentAccess.objects.filter(
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import ThreadFile
+from .models import Thread, ThreadFile
+
+
+@admin.register(Thread)
+class ThreadAdmin(admin.ModelAdmin):
+    list_display = ("id", "assistant", "user", "openai_id", "updated_at")
+    readonly_fields = ("openai_id", "created_at", "updated_at")
 
 @admin.register(ThreadFile)
 class ThreadFileAdmin(admin.ModelAdmin):
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_thread_run_lock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='summarized_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
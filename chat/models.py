@@ -7,6 +7,12 @@ class Thread(models.Model):
     assistant = models.ForeignKey('assistants.Assistant', on_delete=models.CASCADE, related_name='threads')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='threads')
     openai_id = models.CharField(max_length=64, blank=True, null=True)
+    # run lease, see assistants/run_coordinator.py
+    run_lock_owner = models.CharField(max_length=32, blank=True, default='')
+    run_lock_expires_at = models.DateTimeField(blank=True, null=True)
+    # rolling summary of the messages created up to ``summarized_until``
+    summary = models.TextField(blank=True, default='')
+    summarized_until = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,171 @@
+"""
+Prometheus metrics for the API.
+
+``MetricsMiddleware`` counts and times every request by URL name (the
+``name=`` of the matched route, e.g. ``chat``, ``assistant-list``,
+``vector-store-files``) and records how many DB queries it ran.  OpenAI calls
+are timed by method in ``assistants.openai_client``; in-flight chat runs are
+tracked by the thread run lease and the run governor's queue depth by
+``assistants.governor``.  ``GET /metrics`` renders everything in the
+Prometheus text format.
+
+When the ``PROMETHEUS_MULTIPROC_DIR`` environment variable is set, each
+worker process writes its samples to files in that directory and
+``/metrics`` aggregates the files of all processes, so it does not matter
+which worker the scrape lands on.  Without it the samples stay in the
+process that recorded them.
+"""
+import hmac
+import os
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# chat requests legitimately take minutes, so go well past the default 10s
+LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300,
+)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by URL name, method and status.",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by URL name and method.",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+OPENAI_LATENCY = Histogram(
+    "openai_request_duration_seconds",
+    "OpenAI API call latency by method (e.g. threads.runs.create).",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+OPENAI_ERRORS = Counter(
+    "openai_request_errors_total",
+    "Failed OpenAI API calls by method and exception type.",
+    ["method", "error"],
+)
+OPENAI_RETRIES = Counter(
+    "openai_request_retries_total",
+    "Retried OpenAI API calls by method and failure (status or timeout/connection).",
+    ["method", "failure"],
+)
+OPENAI_CIRCUIT_OPEN = Gauge(
+    "openai_circuit_open",
+    "Worker processes whose OpenAI circuit breaker is open.",
+    multiprocess_mode="livesum",
+)
+CHAT_RUNS_IN_FLIGHT = Gauge(
+    "chat_runs_in_flight",
+    "Chat turns currently holding a thread's run lease.",
+    multiprocess_mode="livesum",
+)
+# the governor's counts are global (shared SQLite file); report the latest
+CHAT_RUN_QUEUE_DEPTH = Gauge(
+    "chat_run_queue_depth",
+    "Chat turns waiting for an upstream run slot, across all processes.",
+    multiprocess_mode="livemostrecent",
+)
+CHAT_RUN_SLOTS_IN_USE = Gauge(
+    "chat_run_slots_in_use",
+    "Upstream run slots held, across all processes.",
+    multiprocess_mode="livemostrecent",
+)
+CHAT_RUNS_SHED = Counter(
+    "chat_runs_shed_total",
+    "Chat turns refused with 503 by the run governor, by reason.",
+    ["reason"],
+)
+
+
+def observe_openai(method, seconds, error=None):
+    OPENAI_LATENCY.labels(method).observe(seconds)
+    if error is not None:
+        OPENAI_ERRORS.labels(method, type(error).__name__).inc()
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name if match else None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Request count, latency and DB query count per URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - start)
+        DB_QUERIES.labels(_view_name(request)).observe(queries[0])
+        return response
+
+    async def __acall__(self, request):
+        # queries run in sync_to_async worker threads here and are not counted
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, time.perf_counter() - start)
+        return response
+
+    def _observe(self, request, response, seconds):
+        view = _view_name(request)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(seconds)
+
+
+def metrics_view(request):
+    """GET /metrics – all processes' samples in the Prometheus text format.
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>``; only with ``DEBUG`` on
+    is an unset token taken to mean open access.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
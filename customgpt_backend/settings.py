@@ -51,10 +51,12 @@ INSTALLED_APPS = [
     'assistants',
     'chat',
     'users',
+    'usage',
 ]
 AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
+    'customgpt_backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -158,3 +160,159 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
 }
 
+
+# OpenAI client (one pooled client per process, see assistants/openai_client.py)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+# Shared run poller (assistants/run_poller.py): each run is polled after
+# RUN_POLL_INITIAL_INTERVAL seconds, the interval growing by RUN_POLL_BACKOFF
+# up to RUN_POLL_MAX_INTERVAL (RUN_POLL_MAX_INTERVAL_REASONING for o* models).
+RUN_POLL_INITIAL_INTERVAL = float(os.getenv("RUN_POLL_INITIAL_INTERVAL", "0.25"))
+RUN_POLL_BACKOFF = float(os.getenv("RUN_POLL_BACKOFF", "1.5"))
+RUN_POLL_MAX_INTERVAL = float(os.getenv("RUN_POLL_MAX_INTERVAL", "2"))
+RUN_POLL_MAX_INTERVAL_REASONING = float(os.getenv("RUN_POLL_MAX_INTERVAL_REASONING", "5"))
+RUN_POLL_TIMEOUT = float(os.getenv("RUN_POLL_TIMEOUT", "600"))
+RUN_POLLER_WORKERS = int(os.getenv("RUN_POLLER_WORKERS", "4"))
+
+# Background chat jobs (POST /chat/?background=1, manage.py chat_worker)
+CHAT_JOB_LEASE_SECONDS = int(os.getenv("CHAT_JOB_LEASE_SECONDS", "60"))
+CHAT_JOB_MAX_ATTEMPTS = int(os.getenv("CHAT_JOB_MAX_ATTEMPTS", "3"))
+CHAT_JOB_MAX_WAIT = float(os.getenv("CHAT_JOB_MAX_WAIT", "25"))
+CHAT_JOB_POLL_INTERVAL = float(os.getenv("CHAT_JOB_POLL_INTERVAL", "0.5"))
+CHAT_WORKER_CONCURRENCY = int(os.getenv("CHAT_WORKER_CONCURRENCY", "8"))
+CHAT_WORKER_IDLE_SLEEP = float(os.getenv("CHAT_WORKER_IDLE_SLEEP", "1"))
+
+# Per-thread run lease (assistants/run_coordinator.py): a turn waits up to
+# THREAD_LOCK_WAIT seconds for an earlier turn on the same thread to finish.
+THREAD_LOCK_TTL = float(os.getenv("THREAD_LOCK_TTL", "30"))
+THREAD_LOCK_WAIT = float(os.getenv("THREAD_LOCK_WAIT", "120"))
+THREAD_LOCK_POLL_INTERVAL = float(os.getenv("THREAD_LOCK_POLL_INTERVAL", "0.2"))
+THREAD_LOCK_MAX_HOLD = RUN_POLL_TIMEOUT + 60
+
+# Model that writes rolling conversation summaries (context_strategy="summary")
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+
+# Per-phase timings of the OpenAI-bound views (assistants/timing.py) are always
+# logged on "assistants.timing"; this controls the Server-Timing header.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "True").lower() == "true"
+
+# Prometheus metrics (customgpt_backend/metrics.py). With several worker
+# processes, set PROMETHEUS_MULTIPROC_DIR in the environment (prometheus_client
+# reads it itself); gunicorn.conf.py empties it when the server starts.
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; without a token it
+# is refused unless DEBUG is on.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# /api/messages/ page size (?limit=, capped at MESSAGE_MAX_PAGE_SIZE)
+MESSAGE_PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "50"))
+MESSAGE_MAX_PAGE_SIZE = int(os.getenv("MESSAGE_MAX_PAGE_SIZE", "200"))
+
+# /api/assistants/<id>/messages/export/: rows fetched per query round trip and
+# NDJSON lines written per chunk of the response
+MESSAGE_EXPORT_CHUNK_SIZE = int(os.getenv("MESSAGE_EXPORT_CHUNK_SIZE", "2000"))
+MESSAGE_EXPORT_BATCH = int(os.getenv("MESSAGE_EXPORT_BATCH", "200"))
+
+# Append-only per-assistant conversation log (assistants/storage.py)
+CONVERSATION_LOG_ENABLED = os.getenv("CONVERSATION_LOG_ENABLED", "False").lower() == "true"
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", str(BASE_DIR / "media" / "conversations"))
+CONVERSATION_LOG_SEGMENT_BYTES = int(os.getenv("CONVERSATION_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_LOG_FSYNC_EVERY = int(os.getenv("CONVERSATION_LOG_FSYNC_EVERY", "100"))
+CONVERSATION_LOG_FSYNC_INTERVAL = float(os.getenv("CONVERSATION_LOG_FSYNC_INTERVAL", "1"))
+CONVERSATION_LOG_COMPRESS = os.getenv("CONVERSATION_LOG_COMPRESS", "")  # "", "gzip" or "zstd"
+
+# /api/messages/search/ result cap (?limit=)
+MESSAGE_SEARCH_MAX_RESULTS = int(os.getenv("MESSAGE_SEARCH_MAX_RESULTS", "100"))
+
+# Chat rate limits per user and per department (assistants/throttling.py), per
+# minute; 0 turns a limit off. Token limits count estimate_tokens(): ~4
+# characters per token of the message plus CHAT_TOKENS_PER_TURN.
+CHAT_USER_REQUESTS_PER_MINUTE = int(os.getenv("CHAT_USER_REQUESTS_PER_MINUTE", "0"))
+CHAT_USER_TOKENS_PER_MINUTE = int(os.getenv("CHAT_USER_TOKENS_PER_MINUTE", "0"))
+CHAT_DEPARTMENT_REQUESTS_PER_MINUTE = int(os.getenv("CHAT_DEPARTMENT_REQUESTS_PER_MINUTE", "0"))
+CHAT_DEPARTMENT_TOKENS_PER_MINUTE = int(os.getenv("CHAT_DEPARTMENT_TOKENS_PER_MINUTE", "0"))
+CHAT_TOKENS_PER_TURN = int(os.getenv("CHAT_TOKENS_PER_TURN", "1500"))
+# the buckets are shared by every worker process through this SQLite file
+CHAT_RATE_LIMIT_DB = os.getenv("CHAT_RATE_LIMIT_DB", str(BASE_DIR / "var" / "ratelimit.sqlite3"))
+CHAT_RATE_LIMIT_TIMEOUT = float(os.getenv("CHAT_RATE_LIMIT_TIMEOUT", "2"))
+
+# Global cap on upstream runs in flight across all worker processes
+# (assistants/governor.py; 0 turns it off). Turns beyond it queue, up to
+# CHAT_RUN_QUEUE_SIZE of them for CHAT_RUN_QUEUE_WAIT seconds; the rest get
+# 503 with Retry-After: CHAT_RUN_RETRY_AFTER.
+CHAT_MAX_RUNS_IN_FLIGHT = int(os.getenv("CHAT_MAX_RUNS_IN_FLIGHT", "32"))
+CHAT_RUN_QUEUE_SIZE = int(os.getenv("CHAT_RUN_QUEUE_SIZE", "64"))
+CHAT_RUN_QUEUE_WAIT = float(os.getenv("CHAT_RUN_QUEUE_WAIT", "30"))
+CHAT_RUN_RETRY_AFTER = int(os.getenv("CHAT_RUN_RETRY_AFTER", "5"))
+CHAT_RUN_SLOT_TTL = float(os.getenv("CHAT_RUN_SLOT_TTL", "30"))
+CHAT_GOVERNOR_POLL_INTERVAL = float(os.getenv("CHAT_GOVERNOR_POLL_INTERVAL", "0.1"))
+CHAT_GOVERNOR_DB = os.getenv("CHAT_GOVERNOR_DB", str(BASE_DIR / "var" / "governor.sqlite3"))
+CHAT_GOVERNOR_DB_TIMEOUT = float(os.getenv("CHAT_GOVERNOR_DB_TIMEOUT", "2"))
+
+# points the SQLite files above at a temporary directory during tests
+TEST_RUNNER = "customgpt_backend.test_runner.TestRunner"
+
+# Retries, endpoint timeouts and circuit breaker of OpenAI calls
+# (assistants/resilience.py). OPENAI_ENDPOINT_TIMEOUTS can be extended from
+# the environment as "threads.runs.retrieve=5,chat.completions.create=90".
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "8"))
+OPENAI_RETRY_BUDGET = float(os.getenv("OPENAI_RETRY_BUDGET", "20"))
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))
+OPENAI_ENDPOINT_TIMEOUTS = {
+    "threads.create": 15,
+    "threads.delete": 15,
+    "threads.messages.create": 15,
+    "threads.messages.list": 15,
+    "threads.runs.create": 60,
+    "threads.runs.retrieve": 10,
+    "chat.completions.create": 120,
+}
+OPENAI_ENDPOINT_TIMEOUTS.update(
+    (method.strip(), float(seconds))
+    for method, _, seconds in (
+        item.partition("=") for item in os.getenv("OPENAI_ENDPOINT_TIMEOUTS", "").split(",") if item
+    )
+)
+
+# Effective-permission cache (assistants/access.py). It must be shared by every
+# worker process: by default it is a SQLite file on the host
+# (PERMISSION_CACHE_DB, assistants/cache.py); a deployment spread over several
+# hosts points PERMISSION_CACHE_REDIS_URL at a Redis (e.g.
+# redis://127.0.0.1:6379/1, needs the redis package) instead. Entries are
+# invalidated per assistant on share, owner and department changes, the
+# timeout only bounds their lifetime.
+PERMISSION_CACHE = "permissions"
+PERMISSION_CACHE_TIMEOUT = int(os.getenv("PERMISSION_CACHE_TIMEOUT", "300"))
+PERMISSION_CACHE_DB = os.getenv("PERMISSION_CACHE_DB", str(BASE_DIR / "var" / "permissions.sqlite3"))
+PERMISSION_CACHE_MAX_ENTRIES = int(os.getenv("PERMISSION_CACHE_MAX_ENTRIES", "100000"))
+PERMISSION_CACHE_REDIS_URL = os.getenv("PERMISSION_CACHE_REDIS_URL", "")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "permissions": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": PERMISSION_CACHE_REDIS_URL,
+            "KEY_PREFIX": "permissions",
+        }
+        if PERMISSION_CACHE_REDIS_URL
+        else {
+            "BACKEND": "assistants.cache.LocalDBCache",
+            "LOCATION": PERMISSION_CACHE_DB,
+            "OPTIONS": {"MAX_ENTRIES": PERMISSION_CACHE_MAX_ENTRIES},
+        }
+    ),
+}
+
+# How Assistant.objects.for_user finds a user's assistants (assistants/managers.py);
+# compare the strategies with `manage.py access_benchmark`.
+ASSISTANT_ACCESS_STRATEGY = os.getenv("ASSISTANT_ACCESS_STRATEGY", "materialized")
+
+# Largest grant + revoke list accepted by the bulk share endpoints
+SHARE_BULK_MAX_ITEMS = int(os.getenv("SHARE_BULK_MAX_ITEMS", "1000"))
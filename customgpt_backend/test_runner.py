@@ -0,0 +1,32 @@
+"""
+Test runner that keeps the suite away from the project's ``var/`` files.
+
+The run governor, the chat rate limiter and the permission cache share state
+between processes through SQLite files (``CHAT_GOVERNOR_DB``,
+``CHAT_RATE_LIMIT_DB``, ``PERMISSION_CACHE_DB``).  During tests they point
+into a temporary directory instead, so a test run neither reads state left
+by a running server nor leaves its own behind.
+"""
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._local_dbs = tempfile.TemporaryDirectory(prefix="customgpt-tests-")
+        root = Path(self._local_dbs.name)
+        settings.CHAT_GOVERNOR_DB = str(root / "governor.sqlite3")
+        settings.CHAT_RATE_LIMIT_DB = str(root / "ratelimit.sqlite3")
+        permissions = settings.CACHES["permissions"]
+        if permissions["BACKEND"] == "assistants.cache.LocalDBCache":
+            settings.CACHES = {
+                **settings.CACHES,
+                "permissions": {**permissions, "LOCATION": str(root / "permissions.sqlite3")},
+            }
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._local_dbs.cleanup()
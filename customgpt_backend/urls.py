@@ -8,9 +8,11 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from users.views import UserMeView
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
@@ -18,4 +20,5 @@ urlpatterns = [
     path('api/',   include('accounts.urls')),
     path('api/',   include('assistants.urls')),
     path('api/',   include('org.urls')),
+    path('api/',   include('usage.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
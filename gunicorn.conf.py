@@ -0,0 +1,29 @@
+"""
+gunicorn settings, read from the working directory by ``gunicorn
+customgpt_backend.wsgi``.
+
+Keeps the Prometheus multiprocess directory (``PROMETHEUS_MULTIPROC_DIR``,
+see customgpt_backend/metrics.py) consistent: it is emptied when the server
+starts, so samples of an earlier run are not added to the new one, and the
+files of a worker that exits are marked dead so its live gauges stop
+counting.
+"""
+import os
+from pathlib import Path
+
+
+def on_starting(server):
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for entry in directory.glob("*.db"):
+        entry.unlink()
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -4,5 +4,6 @@ from .models import Department
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
-    list_display = ('name', 'created_at')
+    list_display = ('name', 'weight', 'created_at')
+    list_editable = ('weight',)
     readonly_fields = ('created_at',)
@@ -0,0 +1,24 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('org', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='weight',
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text='Relative share of chat run capacity when runs are queued.',
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+    ]
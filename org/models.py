@@ -1,8 +1,15 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 
 class Department(models.Model):
     name = models.CharField(max_length=80, unique=True)
+    # share of the upstream run slots under contention (assistants/governor.py)
+    weight = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        help_text="Relative share of chat run capacity when runs are queued.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
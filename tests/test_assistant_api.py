@@ -1,11 +1,13 @@
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from org.models import Department
-from assistants.models import Assistant, AssistantUserAccess, AssistantPermission
-from unittest.mock import MagicMock, patch
+from assistants.models import Assistant, AssistantUserAccess, AssistantDepartmentAccess, AssistantPermission
+from unittest.mock import MagicMock
 import types
-import sys
+from assistants.openai_client import override_client
 
 
 class AssistantAPITests(TestCase):
@@ -58,6 +60,26 @@ class AssistantAPITests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json(), [])
 
+    def test_list_permissions_resolved_in_one_query(self):
+        AssistantDepartmentAccess.objects.create(
+            assistant=self.asst1, department=self.dept, permission=AssistantPermission.USE
+        )
+        for i in range(5):
+            Assistant.objects.create(name=f"Shared {i}", owner=self.owner2).user_access.create(
+                user=self.edit_user, permission=AssistantPermission.USE
+            )
+        self._auth(self.edit_user)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/assistants/")
+        perms = {a["name"]: a["permission"] for a in resp.json()}
+        self.assertEqual(perms["A1"], "use")  # department
+        self.assertEqual(perms["A2"], "edit")
+        self.assertEqual(perms["Shared 0"], "use")
+        access_queries = [q for q in ctx.captured_queries if "access" in q["sql"]]
+        self.assertEqual(len(access_queries), 1)
+        # user, assistants with their permission, the caller's message ids
+        self.assertEqual(len(ctx.captured_queries), 3, [q["sql"] for q in ctx.captured_queries])
+
     def test_retrieve_denied_without_access(self):
         self._auth(self.other)
         resp = self.client.get(f"/api/assistants/{self.asst1.id}/")
@@ -65,8 +87,7 @@ class AssistantAPITests(TestCase):
 
     def test_update_denied_with_use_only(self):
         self._auth(self.use_user)
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: MagicMock())
-        with patch.dict(sys.modules, {"openai": dummy_openai}):
+        with override_client(MagicMock()):
             resp = self.client.patch(
                 f"/api/assistants/{self.asst2.id}/",
                 {"name": "X"},
@@ -82,8 +103,7 @@ class AssistantAPITests(TestCase):
             def __init__(self):
                 self.beta = types.SimpleNamespace(assistants=types.SimpleNamespace(update=update_mock))
 
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-        with patch.dict(sys.modules, {"openai": dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.patch(
                 f"/api/assistants/{self.asst2.id}/",
                 {"name": "New"},
@@ -106,8 +126,7 @@ class AssistantAPITests(TestCase):
                         runs=types.SimpleNamespace(create=lambda **kwargs: types.SimpleNamespace(id="r1", status="completed"), retrieve=lambda **kwargs: types.SimpleNamespace(id="r1", status="completed")),
                     )
                 )
-        dummy_openai = types.SimpleNamespace(OpenAI=lambda api_key=None: DummyClient())
-        with patch.dict(sys.modules, {"openai": dummy_openai}):
+        with override_client(DummyClient()):
             resp = self.client.post(
                 f"/api/assistants/{self.asst2.id}/chat/",
                 {"content": "hi"},
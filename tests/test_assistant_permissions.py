@@ -1,10 +1,16 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from assistants.managers import ACCESS_STRATEGIES
 from org.models import Department
 from assistants.models import (
     Assistant,
     AssistantUserAccess,
     AssistantDepartmentAccess,
+    AssistantAccess,
     AssistantPermission,
 )
 
@@ -46,6 +52,21 @@ class AssistantPermissionTests(TestCase):
         self.assertEqual(qs_user, [user_shared])
         self.assertEqual(qs_other, [dept_shared])
 
+    def test_with_permission_matches_permission_for(self):
+        edit_both = Assistant.objects.create(name="E", owner=self.other)
+        use_user = Assistant.objects.create(name="U", owner=self.other)
+        use_dept = Assistant.objects.create(name="D", owner=self.other)
+        Assistant.objects.create(name="None", owner=self.other)
+        Assistant.objects.create(name="Own", owner=self.user)
+        AssistantUserAccess.objects.create(assistant=edit_both, user=self.user, permission=AssistantPermission.USE)
+        AssistantDepartmentAccess.objects.create(assistant=edit_both, department=self.dept1, permission=AssistantPermission.EDIT)
+        AssistantUserAccess.objects.create(assistant=use_user, user=self.user, permission=AssistantPermission.USE)
+        AssistantDepartmentAccess.objects.create(assistant=use_dept, department=self.dept1, permission=AssistantPermission.USE)
+
+        for user in (self.user, self.other, self.owner):
+            for asst in Assistant.objects.with_permission(user):
+                self.assertEqual(asst.effective_permission, asst.permission_for(user), (user, asst))
+
     def test_unique_constraint(self):
         asst = Assistant.objects.create(name="A", owner=self.owner)
         AssistantUserAccess.objects.create(assistant=asst, user=self.user, permission=AssistantPermission.USE)
@@ -53,3 +74,128 @@ class AssistantPermissionTests(TestCase):
         with self.assertRaises(IntegrityError):
             AssistantUserAccess.objects.create(assistant=asst, user=self.user, permission=AssistantPermission.EDIT)
 
+
+
+class EffectiveAccessTests(TestCase):
+    """The materialized AssistantAccess table follows every source change."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.dept1 = Department.objects.create(name="Dept1")
+        self.dept2 = Department.objects.create(name="Dept2")
+        self.owner = User.objects.create_user(username="owner", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw", department=self.dept1)
+        self.asst = Assistant.objects.create(name="A", owner=self.owner)
+
+    def _rows(self):
+        return set(AssistantAccess.objects.values_list("user__username", "assistant__name", "permission"))
+
+    def test_owner_and_shares(self):
+        self.assertEqual(self._rows(), {("owner", "A", "edit")})
+        share = AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        dept = AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept1, permission="edit")
+        self.assertIn(("user", "A", "edit"), self._rows())  # strongest grant wins
+        dept.delete()
+        self.assertIn(("user", "A", "use"), self._rows())
+        share.permission = "edit"
+        share.save()
+        self.assertIn(("user", "A", "edit"), self._rows())
+        share.delete()
+        self.assertEqual(self._rows(), {("owner", "A", "edit")})
+
+    def test_department_move(self):
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept1, permission="use")
+        self.assertIn(("user", "A", "use"), self._rows())
+        self.user.department = self.dept2
+        self.user.save()
+        self.assertEqual(self._rows(), {("owner", "A", "edit")})
+        self.user.department = self.dept1
+        self.user.save(update_fields=["department"])
+        self.assertIn(("user", "A", "use"), self._rows())
+
+    def test_owner_change(self):
+        self.asst.owner = self.user
+        self.asst.save()
+        self.assertEqual(self._rows(), {("user", "A", "edit")})
+
+    def test_department_delete(self):
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept2, permission="use")
+        newcomer = get_user_model().objects.create_user(username="new", password="pw", department=self.dept2)
+        self.assertIn(("new", "A", "use"), self._rows())
+        newcomer.department = None
+        newcomer.save()
+        self.dept2.delete()
+        self.assertEqual(self._rows(), {("owner", "A", "edit")})
+
+    def test_cascading_deletes(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept1, permission="use")
+        self.user.delete()
+        # no row may be recreated for the user or assistant being deleted
+        self.assertEqual(AssistantAccess.objects.count(), 1)
+        self.asst.delete()
+        self.assertEqual(AssistantAccess.objects.count(), 0)
+
+    def test_lookups_use_the_table(self):
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept1, permission="use")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(list(Assistant.objects.for_user(self.user)), [self.asst])
+            self.assertEqual(self.asst.permission_for(self.user), AssistantPermission.USE)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn("DISTINCT", ctx.captured_queries[0]["sql"])
+
+    def test_strategies_agree(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        other = Assistant.objects.create(name="B", owner=self.owner)
+        AssistantDepartmentAccess.objects.create(assistant=other, department=self.dept1, permission="use")
+        AssistantUserAccess.objects.create(assistant=other, user=self.user, permission="edit")
+        Assistant.objects.create(name="C", owner=self.owner)
+        for user, expected in ((self.user, {"A", "B"}), (self.owner, {"A", "B", "C"})):
+            for strategy in ACCESS_STRATEGIES:
+                names = list(Assistant.objects.for_user(user, strategy).values_list("name", flat=True))
+                self.assertEqual(sorted(names), sorted(expected), strategy)  # no duplicates
+
+    def test_permission_lookups_follow_the_strategy(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        other = Assistant.objects.create(name="B", owner=self.owner)
+        AssistantDepartmentAccess.objects.create(assistant=other, department=self.dept1, permission="use")
+        AssistantUserAccess.objects.create(assistant=other, user=self.user, permission="edit")
+        Assistant.objects.create(name="C", owner=self.user)
+        Assistant.objects.create(name="D", owner=self.owner)
+        expected = {"A": "use", "B": "edit", "C": "edit", "D": None}
+        for strategy in ACCESS_STRATEGIES:
+            annotated = dict(
+                Assistant.objects.with_permission(self.user, strategy).values_list("name", "effective_permission")
+            )
+            self.assertEqual(annotated, expected, strategy)
+            for asst in Assistant.objects.all():
+                self.assertEqual(asst.permission_for(self.user, strategy), expected[asst.name], strategy)
+
+        # the non-materialized strategies don't read the table at all
+        AssistantAccess.objects.all().delete()
+        with self.settings(ASSISTANT_ACCESS_STRATEGY="exists"):
+            self.assertEqual(Assistant.objects.get(name="B").permission_for(self.user), "edit")
+            self.assertEqual(
+                dict(Assistant.objects.with_permission(self.user).values_list("name", "effective_permission")),
+                expected,
+            )
+
+    def test_benchmark_command_leaves_no_rows(self):
+        out = StringIO()
+        call_command(
+            "access_benchmark", "--assistants", "20", "--user-shares", "60", "--department-shares", "20",
+            "--users", "10", "--departments", "3", "--samples", "5", stdout=out,
+        )
+        for strategy in ACCESS_STRATEGIES:
+            self.assertIn(strategy, out.getvalue())
+        self.assertEqual(Assistant.objects.count(), 1)
+        self.assertEqual(self._rows(), {("owner", "A", "edit")})
+
+    def test_rebuild_command(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        expected = self._rows()
+        AssistantAccess.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_assistant_access", stdout=out)
+        self.assertEqual(self._rows(), expected)
+        self.assertIn("2 rows", out.getvalue())
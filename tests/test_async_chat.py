@@ -0,0 +1,169 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant
+from chat.models import Thread
+from unittest.mock import AsyncMock, MagicMock, patch
+import types
+from assistants.openai_client import override_client
+
+
+class AsyncChatTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _dummy_client(self, retrieve_statuses):
+        message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="hello"))])
+        self.retrieve = MagicMock(side_effect=[
+            types.SimpleNamespace(id="r1", status=s) for s in retrieve_statuses
+        ])
+        # runs are watched by the shared poller, which uses the sync client
+        self.sync_client = types.SimpleNamespace(
+            beta=types.SimpleNamespace(
+                threads=types.SimpleNamespace(
+                    runs=types.SimpleNamespace(retrieve=self.retrieve)
+                )
+            )
+        )
+
+        class DummyClient:
+            def __init__(self):
+                self.beta = types.SimpleNamespace(
+                    threads=types.SimpleNamespace(
+                        create=AsyncMock(return_value=types.SimpleNamespace(id="thr_new")),
+                        messages=types.SimpleNamespace(
+                            create=AsyncMock(),
+                            list=AsyncMock(return_value=types.SimpleNamespace(data=[message])),
+                        ),
+                        runs=types.SimpleNamespace(
+                            create=AsyncMock(return_value=types.SimpleNamespace(id="r1", status="queued")),
+                        ),
+                    )
+                )
+
+        return DummyClient()
+
+    def test_async_chat_awaits_run_and_persists(self):
+        self._auth(self.owner)
+        dummy_client = self._dummy_client(["in_progress", "completed"])
+        with override_client(self.sync_client, async_client=dummy_client), \
+                self.settings(RUN_POLL_INITIAL_INTERVAL=0.01):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/async/",
+                {"content": "hi"},
+                format="json",
+            )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"content": "hello"})
+        self.assertEqual(self.retrieve.call_count, 2)
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertEqual(thread.openai_id, "thr_new")
+        roles = list(thread.messages.values_list("role", flat=True))
+        self.assertEqual(roles, ["user", "assistant"])
+
+    def test_unread_async_stream_releases_lease_and_slot_on_close(self):
+        self._auth(self.owner)
+        dummy_client = self._dummy_client([])
+
+        async def events():
+            yield types.SimpleNamespace(event="thread.run.completed", data=None)
+
+        dummy_client.beta.threads.runs.create = AsyncMock(return_value=events())
+        slot = MagicMock()
+        with override_client(self.sync_client, async_client=dummy_client), \
+                patch("assistants.async_views.run_governor.aacquire", AsyncMock(return_value=slot)):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/async/?stream=1",
+                {"content": "hi"},
+                format="json",
+            )
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertNotEqual(thread.run_lock_owner, "")
+
+        resp.close()  # e.g. the client went away before the first chunk
+
+        thread.refresh_from_db()
+        self.assertEqual(thread.run_lock_owner, "")
+        slot.release.assert_called()
+
+    def test_async_stream_forwards_deltas_and_persists_reply(self):
+        self._auth(self.owner)
+        dummy_client = self._dummy_client([])
+
+        async def events():
+            yield types.SimpleNamespace(event="thread.message.delta", data=types.SimpleNamespace(
+                delta=types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="Hi"))])
+            ))
+            yield types.SimpleNamespace(event="thread.run.completed", data=None)
+
+        dummy_client.beta.threads.runs.create = AsyncMock(return_value=events())
+        with override_client(self.sync_client, async_client=dummy_client):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/async/?stream=1",
+                {"content": "hi"},
+                format="json",
+            )
+            body = async_to_sync(self._read)(resp)
+
+        self.assertIn('event: delta\ndata: {"content": "Hi"}', body)
+        self.assertTrue(body.endswith('event: done\ndata: {"content": "Hi"}\n\n'))
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertEqual(
+            list(thread.messages.values_list("role", "content")),
+            [("user", "hi"), ("assistant", "Hi")],
+        )
+
+    @staticmethod
+    async def _read(resp):
+        return "".join([chunk.decode() async for chunk in resp.streaming_content])
+
+    def test_upstream_error_is_a_json_502(self):
+        class APIError(Exception):
+            status_code = 400
+            message = "Invalid 'assistant_id'"
+
+        self._auth(self.owner)
+        dummy_client = self._dummy_client([])
+        dummy_client.beta.threads.runs.create = AsyncMock(side_effect=APIError())
+        with override_client(self.sync_client, async_client=dummy_client):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/async/",
+                {"content": "hi"},
+                format="json",
+            )
+
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.json(), {"detail": "Invalid 'assistant_id'"})
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertEqual(thread.run_lock_owner, "")
+
+    def test_async_chat_requires_access(self):
+        self._auth(self.other)
+        resp = self.client.post(
+            f"/api/assistants/{self.asst.id}/chat/async/",
+            {"content": "hi"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 403)
+
+    def test_async_chat_requires_authentication(self):
+        resp = self.client.post(
+            f"/api/assistants/{self.asst.id}/chat/async/",
+            {"content": "hi"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 401)
@@ -0,0 +1,173 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from assistants.jobs import execute_job
+from assistants.models import Assistant, ChatJob, Message
+from assistants.openai_client import override_client
+from unittest.mock import MagicMock
+import io
+import types
+
+
+def _dummy_client(run_status="completed"):
+    message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="done!"))])
+    run = types.SimpleNamespace(id="r1", status=run_status)
+    return types.SimpleNamespace(
+        beta=types.SimpleNamespace(
+            threads=types.SimpleNamespace(
+                create=MagicMock(return_value=types.SimpleNamespace(id="thr_1")),
+                messages=types.SimpleNamespace(
+                    create=MagicMock(return_value=types.SimpleNamespace(id="msg_1")),
+                    list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+                ),
+                runs=types.SimpleNamespace(
+                    create=MagicMock(return_value=run),
+                    retrieve=MagicMock(return_value=run),
+                ),
+            )
+        )
+    )
+
+
+class ChatJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a", model="o3-mini")
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def test_background_chat_returns_202_with_job(self):
+        self._auth(self.owner)
+        resp = self.client.post(
+            f"/api/assistants/{self.asst.id}/chat/?background=1",
+            {"content": "think hard"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 202)
+        job = ChatJob.objects.get(pk=resp.json()["job_id"])
+        self.assertEqual(job.status, ChatJob.Status.QUEUED)
+        self.assertEqual(resp.json()["url"], f"/api/chat-jobs/{job.id}/")
+        self.assertTrue(Message.objects.filter(assistant=self.asst, role="user", content="think hard").exists())
+
+    def test_claim_is_exclusive_until_lease_expires(self):
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        self.assertEqual(ChatJob.objects.claim_next("w1", 60).pk, job.pk)
+        self.assertIsNone(ChatJob.objects.claim_next("w2", 60))
+
+        ChatJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        reclaimed = ChatJob.objects.claim_next("w2", 60)
+        self.assertEqual(reclaimed.lease_owner, "w2")
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertFalse(ChatJob.objects.renew_lease(job, "w1", 60))
+
+    def test_failed_run_is_retried_then_marked_failed(self):
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        with override_client(_dummy_client(run_status="failed")), \
+                self.settings(CHAT_JOB_MAX_ATTEMPTS=2):
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+            job.refresh_from_db()
+            self.assertEqual(job.status, ChatJob.Status.QUEUED)
+
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+            job.refresh_from_db()
+            self.assertEqual(job.status, ChatJob.Status.FAILED)
+            self.assertIn("failed", job.error)
+
+    def test_retry_after_failed_run_starts_new_run_without_reposting(self):
+        client = _dummy_client()
+        client.beta.threads.runs.create.side_effect = [
+            types.SimpleNamespace(id="r1", status="failed"),
+            types.SimpleNamespace(id="r2", status="completed"),
+        ]
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        with override_client(client):
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+            job.refresh_from_db()
+            self.assertEqual(job.status, ChatJob.Status.QUEUED)
+            self.assertEqual((job.message_id, job.run_id), ("msg_1", ""))
+
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+        job.refresh_from_db()
+        self.assertEqual(job.status, ChatJob.Status.SUCCEEDED)
+        self.assertEqual(job.run_id, "r2")
+        client.beta.threads.messages.create.assert_called_once()
+        client.beta.threads.runs.retrieve.assert_not_called()
+
+    def test_retry_after_failed_run_start_does_not_repost(self):
+        client = _dummy_client()
+        client.beta.threads.runs.create.side_effect = [
+            RuntimeError("upstream unavailable"),
+            types.SimpleNamespace(id="r1", status="completed"),
+        ]
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        with override_client(client):
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+            job.refresh_from_db()
+            self.assertEqual(job.status, ChatJob.Status.QUEUED)
+            self.assertEqual((job.thread_id, job.message_id), ("thr_1", "msg_1"))
+
+            execute_job(ChatJob.objects.claim_next("w1", 60), "w1")
+        job.refresh_from_db()
+        self.assertEqual(job.status, ChatJob.Status.SUCCEEDED)
+        client.beta.threads.messages.create.assert_called_once()
+        self.assertEqual(
+            client.beta.threads.runs.create.call_args.kwargs["thread_id"], "thr_1"
+        )
+
+    def test_pending_job_long_poll_times_out_with_202(self):
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        self._auth(self.owner)
+        resp = self.client.get(f"/api/chat-jobs/{job.id}/", {"wait": 0})
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["status"], "queued")
+        self.assertIsNone(resp.json()["reply"])
+
+    def test_job_only_visible_to_its_user(self):
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        self._auth(self.other)
+        resp = self.client.get(f"/api/chat-jobs/{job.id}/", {"wait": 0})
+        self.assertEqual(resp.status_code, 404)
+
+
+class ChatWorkerCommandTests(TransactionTestCase):
+    # the worker runs jobs on pool threads, which need committed rows
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = get_user_model().objects.create_user(username="own", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def test_worker_runs_job_and_long_poll_returns_reply(self):
+        job = ChatJob.objects.create(assistant=self.asst, user=self.owner, content="x")
+        client = _dummy_client()
+        with override_client(client):
+            call_command("chat_worker", "--once", stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ChatJob.Status.SUCCEEDED)
+        self.assertEqual((job.thread_id, job.run_id), ("thr_1", "r1"))
+        client.beta.threads.messages.create.assert_called_with(thread_id="thr_1", role="user", content="x")
+
+        self._auth(self.owner)
+        resp = self.client.get(f"/api/chat-jobs/{job.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["reply"], "done!")
@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant, Message
+from chat.models import Thread
+from unittest.mock import MagicMock, patch
+import json
+import types
+from assistants.openai_client import override_client
+
+
+def _delta(text):
+    block = types.SimpleNamespace(text=types.SimpleNamespace(value=text))
+    return types.SimpleNamespace(
+        event="thread.message.delta",
+        data=types.SimpleNamespace(delta=types.SimpleNamespace(content=[block])),
+    )
+
+
+def _parse(body):
+    frames = []
+    for chunk in body.strip().split("\n\n"):
+        event, data = chunk.split("\n")
+        frames.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return frames
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = get_user_model().objects.create_user(username="own", password="pw")
+        self.asst = Assistant.objects.create(name="S", owner=self.owner, openai_id="asst_s")
+        Thread.objects.create(assistant=self.asst, user=self.owner, openai_id="thr_s")
+        resp = self.client.post(
+            "/api/token/", {"username": "own", "password": "pw"}, format="json"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _post(self, events, read=True):
+        create_mock = MagicMock(return_value=iter(events))
+
+        class DummyClient:
+            def __init__(self):
+                self.beta = types.SimpleNamespace(
+                    threads=types.SimpleNamespace(
+                        messages=types.SimpleNamespace(create=MagicMock()),
+                        runs=types.SimpleNamespace(create=create_mock),
+                    )
+                )
+
+        with override_client(DummyClient()):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/?stream=1",
+                {"content": "hi"},
+                format="json",
+            )
+            body = b"".join(resp.streaming_content).decode() if read else None
+        return resp, body, create_mock
+
+    def test_stream_forwards_deltas_and_persists_reply(self):
+        completed = types.SimpleNamespace(
+            event="thread.run.completed", data=types.SimpleNamespace(status="completed")
+        )
+        resp, body, create_mock = self._post([_delta("Hel"), _delta("lo"), completed])
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        self.assertTrue(create_mock.call_args.kwargs["stream"])
+        self.assertEqual(
+            _parse(body),
+            [
+                ("delta", {"content": "Hel"}),
+                ("delta", {"content": "lo"}),
+                ("done", {"content": "Hello"}),
+            ],
+        )
+        reply = Message.objects.get(assistant=self.asst, role="assistant")
+        self.assertEqual(reply.content, "Hello")
+
+    def test_failed_run_emits_error_without_persisting(self):
+        failed = types.SimpleNamespace(
+            event="thread.run.failed", data=types.SimpleNamespace(status="failed")
+        )
+        resp, body, _ = self._post([_delta("partial"), failed])
+
+        frames = _parse(body)
+        self.assertEqual(frames[-1][0], "error")
+        self.assertFalse(Message.objects.filter(role="assistant").exists())
+
+    def test_upstream_error_is_a_json_502(self):
+        class APIError(Exception):
+            status_code = 400
+            message = "Invalid 'assistant_id'"
+
+        client = types.SimpleNamespace(beta=types.SimpleNamespace(threads=types.SimpleNamespace(
+            messages=types.SimpleNamespace(create=MagicMock()),
+            runs=types.SimpleNamespace(create=MagicMock(side_effect=APIError())),
+        )))
+        with override_client(client):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/?stream=1",
+                {"content": "hi"},
+                format="json",
+            )
+
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(resp.json(), {"detail": "Invalid 'assistant_id'"})
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertEqual(thread.run_lock_owner, "")
+
+    def test_closing_unread_stream_releases_lease_and_slot(self):
+        slot = MagicMock()
+        with patch("assistants.views.run_governor.acquire", return_value=slot):
+            resp, _, _ = self._post([_delta("never sent")], read=False)
+        thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        self.assertNotEqual(thread.run_lock_owner, "")
+
+        # e.g. the client disconnected before the first chunk was written
+        resp.close()
+
+        thread.refresh_from_db()
+        self.assertEqual(thread.run_lock_owner, "")
+        slot.release.assert_called()
@@ -0,0 +1,157 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, Message
+from assistants.openai_client import override_client
+from chat.models import Thread
+from unittest.mock import MagicMock
+import itertools
+import types
+
+
+class PerUserThreadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw")
+        self.asst = Assistant.objects.create(name="Shared", owner=self.owner, openai_id="asst_s")
+        AssistantUserAccess.objects.create(
+            assistant=self.asst, user=self.user, permission=AssistantPermission.USE
+        )
+
+        ids = itertools.count(1)
+        message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="reply"))])
+        run = types.SimpleNamespace(id="r1", status="completed")
+        self.runs_create = MagicMock(return_value=run)
+        self.dummy = types.SimpleNamespace(
+            beta=types.SimpleNamespace(
+                threads=types.SimpleNamespace(
+                    create=lambda: types.SimpleNamespace(id=f"thr_{next(ids)}"),
+                    delete=MagicMock(),
+                    messages=types.SimpleNamespace(
+                        create=MagicMock(),
+                        list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+                    ),
+                    runs=types.SimpleNamespace(create=self.runs_create),
+                )
+            )
+        )
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _chat(self, user, content):
+        self._auth(user)
+        with override_client(self.dummy):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/", {"content": content}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200)
+
+    def test_each_user_gets_own_upstream_thread(self):
+        self._chat(self.owner, "from owner")
+        self._chat(self.user, "from user")
+        self._chat(self.owner, "owner again")
+
+        owner_thread = Thread.objects.get(assistant=self.asst, user=self.owner)
+        user_thread = Thread.objects.get(assistant=self.asst, user=self.user)
+        self.assertNotEqual(owner_thread.openai_id, user_thread.openai_id)
+        used = [c.kwargs["thread_id"] for c in self.runs_create.call_args_list]
+        self.assertEqual(used, [owner_thread.openai_id, user_thread.openai_id, owner_thread.openai_id])
+        self.assertEqual(owner_thread.messages.count(), 4)
+        self.assertEqual(user_thread.messages.count(), 2)
+
+    def test_history_and_reset_are_per_user(self):
+        self._chat(self.owner, "from owner")
+        self._chat(self.user, "from user")
+
+        self._auth(self.user)
+        resp = self.client.get("/api/messages/", {"assistant": self.asst.id})
+        self.assertEqual([m["content"] for m in resp.json()], ["from user", "reply"])
+
+        with override_client(self.dummy):
+            resp = self.client.post(f"/api/assistants/{self.asst.id}/reset/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(Message.objects.filter(thread__user=self.user).exists())
+        self.assertEqual(Message.objects.filter(thread__user=self.owner).count(), 2)
+
+    def test_assistant_lists_only_the_callers_message_ids(self):
+        self._chat(self.owner, "from owner")
+        self._chat(self.user, "from user")
+
+        self._auth(self.user)
+        resp = self.client.get(f"/api/assistants/{self.asst.id}/")
+        own = [str(pk) for pk in Message.objects.filter(thread__user=self.user).values_list("id", flat=True)]
+        self.assertEqual(sorted(resp.json()["messages"]), sorted(own))
+
+
+class TimedOutRunTests(TestCase):
+    """A turn that gives up on its run must not leave it blocking the thread."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = get_user_model().objects.create_user(username="own", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+        Thread.objects.create(assistant=self.asst, user=self.owner, openai_id="thr_a")
+        resp = self.client.post(
+            "/api/token/", {"username": "own", "password": "pw"}, format="json"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+        # like upstream: no new messages while a run of the thread is active
+        self.active = set()
+        self.finish_runs = False
+        runs = itertools.count(1)
+        message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="reply"))])
+
+        class BusyError(Exception):
+            status_code = 400
+            message = "Thread thr_a already has an active run."
+
+        def create_message(thread_id, role, content):
+            if self.active:
+                raise BusyError()
+            return types.SimpleNamespace(id="msg_1")
+
+        def create_run(**kwargs):
+            run = types.SimpleNamespace(id=f"run_{next(runs)}", status="queued")
+            self.active.add(run.id)
+            return run
+
+        def retrieve(thread_id, run_id):
+            if self.finish_runs:
+                self.active.discard(run_id)
+                return types.SimpleNamespace(id=run_id, status="completed")
+            return types.SimpleNamespace(id=run_id, status="in_progress")
+
+        def cancel(thread_id, run_id):
+            self.active.discard(run_id)
+
+        self.dummy = types.SimpleNamespace(beta=types.SimpleNamespace(threads=types.SimpleNamespace(
+            messages=types.SimpleNamespace(
+                create=create_message,
+                list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+            ),
+            runs=types.SimpleNamespace(create=create_run, retrieve=retrieve, cancel=cancel),
+        )))
+
+    def _chat(self):
+        with override_client(self.dummy), \
+                self.settings(RUN_POLL_TIMEOUT=0.1, RUN_POLL_INITIAL_INTERVAL=0.01):
+            return self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/", {"content": "hi"}, format="json"
+            )
+
+    def test_next_turn_after_a_timeout_succeeds(self):
+        self.assertEqual(self._chat().status_code, 504)
+
+        self.finish_runs = True
+        resp = self._chat()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"content": "reply"})
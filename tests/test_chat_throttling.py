@@ -0,0 +1,90 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, ChatJob
+from assistants.throttling import TokenBuckets
+from org.models import Department
+from pathlib import Path
+import tempfile
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.buckets = TokenBuckets(Path(tmp.name) / "rl.sqlite3")
+
+    def test_burst_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(self.buckets.take([("k", 3, 1)], now=100.0), 0)
+        self.assertAlmostEqual(self.buckets.take([("k", 3, 1)], now=100.0), 20.0)
+        self.assertEqual(self.buckets.take([("k", 3, 1)], now=120.0), 0)
+
+    def test_all_or_nothing(self):
+        self.buckets.take([("small", 1, 1)], now=0.0)
+        self.assertGreater(self.buckets.take([("big", 10, 1), ("small", 1, 1)], now=0.0), 0)
+        # "big" was not charged for the refused request
+        self.assertEqual(self.buckets.take([("big", 10, 10)], now=0.0), 0)
+
+
+class ChatThrottleTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(CHAT_RATE_LIMIT_DB=str(Path(tmp.name) / "rl.sqlite3"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.client = APIClient()
+        User = get_user_model()
+        dept = Department.objects.create(name="Ops")
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.ann = User.objects.create_user(username="ann", password="pw", department=dept)
+        self.bob = User.objects.create_user(username="bob", password="pw", department=dept)
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+        for user in (self.ann, self.bob):
+            AssistantUserAccess.objects.create(
+                assistant=self.asst, user=user, permission=AssistantPermission.USE
+            )
+
+    def _chat(self, user, content="hi"):
+        self.client.force_authenticate(user)
+        # background turns never reach OpenAI in the request itself
+        return self.client.post(
+            f"/api/assistants/{self.asst.id}/chat/?background=1", {"content": content}, format="json"
+        )
+
+    @override_settings(CHAT_USER_REQUESTS_PER_MINUTE=2)
+    def test_user_request_limit(self):
+        self.assertEqual(self._chat(self.ann).status_code, 202)
+        self.assertEqual(self._chat(self.ann).status_code, 202)
+        resp = self._chat(self.ann)
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreaterEqual(int(resp["Retry-After"]), 1)
+        self.assertEqual(ChatJob.objects.count(), 2)
+        self.assertEqual(self._chat(self.bob).status_code, 202)  # separate bucket
+
+    @override_settings(CHAT_USER_REQUESTS_PER_MINUTE=1)
+    def test_refused_requests_are_not_charged(self):
+        self.assertEqual(self._chat(self.ann, "   ").status_code, 400)
+        other = Assistant.objects.create(name="B", owner=self.owner, openai_id="asst_b")
+        self.client.force_authenticate(self.ann)
+        resp = self.client.post(
+            f"/api/assistants/{other.id}/chat/?background=1", {"content": "hi"}, format="json"
+        )
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(self._chat(self.ann).status_code, 202)
+        self.assertEqual(self._chat(self.ann).status_code, 429)
+
+    @override_settings(CHAT_DEPARTMENT_REQUESTS_PER_MINUTE=2)
+    def test_department_request_limit_is_shared(self):
+        self.assertEqual(self._chat(self.ann).status_code, 202)
+        self.assertEqual(self._chat(self.bob).status_code, 202)
+        self.assertEqual(self._chat(self.ann).status_code, 429)
+        self.assertEqual(self._chat(self.owner).status_code, 202)  # no department
+
+    @override_settings(CHAT_USER_TOKENS_PER_MINUTE=3000, CHAT_TOKENS_PER_TURN=900)
+    def test_user_token_limit(self):
+        self.assertEqual(self._chat(self.ann, "x" * 4000).status_code, 202)  # 1900 tokens
+        self.assertEqual(self._chat(self.ann, "x" * 4000).status_code, 429)
+        self.assertEqual(self._chat(self.ann, "short").status_code, 202)
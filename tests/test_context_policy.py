@@ -0,0 +1,117 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from assistants.models import Assistant, ContextStrategy, Message
+from assistants.conversation import compact_thread, run_options
+from assistants.openai_client import override_client
+from chat.models import Thread
+from unittest.mock import MagicMock
+import types
+
+
+def _dummy_client():
+    message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="reply"))])
+    completion = types.SimpleNamespace(
+        choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=" the gist "))]
+    )
+    return types.SimpleNamespace(
+        beta=types.SimpleNamespace(
+            threads=types.SimpleNamespace(
+                create=MagicMock(return_value=types.SimpleNamespace(id="thr_new")),
+                delete=MagicMock(),
+                messages=types.SimpleNamespace(
+                    create=MagicMock(),
+                    list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+                ),
+                runs=types.SimpleNamespace(
+                    create=MagicMock(return_value=types.SimpleNamespace(id="r1", status="completed"))
+                ),
+            )
+        ),
+        chat=types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=MagicMock(return_value=completion))
+        ),
+    )
+
+
+class ContextPolicyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="u", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.user, openai_id="asst_1")
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.user, openai_id="thr_old")
+
+    def _auth(self):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": "u", "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _history(self, count):
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(count):
+            Message.objects.create(
+                assistant=self.asst, thread=self.thread,
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"m{i}", created_at=start + timedelta(seconds=i),
+            )
+
+    def test_full_thread_sends_no_run_options(self):
+        self.assertEqual(run_options(self.asst), {})
+
+    def test_truncation_and_token_budget_passed_to_run(self):
+        self.asst.context_strategy = ContextStrategy.LAST_MESSAGES
+        self.asst.context_last_messages = 6
+        self.asst.max_prompt_tokens = 4000
+        self.asst.save()
+        dummy = _dummy_client()
+        self._auth()
+        with override_client(dummy):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/", {"content": "hi"}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200)
+        kwargs = dummy.beta.threads.runs.create.call_args.kwargs
+        self.assertEqual(kwargs["truncation_strategy"], {"type": "last_messages", "last_messages": 6})
+        self.assertEqual(kwargs["max_prompt_tokens"], 4000)
+
+    def test_summary_mode_waits_for_enough_messages(self):
+        self.asst.context_strategy = ContextStrategy.SUMMARY
+        self.asst.context_last_messages = 4
+        self._history(8)
+        dummy = _dummy_client()
+        self.assertFalse(compact_thread(dummy, self.asst, self.thread))
+        dummy.chat.completions.create.assert_not_called()
+
+    def test_summary_mode_moves_to_seeded_thread(self):
+        self.asst.context_strategy = ContextStrategy.SUMMARY
+        self.asst.context_last_messages = 4
+        self._history(9)
+        dummy = _dummy_client()
+
+        self.assertTrue(compact_thread(dummy, self.asst, self.thread))
+
+        seed = dummy.beta.threads.create.call_args.kwargs["messages"]
+        self.assertIn("the gist", seed[0]["content"])
+        self.assertEqual([m["content"] for m in seed[1:]], ["m5", "m6", "m7", "m8"])
+        dummy.beta.threads.delete.assert_called_once_with("thr_old")
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.openai_id, "thr_new")
+        self.assertEqual(self.thread.summary, "the gist")
+        # nothing new to fold in until another batch of turns arrives
+        self.assertFalse(compact_thread(dummy, self.asst, self.thread))
+
+    def test_serializer_validates_context_fields(self):
+        self._auth()
+        resp = self.client.patch(
+            f"/api/assistants/{self.asst.id}/",
+            {"context_strategy": "summary", "max_prompt_tokens": 10},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("max_prompt_tokens", resp.json())
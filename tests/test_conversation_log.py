@@ -0,0 +1,114 @@
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from assistants.models import Assistant, Message
+from assistants.storage import SegmentLog, close_all, iter_messages, read_message
+from pathlib import Path
+from io import StringIO
+from unittest.mock import patch
+import json
+import tempfile
+import uuid
+
+
+class SegmentLogTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _fill(self, log, count):
+        ids = [uuid.uuid4() for _ in range(count)]
+        for i, mid in enumerate(ids):
+            log.append(mid, {"id": str(mid), "content": f"message {i} " + "x" * 40})
+        return ids
+
+    def test_rotates_and_reads_back_by_id(self):
+        log = SegmentLog(self.tmp.name, segment_bytes=200, fsync_every=3)
+        ids = self._fill(log, 10)
+        log.close()
+
+        segments = sorted(p.name for p in Path(self.tmp.name).glob("*.jsonl"))
+        self.assertGreater(len(segments), 2)
+        for i, mid in enumerate(ids):
+            self.assertEqual(log.read(mid)["content"].split()[1], str(i))
+        self.assertIsNone(log.read(uuid.uuid4()))
+        self.assertEqual([r["id"] for r in log], [str(m) for m in ids])
+
+    def test_gzip_closed_segments(self):
+        log = SegmentLog(self.tmp.name, segment_bytes=200, compress="gzip")
+        ids = self._fill(log, 6)
+        log.close()
+
+        directory = Path(self.tmp.name)
+        self.assertTrue(list(directory.glob("*.jsonl.gz")))
+        self.assertEqual(len(list(directory.glob("*.jsonl"))), 1)  # only the active one
+        self.assertEqual(log.read(ids[0])["id"], str(ids[0]))
+        self.assertEqual(len(list(log)), 6)
+
+    def test_new_writer_continues_after_existing_segments(self):
+        first = SegmentLog(self.tmp.name, segment_bytes=200)
+        ids = self._fill(first, 4)
+        first.close()
+        second = SegmentLog(self.tmp.name, segment_bytes=200)
+        ids += self._fill(second, 4)
+        second.close()
+        self.assertEqual([r["id"] for r in second], [str(m) for m in ids])
+
+
+    def test_writer_that_missed_compressed_rotations_moves_on(self):
+        first = SegmentLog(self.tmp.name, segment_bytes=200, compress="gzip")
+        ids = self._fill(first, 1)
+        # another process rotates (and compresses) twice meanwhile
+        second = SegmentLog(self.tmp.name, segment_bytes=200, compress="gzip")
+        ids += self._fill(second, 6)
+        second.close()
+        active = max(second._sequences())
+        self.assertGreater(active, 2)
+
+        ids += self._fill(first, 1)
+        first.close()
+        self.assertEqual(first.locate(ids[-1])[0], active)
+        self.assertEqual([r["id"] for r in first], [str(m) for m in ids])
+
+    def test_compressing_an_already_compressed_segment_is_harmless(self):
+        log = SegmentLog(self.tmp.name, segment_bytes=200, compress="gzip")
+        ids = self._fill(log, 4)
+        log._compress_segment(1)  # as a second writer racing the first would
+        log.close()
+        self.assertEqual(len(list(log)), 4)
+        self.assertEqual(log.read(ids[0])["id"], str(ids[0]))
+
+
+class ConversationLogSignalTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(close_all)
+        self.root = Path(tmp.name)
+        owner = get_user_model().objects.create_user(username="own", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=owner)
+
+    def test_new_messages_are_logged_when_enabled(self):
+        with override_settings(CONVERSATION_LOG_ENABLED=True, CONVERSATION_LOG_DIR=str(self.root)):
+            msg = Message.objects.create(assistant=self.asst, role="user", content="hello")
+            self.assertEqual(read_message(self.asst.id, msg.id)["content"], "hello")
+            close_all()
+
+    def test_log_failure_does_not_fail_the_save(self):
+        with override_settings(CONVERSATION_LOG_ENABLED=True, CONVERSATION_LOG_DIR=str(self.root)), \
+                patch("assistants.storage.append_message", side_effect=OSError("disk full")), \
+                self.assertLogs("assistants.storage", "ERROR"):
+            msg = Message.objects.create(assistant=self.asst, role="user", content="hello")
+        self.assertTrue(Message.objects.filter(pk=msg.pk).exists())
+
+    def test_import_legacy_json_files(self):
+        legacy = self.root / str(self.asst.id)
+        legacy.mkdir()
+        mid = uuid.uuid4()
+        (legacy / f"{mid}.json").write_text(json.dumps({
+            "id": str(mid), "role": "user", "content": "old", "created_at": "2024-01-01T00:00:00+00:00",
+        }, indent=2))
+        with override_settings(CONVERSATION_LOG_DIR=str(self.root)):
+            call_command("import_conversation_files", stdout=StringIO())
+            self.assertFalse(list(legacy.glob("*.json")))
+            self.assertEqual([r["content"] for r in iter_messages(self.asst.id)], ["old"])
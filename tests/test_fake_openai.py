@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from assistants.fake_openai import make_server
+from assistants.models import Assistant
+from assistants.management.commands.chat_benchmark import Command, last_event, percentile
+from unittest.mock import patch
+import email
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import urllib.response
+
+
+class FakeOpenAIServerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = make_server(run_latency=0.05, stream_chunks=3, reply="one two three")
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = "http://%s:%s/v1" % self.server.server_address[:2]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _call(self, method, path, body=None):
+        request = urllib.request.Request(
+            self.base + path,
+            data=json.dumps(body).encode() if body is not None else None,
+            headers={"Content-Type": "application/json"},
+            method=method,
+        )
+        with urllib.request.urlopen(request) as resp:
+            return resp.read().decode()
+
+    def _json(self, method, path, body=None):
+        return json.loads(self._call(method, path, body))
+
+    def test_polled_run_completes_and_adds_reply(self):
+        thread = self._json("POST", "/threads", {})
+        self._json("POST", f"/threads/{thread['id']}/messages", {"role": "user", "content": "hi"})
+        run = self._json("POST", f"/threads/{thread['id']}/runs", {"assistant_id": "asst_1"})
+        self.assertEqual(run["status"], "in_progress")
+
+        time.sleep(0.1)
+        run = self._json("GET", f"/threads/{thread['id']}/runs/{run['id']}")
+        self.assertEqual(run["status"], "completed")
+        msgs = self._json("GET", f"/threads/{thread['id']}/messages?limit=1")
+        self.assertEqual(msgs["data"][0]["content"][0]["text"]["value"], "one two three")
+
+    def test_streamed_run_sends_deltas(self):
+        thread = self._json("POST", "/threads", {})
+        body = self._call("POST", f"/threads/{thread['id']}/runs", {"assistant_id": "a", "stream": True})
+        events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+        self.assertEqual(events[0], "thread.run.created")
+        self.assertEqual(events.count("thread.message.delta"), 3)
+        self.assertEqual(events[-2:], ["thread.run.completed", "done"])
+
+    def test_thread_is_busy_until_its_run_is_cancelled(self):
+        self.server.RequestHandlerClass.state.run_latency = 60
+        thread = self._json("POST", "/threads", {})
+        run = self._json("POST", f"/threads/{thread['id']}/runs", {"assistant_id": "a"})
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._call("POST", f"/threads/{thread['id']}/messages", {"role": "user", "content": "hi"})
+        self.assertEqual(ctx.exception.code, 400)
+
+        run = self._json("POST", f"/threads/{thread['id']}/runs/{run['id']}/cancel", {})
+        self.assertEqual(run["status"], "cancelled")
+        self._json("POST", f"/threads/{thread['id']}/messages", {"role": "user", "content": "hi"})
+
+    def test_failure_rate(self):
+        self.server.RequestHandlerClass.state.failure_rate = 1.0
+        thread = self._json("POST", "/threads", {})
+        run = self._json("POST", f"/threads/{thread['id']}/runs", {"assistant_id": "a"})
+        time.sleep(0.1)
+        run = self._json("GET", f"/threads/{thread['id']}/runs/{run['id']}")
+        self.assertEqual(run["status"], "failed")
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class ChatBenchmarkCommandTests(TestCase):
+    def _bench_users(self):
+        return get_user_model().objects.filter(username__startswith="bench-")
+
+    def _run(self, *args):
+        # nothing listens on the discard port, so the run fails straight away
+        call_command("chat_benchmark", "--url", "http://127.0.0.1:9", "--users", "3",
+                     *args, stdout=io.StringIO())
+
+    def test_stream_ending_in_error_counts_as_failure(self):
+        def post(url, payload, token=None, timeout=30):
+            body = b'event: delta\ndata: {}\n\nevent: error\ndata: {"detail": "x"}\n\n'
+            headers = email.message_from_string("Content-Type: text/event-stream\n\n")
+            return urllib.response.addinfourl(io.BytesIO(body), headers, url, 200)
+
+        command = Command()
+        with patch.object(command, "_post", post):
+            [(status, _, first_byte)] = command._converse("http://x/chat/?stream=1", "t", 1, 5)
+        self.assertEqual(status, "stream error")
+        self.assertEqual(last_event("event: delta\ndata: {}\n\nevent: done\ndata: {}\n\n"), "done")
+
+    @override_settings(DEBUG=False)
+    def test_refuses_to_run_without_debug(self):
+        with self.assertRaises(CommandError):
+            self._run()
+        self.assertFalse(self._bench_users().exists())
+
+    @override_settings(DEBUG=True)
+    def test_deletes_its_users_even_when_the_run_fails(self):
+        with self.assertRaises(OSError):
+            self._run()
+        self.assertFalse(self._bench_users().exists())
+        self.assertFalse(Assistant.objects.exists())
+
+    @override_settings(DEBUG=True)
+    def test_keep_leaves_the_users(self):
+        with self.assertRaises(OSError):
+            self._run("--keep")
+        self.assertEqual(self._bench_users().count(), 3)
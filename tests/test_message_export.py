@@ -0,0 +1,63 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, Message
+from chat.models import Thread
+import gzip
+import json
+
+
+@override_settings(MESSAGE_EXPORT_CHUNK_SIZE=2, MESSAGE_EXPORT_BATCH=2)
+class MessageExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw")
+        self.stranger = User.objects.create_user(username="x", password="pw")
+        self.asst = Assistant.objects.create(name="Support Bot", owner=self.owner)
+        AssistantUserAccess.objects.create(
+            assistant=self.asst, user=self.user, permission=AssistantPermission.USE
+        )
+        thread = Thread.objects.create(assistant=self.asst, user=self.user)
+        for i in range(5):
+            Message.objects.create(
+                assistant=self.asst, thread=thread,
+                role="user" if i % 2 == 0 else "assistant", content=f"m{i} é",
+            )
+        owner_thread = Thread.objects.create(assistant=self.asst, user=self.owner)
+        Message.objects.create(assistant=self.asst, thread=owner_thread, role="user", content="owner")
+        self.url = f"/api/assistants/{self.asst.id}/messages/export/"
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def test_streams_own_history_as_ndjson(self):
+        self._auth(self.user)
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="support-bot-messages.ndjson"', resp["Content-Disposition"])
+
+        chunks = list(resp.streaming_content)
+        self.assertEqual(chunks[0].count(b"\n"), 1)
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual([r["content"] for r in rows], [f"m{i} é" for i in range(5)])
+        self.assertEqual(set(rows[0]), {"id", "thread_id", "role", "content", "created_at"})
+
+    def test_gzip(self):
+        self._auth(self.user)
+        resp = self.client.get(self.url, {"gzip": "1"})
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(resp.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_requires_access(self):
+        self._auth(self.stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, Message
+from chat.models import Thread
+
+
+@override_settings(MESSAGE_PAGE_SIZE=3)
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner)
+        self.access = AssistantUserAccess.objects.create(
+            assistant=self.asst, user=self.user, permission=AssistantPermission.USE
+        )
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.user)
+        start = timezone.now() - timedelta(hours=1)
+        # two messages share a timestamp to exercise the id tie-breaker
+        stamps = [start, start + timedelta(seconds=1), start + timedelta(seconds=1)]
+        stamps += [start + timedelta(seconds=i) for i in range(2, 7)]
+        self.msgs = [
+            Message.objects.create(
+                assistant=self.asst, thread=self.thread, role="user",
+                content=f"m{i}", created_at=stamp,
+            )
+            for i, stamp in enumerate(stamps)
+        ]
+        self.msgs.sort(key=lambda m: (m.created_at, m.id))
+        self._auth(self.user)
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _get(self, **params):
+        resp = self.client.get("/api/messages/", {"assistant": self.asst.id, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def _ids(self, resp):
+        return [m["id"] for m in resp.json()]
+
+    def _expected(self, msgs):
+        return [str(m.id) for m in msgs]
+
+    def test_latest_page_and_walk_back(self):
+        resp = self._get()
+        self.assertEqual(self._ids(resp), self._expected(self.msgs[-3:]))
+        self.assertIn('rel="prev"', resp["Link"])
+        self.assertNotIn('rel="next"', resp["Link"])
+
+        seen = self._ids(resp)
+        while 'rel="prev"' in resp.get("Link", ""):
+            resp = self._get(before=resp.json()[0]["id"])
+            seen = self._ids(resp) + seen
+        self.assertEqual(seen, self._expected(self.msgs))
+
+    def test_after_cursor(self):
+        resp = self._get(after=str(self.msgs[1].id))
+        self.assertEqual(self._ids(resp), self._expected(self.msgs[2:5]))
+        self.assertIn('rel="next"', resp["Link"])
+        self.assertIn(f"after={self.msgs[4].id}", resp["Link"])
+
+    def test_page_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(before=str(self.msgs[-1].id), limit=2)
+        # auth user, thread, cursor, page
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+    def test_cursor_from_other_conversation_rejected(self):
+        other_thread = Thread.objects.create(assistant=self.asst, user=self.owner)
+        foreign = Message.objects.create(
+            assistant=self.asst, thread=other_thread, role="user", content="secret"
+        )
+        resp = self.client.get("/api/messages/", {"assistant": self.asst.id, "before": foreign.id})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_history_hidden_after_access_revoked(self):
+        self.access.delete()
+        self.assertEqual(self._get().json(), [])
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get("/api/messages/").status_code, 401)
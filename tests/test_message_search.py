@@ -0,0 +1,116 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, Message
+from assistants.search import TRIGGERS, match_expression, missing_triggers, restore_search_triggers
+from chat.models import Thread
+from io import StringIO
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner)
+        self.other = Assistant.objects.create(name="B", owner=self.owner)
+        self.access = AssistantUserAccess.objects.create(
+            assistant=self.asst, user=self.user, permission=AssistantPermission.USE
+        )
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.user)
+        owner_thread = Thread.objects.create(assistant=self.asst, user=self.owner)
+        self.hit = self._msg(self.thread, "The invoice for March was paid by transfer.")
+        self._msg(self.thread, "Invoices invoices invoices everywhere.")
+        self._msg(self.thread, "Nothing to see here.")
+        self._msg(owner_thread, "The owner's private invoice notes.")
+        self._auth(self.user)
+
+    def _msg(self, thread, content):
+        return Message.objects.create(
+            assistant=thread.assistant, thread=thread, role="assistant", content=content
+        )
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _search(self, q, **params):
+        resp = self.client.get("/api/messages/search/", {"q": q, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_ranked_snippets_within_own_threads(self):
+        results = self._search("invoice")
+        self.assertEqual(len(results), 2)  # stemmed: invoice / invoices, not the owner's
+        self.assertTrue(all(r["thread"] == str(self.thread.id) for r in results))
+        self.assertIn("[invoice]", self._search("march invoice")[0]["snippet"])
+        self.assertEqual(self._search("march invoice")[0]["id"], str(self.hit.id))
+
+    def test_index_follows_updates_and_deletes(self):
+        self.hit.content = "Refund issued"
+        self.hit.save()
+        self.assertEqual(len(self._search("refund")), 1)
+        self.hit.delete()
+        self.assertEqual(self._search("refund"), [])
+
+    def test_syntax_is_not_interpreted(self):
+        self.assertEqual(self._search('invoice" OR "x NEAR('), [])
+        self.assertEqual(len(self._search("invo*")), 2)
+
+    def test_revoked_access_hides_results(self):
+        self.access.delete()
+        self.assertEqual(self._search("invoice"), [])
+
+    def test_q_required(self):
+        self.assertEqual(self.client.get("/api/messages/search/").status_code, 400)
+
+    def test_invalid_assistant_id_is_rejected(self):
+        resp = self.client.get("/api/messages/search/", {"q": "invoice", "assistant": "nope"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("assistant", resp.json())
+        resp = self.client.get("/api/messages/", {"assistant": "nope"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM assistants_message_fts")
+        self.assertEqual(self._search("invoice"), [])
+        call_command("rebuild_message_search", "--batch-size", "2", stdout=StringIO())
+        self.assertEqual(len(self._search("invoice")), 2)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM assistants_message_fts")
+            self.assertEqual(cursor.fetchone()[0], Message.objects.count())
+
+    def _drop_triggers(self):
+        # what SQLite does to them when a migration rebuilds the table
+        with connection.cursor() as cursor:
+            for name in sorted(TRIGGERS):
+                cursor.execute(f"DROP TRIGGER {name}")
+
+    def test_missing_triggers_restored_after_migrate(self):
+        self._drop_triggers()
+        with self.assertLogs("assistants.search", "WARNING"):
+            restore_search_triggers(using="default")
+        self.assertEqual(missing_triggers(connection), set())
+        self._msg(self.thread, "A new invoice arrived.")
+        self.assertEqual(len(self._search("invoice")), 3)
+
+    def test_rebuild_command_restores_missing_triggers(self):
+        self._drop_triggers()
+        err = StringIO()
+        call_command("rebuild_message_search", stdout=StringIO(), stderr=err)
+        self.assertIn("missing triggers", err.getvalue())
+        self.assertEqual(missing_triggers(connection), set())
+
+    def test_match_expression_quotes_terms(self):
+        expr = match_expression('foo "bar baz*', [self.thread.id])
+        self.assertEqual(
+            expr, f'thread : (t{self.thread.id.hex}) AND content : ("foo" "bar" "baz"*)'
+        )
@@ -0,0 +1,104 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant
+from assistants.openai_client import get_client, override_client
+from assistants.resilience import UpstreamUnavailable, breaker
+from django.conf import settings
+from unittest.mock import MagicMock, patch
+import importlib.util
+import os
+import tempfile
+import types
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="u", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.user, openai_id="asst_1")
+
+    def _auth(self):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": "u", "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _metrics(self):
+        # a client of its own: self.client may carry a user's JWT
+        resp = APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+        return resp.content.decode()
+
+    def test_requests_counted_by_url_name(self):
+        self._auth()
+        self.client.get("/api/assistants/")
+        body = self._metrics()
+        self.assertIn('http_requests_total{method="GET",status="200",view="assistant-list"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.01",method="GET",view="assistant-list"}', body)
+        self.assertIn('http_request_db_queries_count{view="assistant-list"}', body)
+        self.assertIn("chat_runs_in_flight", body)
+
+    @override_settings(OPENAI_MAX_RETRIES=0)
+    def test_openai_calls_timed_and_errors_counted(self):
+        self.addCleanup(breaker.reset)
+        dummy = types.SimpleNamespace(
+            beta=types.SimpleNamespace(
+                threads=types.SimpleNamespace(
+                    create=MagicMock(return_value=types.SimpleNamespace(id="thr_1")),
+                    delete=MagicMock(side_effect=TimeoutError("slow")),
+                )
+            )
+        )
+        with override_client(dummy):
+            client = get_client()
+            self.assertEqual(client.beta.threads.create().id, "thr_1")
+            with self.assertRaises(UpstreamUnavailable):
+                client.beta.threads.delete("thr_1")
+        body = self._metrics()
+        self.assertIn('openai_request_duration_seconds_count{method="threads.create"}', body)
+        self.assertIn('openai_request_errors_total{error="TimeoutError",method="threads.delete"}', body)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        resp = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_without_token_only_open_in_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class GunicornHooksTests(TestCase):
+    def setUp(self):
+        spec = importlib.util.spec_from_file_location(
+            "gunicorn_conf", settings.BASE_DIR / "gunicorn.conf.py"
+        )
+        self.conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.conf)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = os.path.join(tmp.name, "prometheus")
+
+    def test_on_starting_empties_the_multiprocess_dir(self):
+        os.makedirs(self.dir)
+        open(os.path.join(self.dir, "counter_123.db"), "wb").close()
+        with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": self.dir}):
+            self.conf.on_starting(None)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_child_exit_marks_the_worker_dead(self):
+        worker = types.SimpleNamespace(pid=123)
+        with patch("prometheus_client.multiprocess.mark_process_dead") as mark:
+            with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": self.dir}):
+                self.conf.child_exit(None, worker)
+            mark.assert_called_once_with(123)
+            with patch.dict(os.environ, {}, clear=True):
+                self.conf.child_exit(None, worker)
+            mark.assert_called_once()
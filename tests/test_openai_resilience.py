@@ -0,0 +1,219 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants import resilience
+from assistants.models import Assistant, Message
+from assistants.openai_client import get_client, override_client
+from assistants.resilience import CircuitOpen, UpstreamUnavailable, breaker
+from chat.models import Thread
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import time
+import types
+
+
+class APIError(Exception):
+    def __init__(self, status, headers=None, code=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.code = code
+        self.response = types.SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def _client(**methods):
+    return types.SimpleNamespace(
+        beta=types.SimpleNamespace(threads=types.SimpleNamespace(
+            runs=types.SimpleNamespace(**methods),
+            delete=methods.get("delete"),
+        ))
+    )
+
+
+@override_settings(OPENAI_BREAKER_THRESHOLD=100)
+@patch("assistants.resilience.backoff", return_value=0)
+class RetryPolicyTests(TestCase):
+    def setUp(self):
+        self.addCleanup(breaker.reset)
+
+    def test_reads_retry_transient_errors(self, _):
+        retrieve = MagicMock(side_effect=[APIError(500), TimeoutError(), "run"])
+        with override_client(_client(retrieve=retrieve)):
+            self.assertEqual(get_client().beta.threads.runs.retrieve(run_id="r"), "run")
+        self.assertEqual(retrieve.call_count, 3)
+
+    def test_creates_only_retry_when_not_acted_on(self, _):
+        create = MagicMock(side_effect=[APIError(503), APIError(429), "run"])
+        with override_client(_client(create=create)):
+            self.assertEqual(get_client().beta.threads.runs.create(), "run")
+
+        create = MagicMock(side_effect=APIError(500))
+        with override_client(_client(create=create)), self.assertRaises(UpstreamUnavailable):
+            get_client().beta.threads.runs.create()
+        self.assertEqual(create.call_count, 1)
+
+    def test_client_errors_are_raised_unchanged(self, _):
+        retrieve = MagicMock(side_effect=APIError(404))
+        with override_client(_client(retrieve=retrieve)), self.assertRaises(APIError):
+            get_client().beta.threads.runs.retrieve()
+        self.assertEqual(retrieve.call_count, 1)
+
+    @override_settings(OPENAI_MAX_RETRIES=1)
+    def test_gives_up_after_max_retries(self, _):
+        retrieve = MagicMock(side_effect=APIError(502))
+        with override_client(_client(retrieve=retrieve)), self.assertRaises(UpstreamUnavailable):
+            get_client().beta.threads.runs.retrieve()
+        self.assertEqual(retrieve.call_count, 2)
+
+    def test_async_calls_are_retried(self, _):
+        retrieve = AsyncMock(side_effect=[APIError(503), "run"])
+        with override_client(async_client=_client(retrieve=retrieve)):
+            from assistants.openai_client import get_async_client
+
+            async def go():
+                return await get_async_client().beta.threads.runs.retrieve()
+
+            self.assertEqual(asyncio.run(go()), "run")
+        self.assertEqual(retrieve.await_count, 2)
+
+    def test_retry_after_is_honoured_within_budget(self, _):
+        deadline = time.monotonic() + 20
+        exc = APIError(429, {"retry-after": "3"})
+        self.assertEqual(resilience._next_delay("threads.runs.create", exc, 0, False, deadline), 3)
+        exc = APIError(503, {"retry-after-ms": "250"})
+        self.assertEqual(resilience._next_delay("threads.runs.create", exc, 0, False, deadline), 0.25)
+        # would sleep past the budget: give up instead
+        exc = APIError(429, {"retry-after": "60"})
+        self.assertIsNone(resilience._next_delay("threads.runs.create", exc, 0, False, deadline))
+        exc = APIError(429, code="insufficient_quota")
+        self.assertIsNone(resilience._next_delay("threads.runs.create", exc, 0, False, deadline))
+
+    @override_settings(OPENAI_ENDPOINT_TIMEOUTS={"threads.runs.retrieve": 7})
+    def test_endpoint_timeout_passed_to_sdk_methods(self, _):
+        seen = {}
+
+        def retrieve(run_id, timeout=None):
+            seen["timeout"] = timeout
+
+        fake = MagicMock()
+        with override_client(_client(retrieve=retrieve, create=fake)):
+            get_client().beta.threads.runs.retrieve(run_id="r")
+            get_client().beta.threads.runs.create()
+        self.assertEqual(seen["timeout"], 7)
+        self.assertNotIn("timeout", fake.call_args.kwargs)  # no timeout parameter
+
+
+@override_settings(OPENAI_MAX_RETRIES=0, OPENAI_BREAKER_THRESHOLD=2, OPENAI_BREAKER_COOLDOWN=0.05)
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.addCleanup(breaker.reset)
+
+    def test_opens_then_half_opens(self):
+        retrieve = MagicMock(side_effect=APIError(503))
+        with override_client(_client(retrieve=retrieve)):
+            for _ in range(2):
+                with self.assertRaises(UpstreamUnavailable):
+                    get_client().beta.threads.runs.retrieve()
+            with self.assertRaises(CircuitOpen):
+                get_client().beta.threads.runs.retrieve()
+            self.assertEqual(retrieve.call_count, 2)  # failed fast
+
+            time.sleep(0.06)
+            retrieve.side_effect = None
+            retrieve.return_value = "run"
+            self.assertEqual(get_client().beta.threads.runs.retrieve(), "run")
+            self.assertEqual(get_client().beta.threads.runs.retrieve(), "run")
+
+    def test_failed_trial_reopens(self):
+        retrieve = MagicMock(side_effect=APIError(503))
+        with override_client(_client(retrieve=retrieve)):
+            for _ in range(2):
+                with self.assertRaises(UpstreamUnavailable):
+                    get_client().beta.threads.runs.retrieve()
+            time.sleep(0.06)
+            with self.assertRaises(UpstreamUnavailable):
+                get_client().beta.threads.runs.retrieve()  # the trial
+            with self.assertRaises(CircuitOpen):
+                get_client().beta.threads.runs.retrieve()
+        self.assertEqual(retrieve.call_count, 3)
+
+
+    def _open(self, retrieve):
+        with override_client(_client(retrieve=retrieve)):
+            for _ in range(2):
+                with self.assertRaises(UpstreamUnavailable):
+                    get_client().beta.threads.runs.retrieve()
+        time.sleep(0.06)
+
+    def test_cancelled_trial_frees_the_slot(self):
+        self._open(MagicMock(side_effect=APIError(503)))
+        from assistants.openai_client import get_async_client
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(get_async_client().beta.threads.runs.retrieve())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with override_client(async_client=_client(retrieve=AsyncMock(side_effect=hang))):
+            asyncio.run(cancel_trial())
+        retrieve = MagicMock(return_value="run")
+        with override_client(_client(retrieve=retrieve)):
+            self.assertEqual(get_client().beta.threads.runs.retrieve(), "run")
+
+    def test_interrupted_sync_trial_frees_the_slot(self):
+        self._open(MagicMock(side_effect=APIError(503)))
+        with override_client(_client(retrieve=MagicMock(side_effect=KeyboardInterrupt))):
+            with self.assertRaises(KeyboardInterrupt):
+                get_client().beta.threads.runs.retrieve()
+        with override_client(_client(retrieve=MagicMock(return_value="run"))):
+            self.assertEqual(get_client().beta.threads.runs.retrieve(), "run")
+
+    @override_settings(OPENAI_BREAKER_COOLDOWN=0.05)
+    def test_unanswered_trial_times_out(self):
+        self._open(MagicMock(side_effect=APIError(503)))
+        token = breaker.before_call()  # a trial that never reports back
+        self.assertIsNotNone(token)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        time.sleep(0.06)
+        self.assertIsNotNone(breaker.before_call())
+
+
+@override_settings(OPENAI_MAX_RETRIES=0)
+class UpstreamDeleteTests(TestCase):
+    def setUp(self):
+        self.addCleanup(breaker.reset)
+        self.client = APIClient()
+        self.owner = get_user_model().objects.create_user(username="own", password="pw")
+        self.client.force_authenticate(self.owner)
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.owner, openai_id="thr_a")
+        Message.objects.create(assistant=self.asst, thread=self.thread, role="user", content="hi")
+
+    def _reset(self, error):
+        delete = MagicMock(side_effect=error)
+        with override_client(_client(delete=delete)):
+            return self.client.post(f"/api/assistants/{self.asst.id}/reset/")
+
+    def test_reset_tolerates_missing_thread(self):
+        self.assertEqual(self._reset(APIError(404)).status_code, 204)
+        self.assertFalse(self.thread.messages.exists())
+
+    def test_reset_reports_transient_failure(self):
+        resp = self._reset(APIError(503, {"retry-after": "4"}))
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "4")
+        self.assertTrue(self.thread.messages.exists())  # nothing deleted, can retry
+
+    def test_destroy_reports_transient_failure(self):
+        fake = types.SimpleNamespace(beta=types.SimpleNamespace(
+            assistants=types.SimpleNamespace(delete=MagicMock(side_effect=APIError(502)))
+        ))
+        with override_client(fake):
+            resp = self.client.delete(f"/api/assistants/{self.asst.id}/")
+        self.assertEqual(resp.status_code, 503)
+        self.assertTrue(Assistant.objects.filter(pk=self.asst.pk).exists())
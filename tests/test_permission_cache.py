@@ -0,0 +1,106 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.conf import settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from org.models import Department
+from assistants import access
+from assistants.access import cached_permission
+from assistants.models import Assistant, AssistantDepartmentAccess, AssistantUserAccess
+from pathlib import Path
+from unittest.mock import patch
+import tempfile
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # the default backend, on a file of its own
+        override = override_settings(CACHES={
+            **settings.CACHES,
+            "permissions": {
+                "BACKEND": "assistants.cache.LocalDBCache",
+                "LOCATION": str(Path(tmp.name) / "permissions.sqlite3"),
+            },
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        User = get_user_model()
+        self.dept = Department.objects.create(name="Dept")
+        self.owner = User.objects.create_user(username="owner", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, vector_store_id="vs_1")
+
+    def test_hits_skip_the_database(self):
+        self.assertIsNone(cached_permission(self.asst, self.user))
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        self.assertEqual(cached_permission(self.asst, self.user), "use")
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_permission(self.asst, self.user), "use")
+            self.assertEqual(cached_permission(self.asst, self.owner), "edit")
+
+    def test_hits_are_shared_between_processes(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        self.assertEqual(cached_permission(self.asst, self.user), "use")
+        # a cache instance of its own, like another worker process has
+        other_process = caches.create_connection("permissions")
+        with patch("assistants.access._cache", return_value=other_process), \
+                self.assertNumQueries(0):
+            self.assertEqual(cached_permission(self.asst, self.user), "use")
+
+    def test_share_changes_invalidate(self):
+        share = AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        self.assertEqual(cached_permission(self.asst, self.user), "use")
+        share.permission = "edit"
+        share.save()
+        self.assertEqual(cached_permission(self.asst, self.user), "edit")
+        share.delete()
+        self.assertIsNone(cached_permission(self.asst, self.user))
+
+    def test_department_changes_invalidate(self):
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.dept, permission="use")
+        self.assertIsNone(cached_permission(self.asst, self.user))
+        self.user.department = self.dept
+        self.user.save()
+        self.assertEqual(cached_permission(self.asst, self.user), "use")
+        self.user.department = None
+        self.user.save()
+        self.assertIsNone(cached_permission(self.asst, self.user))
+
+    def test_entry_cached_before_commit_is_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+            # a concurrent request that still saw the old rows
+            key = f"permission:{self.asst.pk}:{access._version(self.asst.pk)}:{self.user.pk}"
+            caches["permissions"].set(key, "")
+        self.assertEqual(cached_permission(self.asst, self.user), "use")
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        old = access._version(self.asst.pk)
+        caches["permissions"].delete(f"assistant-version:{self.asst.pk}")
+        self.assertNotEqual(access._version(self.asst.pk), old)
+
+    def test_repeated_view_checks_are_cache_hits(self):
+        AssistantUserAccess.objects.create(assistant=self.asst, user=self.user, permission="use")
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(f"/api/assistants/{self.asst.id}/vector-store/").status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get(f"/api/assistants/{self.asst.id}/vector-store/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)  # just the assistant
+
+    def test_benchmark_leaves_the_cache_alone(self):
+        self.assertIsNone(cached_permission(self.asst, self.user))
+        version = access._version(self.asst.pk)
+        call_command(
+            "access_benchmark", "--assistants", "5", "--user-shares", "5", "--department-shares", "2",
+            "--users", "4", "--departments", "2", "--samples", "2", stdout=StringIO(),
+        )
+        self.assertEqual(access._version(self.asst.pk), version)
+        self.assertEqual(settings.PERMISSION_CACHE, "permissions")
@@ -0,0 +1,108 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from assistants.models import Assistant
+from assistants.conversation import ensure_thread
+from assistants.openai_client import override_client
+from assistants.run_coordinator import ThreadBusy, run_coordinator
+from chat.models import Thread
+from unittest.mock import MagicMock, patch
+import threading
+import time
+import types
+
+
+@override_settings(THREAD_LOCK_POLL_INTERVAL=0.01)
+class RunCoordinatorTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="u", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.user, openai_id="asst_1")
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.user)
+
+    def test_lease_is_exclusive_until_released(self):
+        lease = run_coordinator.acquire(self.thread)
+        with self.assertRaises(ThreadBusy):
+            run_coordinator.acquire(self.thread, timeout=0.05)
+        lease.release()
+        lease.release()
+        run_coordinator.acquire(self.thread, timeout=0.05).release()
+
+    def test_concurrent_releases_count_once(self):
+        lease = run_coordinator.acquire(self.thread)
+
+        class SlowEvent(threading.Event):
+            def is_set(self):
+                flag = super().is_set()
+                time.sleep(0.05)  # let the other release() get here too
+                return flag
+
+        lease._released = SlowEvent()
+        with patch("assistants.run_coordinator.CHAT_RUNS_IN_FLIGHT") as gauge, \
+                patch("assistants.run_coordinator.Thread"):
+            releases = [threading.Thread(target=lease.release) for _ in range(2)]
+            for t in releases:
+                t.start()
+            for t in releases:
+                t.join()
+        self.assertEqual(gauge.dec.call_count, 1)
+
+    def test_expired_lease_can_be_taken_over(self):
+        Thread.objects.filter(pk=self.thread.pk).update(
+            run_lock_owner="dead", run_lock_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        lease = run_coordinator.acquire(self.thread, timeout=0.05)
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.run_lock_owner, lease.token)
+        lease.release()
+
+    def test_ensure_thread_loser_deletes_its_remote_thread(self):
+        client = types.SimpleNamespace(
+            beta=types.SimpleNamespace(
+                threads=types.SimpleNamespace(
+                    create=lambda: types.SimpleNamespace(id="thr_late"),
+                    delete=MagicMock(),
+                )
+            )
+        )
+        stale = Thread.objects.get(pk=self.thread.pk)
+        Thread.objects.filter(pk=self.thread.pk).update(openai_id="thr_first")
+
+        self.assertEqual(ensure_thread(client, stale), "thr_first")
+        client.beta.threads.delete.assert_called_once_with("thr_late")
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.openai_id, "thr_first")
+
+
+@override_settings(THREAD_LOCK_WAIT=0.05, THREAD_LOCK_POLL_INTERVAL=0.01)
+class ChatThreadBusyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="u", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.user, openai_id="asst_1")
+
+    def _auth(self):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": "u", "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def test_chat_returns_409_while_thread_is_busy(self):
+        thread = Thread.objects.create(assistant=self.asst, user=self.user, openai_id="thr_1")
+        lease = run_coordinator.acquire(thread)
+        dummy = MagicMock()
+        self._auth()
+        try:
+            with override_client(dummy):
+                resp = self.client.post(
+                    f"/api/assistants/{self.asst.id}/chat/", {"content": "hi"}, format="json"
+                )
+        finally:
+            lease.release()
+        self.assertEqual(resp.status_code, 409)
+        dummy.beta.threads.messages.create.assert_not_called()
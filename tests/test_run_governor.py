@@ -0,0 +1,175 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.governor import BATCH, INTERACTIVE, Overloaded, RunGovernor, run_governor
+from assistants.models import Assistant
+from assistants.openai_client import override_client
+from chat.models import Thread
+from org.models import Department
+from customgpt_backend.metrics import CHAT_RUN_QUEUE_DEPTH
+from unittest.mock import MagicMock
+from pathlib import Path
+import tempfile
+import threading
+import time
+
+
+class GovernorTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(
+            CHAT_GOVERNOR_DB=str(Path(tmp.name) / "gov.sqlite3"),
+            CHAT_MAX_RUNS_IN_FLIGHT=1,
+            CHAT_RUN_QUEUE_SIZE=1,
+            CHAT_RUN_QUEUE_WAIT=5,
+            CHAT_GOVERNOR_POLL_INTERVAL=0.01,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.governor = RunGovernor()
+
+
+class RunGovernorTests(GovernorTestCase):
+    def _acquire_in_thread(self, **kwargs):
+        result = {}
+
+        def run():
+            try:
+                result["slot"] = self.governor.acquire(**kwargs)
+            except Overloaded as exc:
+                result["error"] = exc
+
+        worker = threading.Thread(target=run)
+        worker.start()
+        return worker, result
+
+    def _wait_for_queue(self, depth):
+        for _ in range(500):
+            with self.governor.db.transaction() as conn:
+                if conn.execute("SELECT count(*) FROM waiter").fetchone()[0] == depth:
+                    return
+            time.sleep(0.01)
+        self.fail("queue never reached depth %d" % depth)
+
+    def test_waiter_gets_the_released_slot(self):
+        slot = self.governor.acquire()
+        worker, result = self._acquire_in_thread()
+        self._wait_for_queue(1)
+        self.assertEqual(CHAT_RUN_QUEUE_DEPTH._value.get(), 1)
+        slot.release()
+        worker.join(5)
+        self.assertIn("slot", result)
+        result["slot"].release()
+
+    def test_full_queue_is_shed_immediately(self):
+        slot = self.governor.acquire()
+        worker, _ = self._acquire_in_thread()
+        self._wait_for_queue(1)
+        started = time.monotonic()
+        with self.assertRaises(Overloaded) as cm:
+            self.governor.acquire()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(cm.exception.status_code, 503)
+        slot.release()
+        worker.join(5)
+
+    def test_wait_times_out(self):
+        slot = self.governor.acquire()
+        with self.assertRaises(Overloaded):
+            self.governor.acquire(timeout=0.05)
+        slot.release()
+
+    def test_expired_slots_are_reclaimed(self):
+        with self.governor.db.transaction() as conn:
+            conn.execute("INSERT INTO slot (token, expires) VALUES ('dead', ?)", [time.time() - 1])
+        self.governor.acquire(timeout=0).release()
+
+    @override_settings(CHAT_MAX_RUNS_IN_FLIGHT=0)
+    def test_off(self):
+        self.governor.acquire().release()
+        self.governor.acquire().release()
+
+
+class FairQueueTests(GovernorTestCase):
+    def setUp(self):
+        super().setUp()
+        override = override_settings(CHAT_RUN_QUEUE_SIZE=10)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.held = self.governor.acquire()
+        self.deadline = time.monotonic() + 60
+
+    def _queue(self, name, flow, weight=1, priority=INTERACTIVE):
+        self.assertFalse(self.governor._try(name, self.deadline, flow, weight, priority))
+        return (name, flow, weight, priority)
+
+    def _admission_order(self, waiting):
+        """Free the held slot and let the waiters in one at a time."""
+        self.held.release()
+        order = []
+        while waiting:
+            granted = [w for w in waiting if self.governor._try(w[0], self.deadline, *w[1:])]
+            self.assertEqual(len(granted), 1)
+            order.append(granted[0][0])
+            waiting.remove(granted[0])
+            self.governor._release(granted[0][0])
+        return order
+
+    def test_departments_share_by_weight(self):
+        waiting = [self._queue(f"a{i}", "0:a", weight=2) for i in range(4)]
+        waiting += [self._queue(f"b{i}", "0:b") for i in range(2)]
+        self.assertEqual(self._admission_order(waiting), ["a0", "b0", "a1", "a2", "b1", "a3"])
+
+    def test_interactive_before_batch(self):
+        waiting = [self._queue(f"job{i}", "1:a", priority=BATCH) for i in range(2)]
+        waiting.append(self._queue("chat", "0:b"))
+        self.assertEqual(self._admission_order(waiting), ["chat", "job0", "job1"])
+
+    def test_timed_out_turn_does_not_push_its_department_back(self):
+        self._queue("a0", "0:a")
+        self._queue("a1", "0:a")
+        with self.assertRaises(Overloaded):
+            self.governor._try("a0", time.monotonic(), "0:a", 1, INTERACTIVE)
+        waiting = [("a1", "0:a", 1, INTERACTIVE)]
+        waiting += [self._queue(f"b{i}", "0:b") for i in range(2)]
+        waiting.append(self._queue("a2", "0:a"))
+        self.assertEqual(self._admission_order(waiting), ["a1", "b0", "b1", "a2"])
+
+    @override_settings(CHAT_RUN_QUEUE_SIZE=2)
+    def test_batch_backlog_does_not_shed_chat(self):
+        self._queue("job0", "1:a", priority=BATCH)
+        self._queue("job1", "1:a", priority=BATCH)
+        with self.assertRaises(Overloaded):
+            self._queue("job2", "1:a", priority=BATCH)
+        self._queue("chat", "0:b")
+        self.held.release()
+
+    def test_flow_uses_department_weight(self):
+        dept = Department.objects.create(name="Ops", weight=3)
+        user = get_user_model().objects.create_user(username="u", password="pw", department=dept)
+        self.assertEqual(self.governor._flow(user, batch=True), (f"1:{dept.pk}", 3, BATCH))
+        self.assertEqual(self.governor._flow(None, batch=False), ("0:", 1, INTERACTIVE))
+        self.held.release()
+
+
+class ChatAdmissionTests(GovernorTestCase):
+    def test_chat_is_shed_with_503(self):
+        owner = get_user_model().objects.create_user(username="own", password="pw")
+        asst = Assistant.objects.create(name="A", owner=owner, openai_id="asst_a")
+        thread = Thread.objects.create(assistant=asst, user=owner, openai_id="thr_a")
+        client = APIClient()
+        client.force_authenticate(owner)
+
+        held = run_governor.acquire()
+        self.addCleanup(held.release)
+        upstream = MagicMock()
+        with override_settings(CHAT_RUN_QUEUE_SIZE=0, CHAT_RUN_RETRY_AFTER=7), \
+                override_client(upstream):
+            resp = client.post(f"/api/assistants/{asst.id}/chat/", {"content": "hi"}, format="json")
+
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "7")
+        upstream.beta.threads.runs.create.assert_not_called()
+        thread.refresh_from_db()
+        self.assertEqual(thread.run_lock_owner, "")  # thread lease handed back
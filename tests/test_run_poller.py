@@ -0,0 +1,65 @@
+from django.test import SimpleTestCase, override_settings
+from assistants.openai_client import override_client
+from assistants.run_poller import RunPoller
+from unittest.mock import MagicMock
+import threading
+import types
+
+
+def _client(retrieve):
+    return types.SimpleNamespace(
+        beta=types.SimpleNamespace(
+            threads=types.SimpleNamespace(runs=types.SimpleNamespace(retrieve=retrieve))
+        )
+    )
+
+
+@override_settings(
+    RUN_POLL_INITIAL_INTERVAL=0.01,
+    RUN_POLL_BACKOFF=2,
+    RUN_POLL_MAX_INTERVAL=0.05,
+    RUN_POLL_MAX_INTERVAL_REASONING=0.1,
+)
+class RunPollerTests(SimpleTestCase):
+    def test_terminal_run_is_returned_without_polling(self):
+        retrieve = MagicMock()
+        run = types.SimpleNamespace(id="r1", status="completed")
+        with override_client(_client(retrieve)):
+            self.assertIs(RunPoller().wait("t1", run), run)
+        retrieve.assert_not_called()
+
+    def test_concurrent_runs_share_one_poller(self):
+        remaining = {"r1": 2, "r2": 4}
+        lock = threading.Lock()
+
+        def retrieve(thread_id, run_id):
+            with lock:
+                remaining[run_id] -= 1
+                status = "completed" if remaining[run_id] <= 0 else "in_progress"
+            return types.SimpleNamespace(id=run_id, status=status)
+
+        poller = RunPoller()
+        with override_client(_client(retrieve)):
+            f1 = poller.track("t1", types.SimpleNamespace(id="r1", status="queued"))
+            f2 = poller.track("t2", types.SimpleNamespace(id="r2", status="queued"), model="o3-mini")
+            self.assertEqual(f1.result(timeout=5).status, "completed")
+            self.assertEqual(f2.result(timeout=5).status, "completed")
+
+        self.assertEqual((f1.polls, f2.polls), (2, 4))
+        self.assertEqual(poller.in_flight(), 0)
+
+    def test_repeated_errors_fail_the_waiter(self):
+        retrieve = MagicMock(side_effect=RuntimeError("boom"))
+        poller = RunPoller()
+        with override_client(_client(retrieve)):
+            with self.assertRaises(RuntimeError):
+                poller.wait("t1", types.SimpleNamespace(id="r1", status="queued"), timeout=5)
+        self.assertEqual(retrieve.call_count, 3)
+
+    def test_timeout_stops_tracking(self):
+        retrieve = MagicMock(return_value=types.SimpleNamespace(id="r1", status="in_progress"))
+        poller = RunPoller()
+        with override_client(_client(retrieve)):
+            with self.assertRaises(TimeoutError):
+                poller.wait("t1", types.SimpleNamespace(id="r1", status="queued"), timeout=0.05)
+        self.assertEqual(poller.in_flight(), 0)
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from assistants.models import Assistant
+from assistants.openai_client import override_client
+from unittest.mock import MagicMock
+import types
+
+
+@override_settings(RUN_POLL_INITIAL_INTERVAL=0.01)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="u", password="pw")
+        self.asst = Assistant.objects.create(name="A", owner=self.user, openai_id="asst_1")
+
+        message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="hi there"))])
+        self.dummy = types.SimpleNamespace(
+            beta=types.SimpleNamespace(
+                threads=types.SimpleNamespace(
+                    create=lambda: types.SimpleNamespace(id="thr_1"),
+                    messages=types.SimpleNamespace(
+                        create=MagicMock(),
+                        list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+                    ),
+                    runs=types.SimpleNamespace(
+                        create=MagicMock(return_value=types.SimpleNamespace(id="r1", status="queued")),
+                        retrieve=MagicMock(side_effect=[
+                            types.SimpleNamespace(id="r1", status="in_progress"),
+                            types.SimpleNamespace(id="r1", status="completed"),
+                        ]),
+                    ),
+                )
+            )
+        )
+
+    def _auth(self):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": "u", "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _phases(self, header):
+        return {part.split(";")[0]: part for part in header.split(", ")}
+
+    def test_chat_reports_phases_and_poll_count(self):
+        self._auth()
+        with override_client(self.dummy), self.assertLogs("assistants.timing", "INFO") as logs:
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/", {"content": "hi"}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200)
+        phases = self._phases(resp["Server-Timing"])
+        for name in ("lock", "thread", "msg_create", "run_create", "run_wait", "msg_list", "db", "total"):
+            self.assertIn(name, phases)
+        self.assertIn('desc="2 polls"', phases["run_wait"])
+        self.assertIn("ChatView.POST 200", logs.output[0])
+        self.assertEqual(set(logs.records[0].timings), set(phases))
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self._auth()
+        with self.assertLogs("assistants.timing", "INFO"):
+            resp = self.client.get(f"/api/assistants/{self.asst.id}/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Server-Timing", resp)
@@ -101,3 +101,100 @@ class AssistantSharingAPITests(TestCase):
         self.assertEqual(resp.status_code, 400)
         self.assertIn("Owner", resp.json().get("detail", ""))
 
+
+
+class BulkSharingAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.sales = Department.objects.create(name="Sales")
+        self.support = Department.objects.create(name="Support")
+        self.owner = User.objects.create_user(username="owner", password="pw")
+        self.members = [
+            User.objects.create_user(username=f"m{i}", password="pw", department=self.support)
+            for i in range(4)
+        ]
+        self.asst = Assistant.objects.create(name="Share", owner=self.owner)
+        self.client.force_authenticate(self.owner)
+
+    def _bulk(self, kind, body):
+        return self.client.post(
+            f"/api/assistants/{self.asst.id}/shares/{kind}/bulk/", body, format="json"
+        )
+
+    def test_grants_and_revokes_users(self):
+        a, b, c, d = self.members
+        AssistantUserAccess.objects.create(assistant=self.asst, user=b, permission="use")
+        AssistantUserAccess.objects.create(assistant=self.asst, user=c, permission="edit")
+        AssistantUserAccess.objects.create(assistant=self.asst, user=d, permission="use")
+        with self.assertNumQueries(15):  # however many items
+            resp = self._bulk("users", {
+                "grant": [
+                    {"user": a.id, "permission": "use"},
+                    {"user": b.id, "permission": "edit"},
+                    {"user": c.id, "permission": "edit"},
+                ],
+                "revoke": [d.id, 9999],
+            })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [r["status"] for r in resp.json()["grant"]], ["created", "updated", "unchanged"]
+        )
+        self.assertEqual(resp.json()["revoke"], [
+            {"user": d.id, "status": "deleted"}, {"user": 9999, "status": "not_found"},
+        ])
+        self.assertEqual(
+            dict(AssistantUserAccess.objects.filter(assistant=self.asst).values_list("user_id", "permission")),
+            {a.id: "use", b.id: "edit", c.id: "edit"},
+        )
+        # the effective access follows
+        self.assertEqual(self.asst.permission_for(a), "use")
+        self.assertEqual(self.asst.permission_for(b), "edit")
+        self.assertIsNone(self.asst.permission_for(d))
+
+    def test_invalid_items_are_reported_and_skipped(self):
+        a, b = self.members[:2]
+        resp = self._bulk("users", {
+            "grant": [
+                {"user": a.id, "permission": "admin"},
+                {"user": 9999, "permission": "use"},
+                {"user": self.owner.id, "permission": "use"},
+                {"user": b.id, "permission": "use"},
+                "junk",
+            ],
+            "revoke": [b.id, "x", str(self.members[2].id)],
+        })
+        self.assertEqual(resp.status_code, 200)
+        grant, revoke = resp.json()["grant"], resp.json()["revoke"]
+        self.assertIn("permission", grant[0]["detail"])
+        self.assertEqual(grant[1]["detail"], "No such user")
+        self.assertEqual(grant[2]["detail"], "Cannot modify owner permissions")
+        self.assertEqual(grant[3]["status"], "created")
+        self.assertEqual(grant[4]["status"], "error")
+        self.assertEqual(revoke[0]["detail"], "Listed more than once")
+        self.assertIn("user", revoke[1]["detail"])  # same validation as the grants
+        self.assertEqual(revoke[2], {"user": self.members[2].id, "status": "not_found"})
+        self.assertEqual(
+            list(AssistantUserAccess.objects.filter(assistant=self.asst).values_list("user_id", flat=True)),
+            [b.id],
+        )
+
+    def test_departments(self):
+        AssistantDepartmentAccess.objects.create(assistant=self.asst, department=self.sales, permission="use")
+        resp = self._bulk("departments", {
+            "grant": [{"department": self.support.id, "permission": "use"}],
+            "revoke": [self.sales.id],
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["grant"][0]["status"], "created")
+        self.assertEqual(resp.json()["revoke"][0]["status"], "deleted")
+        for member in self.members:
+            self.assertEqual(self.asst.permission_for(member), "use")
+
+    def test_only_owner_and_limits(self):
+        self.client.force_authenticate(self.members[0])
+        self.assertEqual(self._bulk("users", {"grant": []}).status_code, 403)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self._bulk("users", {"grant": {"user": 1}}).status_code, 400)
+        with self.settings(SHARE_BULK_MAX_ITEMS=1):
+            self.assertEqual(self._bulk("users", {"revoke": [1, 2]}).status_code, 400)
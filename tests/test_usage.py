@@ -0,0 +1,132 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from assistants.models import Assistant, AssistantUserAccess, AssistantPermission, Message
+from assistants.openai_client import override_client
+from chat.models import Thread
+from org.models import Department
+from usage.models import AssistantDailyUsage, DepartmentDailyUsage, UserDailyUsage
+from unittest.mock import MagicMock
+from io import StringIO
+import types
+
+TOTALS = ("replies", "prompt_tokens", "completion_tokens", "total_tokens", "polls")
+
+
+def _dummy_client():
+    usage = types.SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+    run = types.SimpleNamespace(id="r1", status="completed", model="gpt-4o-mini", usage=usage)
+    message = types.SimpleNamespace(content=[types.SimpleNamespace(text=types.SimpleNamespace(value="hi!"))])
+    return types.SimpleNamespace(
+        beta=types.SimpleNamespace(
+            threads=types.SimpleNamespace(
+                messages=types.SimpleNamespace(
+                    create=MagicMock(),
+                    list=MagicMock(return_value=types.SimpleNamespace(data=[message])),
+                ),
+                runs=types.SimpleNamespace(create=MagicMock(return_value=run)),
+            )
+        )
+    )
+
+
+class UsageAccountingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        self.dept = Department.objects.create(name="Sales")
+        self.owner = User.objects.create_user(username="own", password="pw")
+        self.user = User.objects.create_user(username="user", password="pw", department=self.dept)
+        self.admin = User.objects.create_user(username="admin", password="pw", is_staff=True)
+        self.asst = Assistant.objects.create(name="A", owner=self.owner, openai_id="asst_a")
+        AssistantUserAccess.objects.create(
+            assistant=self.asst, user=self.user, permission=AssistantPermission.USE
+        )
+        self.thread = Thread.objects.create(assistant=self.asst, user=self.user, openai_id="thr_a")
+
+    def _auth(self, user):
+        resp = self.client.post(
+            "/api/token/",
+            {"username": user.username, "password": "pw"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.json()['access']}")
+
+    def _reply(self, **usage):
+        return Message.objects.create(
+            assistant=self.asst, thread=self.thread, role="assistant", content="x", **usage
+        )
+
+    def _totals(self, row):
+        return tuple(getattr(row, f) for f in TOTALS)
+
+    def test_chat_records_run_usage(self):
+        self._auth(self.user)
+        with override_client(_dummy_client()):
+            resp = self.client.post(
+                f"/api/assistants/{self.asst.id}/chat/", {"content": "hello"}, format="json"
+            )
+        self.assertEqual(resp.status_code, 200)
+
+        reply = Message.objects.get(role="assistant")
+        self.assertEqual(reply.model, "gpt-4o-mini")
+        self.assertEqual((reply.prompt_tokens, reply.completion_tokens, reply.total_tokens), (120, 30, 150))
+        self.assertEqual(reply.polls, 0)  # already finished when created
+        self.assertIsNotNone(reply.run_duration_ms)
+        for model in (AssistantDailyUsage, UserDailyUsage, DepartmentDailyUsage):
+            self.assertEqual(self._totals(model.objects.get()), (1, 120, 30, 150, 0))
+
+    def test_rollups_add_up_incrementally(self):
+        self._reply(prompt_tokens=10, completion_tokens=5, total_tokens=15, polls=2)
+        self._reply(prompt_tokens=1, completion_tokens=1, total_tokens=2, polls=1)
+        self._reply()  # usage unknown still counts as a reply
+        Message.objects.create(assistant=self.asst, thread=self.thread, role="user", content="q")
+
+        row = AssistantDailyUsage.objects.get(assistant=self.asst)
+        self.assertEqual(self._totals(row), (3, 11, 6, 17, 3))
+        self.assertEqual(self._totals(UserDailyUsage.objects.get(user=self.user)), (3, 11, 6, 17, 3))
+        self.assertEqual(DepartmentDailyUsage.objects.get().department, self.dept)
+
+    def test_rebuild_matches_incremental_rows(self):
+        self._reply(prompt_tokens=10, completion_tokens=5, total_tokens=15, polls=2)
+        self._reply(prompt_tokens=1, completion_tokens=1, total_tokens=2, polls=1)
+        before = [self._totals(m.objects.get()) for m in (AssistantDailyUsage, UserDailyUsage, DepartmentDailyUsage)]
+
+        AssistantDailyUsage.objects.all().delete()
+        call_command("rebuild_usage_rollups", stdout=StringIO())
+        after = [self._totals(m.objects.get()) for m in (AssistantDailyUsage, UserDailyUsage, DepartmentDailyUsage)]
+        self.assertEqual(after, before)
+
+    def test_rebuild_uses_the_current_department(self):
+        self._reply(total_tokens=5)
+        moved_to = Department.objects.create(name="Support")
+        self.user.department = moved_to
+        self.user.save()
+        self.assertEqual(DepartmentDailyUsage.objects.get().department, self.dept)
+
+        call_command("rebuild_usage_rollups", stdout=StringIO())
+        self.assertEqual(DepartmentDailyUsage.objects.get().department, moved_to)
+
+    def test_reports_are_admin_only(self):
+        self._reply(total_tokens=7)
+        self._auth(self.user)
+        self.assertEqual(self.client.get("/api/usage/assistants/").status_code, 403)
+
+        self._auth(self.admin)
+        rows = self.client.get("/api/usage/departments/").json()
+        self.assertEqual(rows[0]["department_name"], "Sales")
+        self.assertEqual(rows[0]["total_tokens"], 7)
+        today = rows[0]["date"]
+        self.assertEqual(len(self.client.get("/api/usage/users/", {"from": today, "to": today}).json()), 1)
+        self.assertEqual(self.client.get("/api/usage/users/", {"from": "2999-01-01"}).json(), [])
+        self.assertEqual(self.client.get("/api/usage/users/", {"to": "yesterday"}).status_code, 400)
+
+    def test_malformed_ids_are_rejected(self):
+        self._auth(self.admin)
+        for path, param in (("assistants", "assistant"), ("users", "user"), ("departments", "department")):
+            resp = self.client.get(f"/api/usage/{path}/", {param: "nope"})
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn(param, resp.json())
+        resp = self.client.get("/api/usage/assistants/", {"assistant": str(self.asst.id)})
+        self.assertEqual(resp.status_code, 200)
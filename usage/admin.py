@@ -0,0 +1,33 @@
+from django.contrib import admin
+from .models import AssistantDailyUsage, DepartmentDailyUsage, UserDailyUsage
+
+TOTALS = ('replies', 'prompt_tokens', 'completion_tokens', 'total_tokens', 'run_duration_ms', 'polls')
+
+
+class UsageRollupAdmin(admin.ModelAdmin):
+    """Rollups are written by usage/rollups.py only."""
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AssistantDailyUsage)
+class AssistantDailyUsageAdmin(UsageRollupAdmin):
+    list_display = ('date', 'assistant') + TOTALS
+    list_select_related = ('assistant',)
+
+
+@admin.register(UserDailyUsage)
+class UserDailyUsageAdmin(UsageRollupAdmin):
+    list_display = ('date', 'user') + TOTALS
+    list_select_related = ('user',)
+
+
+@admin.register(DepartmentDailyUsage)
+class DepartmentDailyUsageAdmin(UsageRollupAdmin):
+    list_display = ('date', 'department') + TOTALS
+    list_select_related = ('department',)
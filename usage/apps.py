@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class UsageConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'usage'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from assistants.models import Message
+        from .rollups import record_saved_reply
+
+        post_save.connect(record_saved_reply, sender=Message, dispatch_uid="usage-rollups")
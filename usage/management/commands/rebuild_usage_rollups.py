@@ -0,0 +1,25 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from usage.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily usage rollups from the stored assistant replies. "
+        "Department totals are attributed to each user's current department."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", metavar="YYYY-MM-DD",
+            help="Only rebuild the days from this date on.",
+        )
+
+    def handle(self, *args, since=None, **options):
+        if since:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError(f"--since must be YYYY-MM-DD, not {since!r}")
+        rows = rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"usage rollups rebuilt ({rows} rows)"))
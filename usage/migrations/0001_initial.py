@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('assistants', '0014_message_usage'),
+        ('org', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssistantDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('run_duration_ms', models.PositiveBigIntegerField(default=0)),
+                ('polls', models.PositiveBigIntegerField(default=0)),
+                ('assistant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='assistants.assistant')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'abstract': False,
+                'unique_together': {('assistant', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DepartmentDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('run_duration_ms', models.PositiveBigIntegerField(default=0)),
+                ('polls', models.PositiveBigIntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='org.department')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'abstract': False,
+                'unique_together': {('department', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('replies', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('run_duration_ms', models.PositiveBigIntegerField(default=0)),
+                ('polls', models.PositiveBigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'abstract': False,
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import models
+
+
+class UsageRollup(models.Model):
+    """Totals of the assistant replies of one day (see usage/rollups.py)."""
+    date = models.DateField()
+    replies = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    total_tokens = models.PositiveBigIntegerField(default=0)
+    run_duration_ms = models.PositiveBigIntegerField(default=0)
+    polls = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+
+class AssistantDailyUsage(UsageRollup):
+    assistant = models.ForeignKey('assistants.Assistant', on_delete=models.CASCADE, related_name='daily_usage')
+
+    class Meta(UsageRollup.Meta):
+        unique_together = ('assistant', 'date')
+
+    def __str__(self):
+        return f"{self.assistant_id} / {self.date}"
+
+
+class UserDailyUsage(UsageRollup):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_usage')
+
+    class Meta(UsageRollup.Meta):
+        unique_together = ('user', 'date')
+
+    def __str__(self):
+        return f"{self.user_id} / {self.date}"
+
+
+class DepartmentDailyUsage(UsageRollup):
+    department = models.ForeignKey('org.Department', on_delete=models.CASCADE, related_name='daily_usage')
+
+    class Meta(UsageRollup.Meta):
+        unique_together = ('department', 'date')
+
+    def __str__(self):
+        return f"{self.department_id} / {self.date}"
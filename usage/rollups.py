@@ -0,0 +1,104 @@
+"""
+Daily usage rollups.
+
+Every assistant reply adds its tokens, run time and poll count to three
+rows for the day it was created: one for the assistant, one for the user whose
+thread it is and one for that user's department.  The rows are bumped with a
+single ``UPDATE ... SET x = x + n`` each (created on the first reply of the
+day), so the reports never have to scan ``Message``.
+
+``rebuild`` recomputes the rows from the messages, for the history from before
+this app was installed or after rows were deleted by hand.  Messages don't
+store a department, so it counts every reply towards the department its user
+is in *now*: the department rows of users who have moved since differ from
+the ones recorded as the replies came in.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from assistants.models import Message
+from chat.models import Thread
+from .models import AssistantDailyUsage, DepartmentDailyUsage, UserDailyUsage
+
+COUNTERS = ("prompt_tokens", "completion_tokens", "total_tokens", "run_duration_ms", "polls")
+
+
+def record_reply(message):
+    """Add one assistant reply to its day's rollups."""
+    day = timezone.localdate(message.created_at)
+    increments = {"replies": F("replies") + 1}
+    for field in COUNTERS:
+        increments[field] = F(field) + (getattr(message, field) or 0)
+
+    owner = None
+    if message.thread_id:
+        owner = Thread.objects.filter(pk=message.thread_id).values_list(
+            "user_id", "user__department_id"
+        ).first()
+    with transaction.atomic():
+        _bump(AssistantDailyUsage, day, increments, assistant_id=message.assistant_id)
+        if owner is not None:
+            user_id, department_id = owner
+            _bump(UserDailyUsage, day, increments, user_id=user_id)
+            if department_id is not None:
+                _bump(DepartmentDailyUsage, day, increments, department_id=department_id)
+
+
+def record_saved_reply(sender, instance, created, raw=False, **kwargs):
+    """``post_save`` receiver for ``assistants.Message``."""
+    if created and not raw and instance.role == "assistant":
+        record_reply(instance)
+
+
+def _bump(model, day, increments, **key):
+    if model.objects.filter(date=day, **key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(date=day, **key)
+    except IntegrityError:
+        pass  # another reply created the row first
+    model.objects.filter(date=day, **key).update(**increments)
+
+
+def rebuild(since=None):
+    """Recompute the rollups of every day (or of the days from ``since``).
+
+    Department rows use each user's current department, see the module
+    docstring.
+    """
+    replies = Message.objects.filter(role="assistant")
+    if since is not None:
+        replies = replies.filter(created_at__date__gte=since)
+    totals = {"replies": Count("id")}
+    for field in COUNTERS:
+        totals[field] = Coalesce(Sum(field), Value(0))
+    day = TruncDate("created_at", tzinfo=timezone.get_current_timezone())
+
+    written = 0
+    with transaction.atomic():
+        for model in (AssistantDailyUsage, UserDailyUsage, DepartmentDailyUsage):
+            rows = model.objects.all()
+            if since is not None:
+                rows = rows.filter(date__gte=since)
+            rows.delete()
+        for model, source, target in (
+            (AssistantDailyUsage, "assistant_id", "assistant_id"),
+            (UserDailyUsage, "thread__user_id", "user_id"),
+            (DepartmentDailyUsage, "thread__user__department_id", "department_id"),
+        ):
+            groups = (
+                replies.filter(**{f"{source}__isnull": False})
+                .annotate(day=day)
+                .values("day", source)
+                .annotate(**totals)
+                .order_by()
+            )
+            objs = [
+                model(date=g.pop("day"), **{target: g.pop(source)}, **g)
+                for g in groups
+            ]
+            model.objects.bulk_create(objs, batch_size=1000)
+            written += len(objs)
+    return written
@@ -0,0 +1,31 @@
+from rest_framework import serializers
+from .models import AssistantDailyUsage, DepartmentDailyUsage, UserDailyUsage
+
+TOTALS = [
+    'date', 'replies', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+    'run_duration_ms', 'polls',
+]
+
+
+class AssistantDailyUsageSerializer(serializers.ModelSerializer):
+    assistant_name = serializers.CharField(source='assistant.name', read_only=True)
+
+    class Meta:
+        model = AssistantDailyUsage
+        fields = ['assistant', 'assistant_name'] + TOTALS
+
+
+class UserDailyUsageSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = UserDailyUsage
+        fields = ['user', 'username'] + TOTALS
+
+
+class DepartmentDailyUsageSerializer(serializers.ModelSerializer):
+    department_name = serializers.CharField(source='department.name', read_only=True)
+
+    class Meta:
+        model = DepartmentDailyUsage
+        fields = ['department', 'department_name'] + TOTALS
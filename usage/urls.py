@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import AssistantUsageView, DepartmentUsageView, UserUsageView
+
+urlpatterns = [
+    path('usage/assistants/', AssistantUsageView.as_view(), name='usage-assistants'),
+    path('usage/users/', UserUsageView.as_view(), name='usage-users'),
+    path('usage/departments/', DepartmentUsageView.as_view(), name='usage-departments'),
+]
@@ -0,0 +1,71 @@
+"""
+Usage reports (admin only)
+--------------------------
+
+/api/usage/assistants/    daily totals per assistant
+/api/usage/users/         daily totals per user
+/api/usage/departments/   daily totals per department
+
+Query params: ``from`` / ``to`` (YYYY-MM-DD, inclusive) and the id of the
+assistant / user / department to narrow the report to.  Only the
+precomputed rollup rows are read, see usage/rollups.py.
+"""
+from datetime import date
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import IsAdminUser
+from .models import AssistantDailyUsage, DepartmentDailyUsage, UserDailyUsage
+from .serializers import (
+    AssistantDailyUsageSerializer,
+    DepartmentDailyUsageSerializer,
+    UserDailyUsageSerializer,
+)
+
+
+class UsageReportView(ListAPIView):
+    permission_classes = [IsAdminUser]
+    model = None
+    key = None
+
+    def get_queryset(self):
+        qs = self.model.objects.select_related(self.key).order_by('-date', f'{self.key}_id')
+        params = self.request.query_params
+        if params.get('from'):
+            qs = qs.filter(date__gte=self._date('from'))
+        if params.get('to'):
+            qs = qs.filter(date__lte=self._date('to'))
+        if params.get(self.key):
+            qs = qs.filter(**{f'{self.key}_id': self._id(self.key)})
+        return qs
+
+    def _id(self, param):
+        field = self.model._meta.get_field(self.key).target_field
+        try:
+            return field.to_python(self.request.query_params[param])
+        except DjangoValidationError:
+            raise ValidationError({param: f'Expected a {self.key} id.'})
+
+    def _date(self, param):
+        try:
+            return date.fromisoformat(self.request.query_params[param])
+        except ValueError:
+            raise ValidationError({param: 'Expected a date as YYYY-MM-DD.'})
+
+
+class AssistantUsageView(UsageReportView):
+    model = AssistantDailyUsage
+    key = 'assistant'
+    serializer_class = AssistantDailyUsageSerializer
+
+
+class UserUsageView(UsageReportView):
+    model = UserDailyUsage
+    key = 'user'
+    serializer_class = UserDailyUsageSerializer
+
+
+class DepartmentUsageView(UsageReportView):
+    model = DepartmentDailyUsage
+    key = 'department'
+    serializer_class = DepartmentDailyUsageSerializer